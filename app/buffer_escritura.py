@@ -0,0 +1,180 @@
+"""
+Buffer de escritura diferida (write-behind) con commit agrupado.
+
+Los documentos se encolan en memoria y se escriben con un solo insert_many
+cada `intervalo_ms` milisegundos o en cuanto se juntan `max_documentos`, lo
+que convierte una ráfaga de escrituras pequeñas en pocas escrituras grandes.
+
+Política de confirmación (ack) por llamada:
+- encolado: se responde en cuanto el documento entra a la cola
+- durable: se espera a que el lote que lo contiene se escriba en MongoDB
+
+Al detener la aplicación se vacía la cola antes de cerrar la conexión: la
+tarea periódica termina el lote que esté escribiendo (no se cancela) y lo
+que quede se escribe al final. Sin la tarea periódica (buffer sin iniciar o
+deteniéndose) agregar escribe el documento en la misma llamada.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from pymongo.errors import BulkWriteError
+
+ACK_ENCOLADO = "encolado"
+ACK_DURABLE = "durable"
+ACKS = (ACK_ENCOLADO, ACK_DURABLE)
+
+def validar_ack(ack: str) -> str:
+    """Verifica la política de confirmación (por ejemplo, FICHADOS_ACK)"""
+    if ack not in ACKS:
+        raise ValueError(f"Política de confirmación no válida: '{ack}' (usar {' o '.join(ACKS)})")
+    return ack
+
+class BufferEscritura:
+    """Cola en memoria que escribe en una colección por lotes"""
+
+    def __init__(
+        self,
+        nombre: str,
+        obtener_coleccion: Callable,
+        intervalo_ms: int,
+        max_documentos: int,
+        despues_de_escribir: Optional[Callable[[List[Dict]], Awaitable[None]]] = None
+    ):
+        self.nombre = nombre
+        self._obtener_coleccion = obtener_coleccion
+        self.intervalo = intervalo_ms / 1000
+        self.max_documentos = max_documentos
+        self._despues_de_escribir = despues_de_escribir
+        self._pendientes: List[Tuple[Dict, Optional[asyncio.Future]]] = []
+        self._lleno = asyncio.Event()
+        self._tarea: Optional[asyncio.Task] = None
+        self._deteniendo = False
+        self._candado = asyncio.Lock()
+        # Métricas
+        self.documentos_escritos = 0
+        self.lotes_escritos = 0
+        self.errores = 0
+        self.ultima_latencia_ms = 0.0
+        self.max_latencia_ms = 0.0
+        self._suma_latencia_ms = 0.0
+
+    @property
+    def profundidad(self) -> int:
+        """Documentos en cola esperando escribirse"""
+        return len(self._pendientes)
+
+    def iniciar(self):
+        """Arranca la tarea que vacía la cola periódicamente"""
+        if self._tarea is None:
+            self._deteniendo = False
+            self._tarea = asyncio.create_task(self._ciclo())
+
+    async def detener(self):
+        """
+        Detiene la tarea periódica y escribe lo que quede en la cola.
+        La tarea se despierta y sale al terminar su lote en curso: cancelarla
+        podría interrumpir un insert_many con documentos ya fuera de la cola.
+        """
+        if self._tarea is not None:
+            self._deteniendo = True
+            self._lleno.set()
+            await self._tarea
+            self._tarea = None
+        while self._pendientes:
+            await self.vaciar()
+
+    async def agregar(self, documento: Dict, ack: str = ACK_ENCOLADO):
+        """
+        Encola un documento. Con ack=durable espera a que su lote se escriba
+        y propaga el error si la escritura falla.
+        Si la tarea periódica no está corriendo, escribe la cola en esta misma
+        llamada (con ack=encolado el error solo se cuenta en las métricas).
+        """
+        validar_ack(ack)
+        en_linea = self._tarea is None or self._deteniendo
+        futuro = asyncio.get_running_loop().create_future() if ack == ACK_DURABLE or en_linea else None
+        self._pendientes.append((documento, futuro))
+
+        if en_linea:
+            while not futuro.done():
+                await self.vaciar()
+            if ack != ACK_DURABLE:
+                # Marca la excepción como leída; ya se reportó al escribir el lote
+                futuro.exception()
+                return
+        elif len(self._pendientes) >= self.max_documentos:
+            self._lleno.set()
+
+        if futuro is not None:
+            await futuro
+
+    async def _ciclo(self):
+        while not self._deteniendo:
+            try:
+                await asyncio.wait_for(self._lleno.wait(), timeout=self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+            self._lleno.clear()
+            if self._pendientes:
+                await self.vaciar()
+
+    async def vaciar(self):
+        """Escribe en un solo insert_many los documentos en cola (hasta max_documentos)"""
+        async with self._candado:
+            lote = self._pendientes[:self.max_documentos]
+            del self._pendientes[:len(lote)]
+            if not lote:
+                return
+
+            documentos = [documento for documento, _ in lote]
+            inicio = time.perf_counter()
+            fallidos: Dict[int, Exception] = {}
+            try:
+                await self._obtener_coleccion().insert_many(documentos, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    fallidos[error["index"]] = Exception(error.get("errmsg", "Error de escritura"))
+            except Exception as e:
+                fallidos = {indice: e for indice in range(len(lote))}
+
+            latencia_ms = (time.perf_counter() - inicio) * 1000
+            self.lotes_escritos += 1
+            self.documentos_escritos += len(lote) - len(fallidos)
+            self.errores += len(fallidos)
+            self.ultima_latencia_ms = latencia_ms
+            self.max_latencia_ms = max(self.max_latencia_ms, latencia_ms)
+            self._suma_latencia_ms += latencia_ms
+
+            if fallidos:
+                print(f"⚠️  Buffer {self.nombre}: {len(fallidos)} de {len(lote)} documentos no se escribieron")
+
+            escritos = [documento for indice, documento in enumerate(documentos) if indice not in fallidos]
+            if escritos and self._despues_de_escribir is not None:
+                try:
+                    await self._despues_de_escribir(escritos)
+                except Exception as e:
+                    print(f"⚠️  Buffer {self.nombre}: error después de escribir el lote: {e}")
+
+            for indice, (_, futuro) in enumerate(lote):
+                if futuro is None or futuro.done():
+                    continue
+                if indice in fallidos:
+                    futuro.set_exception(fallidos[indice])
+                else:
+                    futuro.set_result(None)
+
+    def estadisticas(self) -> Dict:
+        """Métricas de la cola para monitoreo"""
+        return {
+            "buffer": self.nombre,
+            "activo": self._tarea is not None,
+            "profundidad_cola": self.profundidad,
+            "intervalo_ms": self.intervalo * 1000,
+            "max_documentos": self.max_documentos,
+            "lotes_escritos": self.lotes_escritos,
+            "documentos_escritos": self.documentos_escritos,
+            "errores": self.errores,
+            "ultima_latencia_ms": self.ultima_latencia_ms,
+            "max_latencia_ms": self.max_latencia_ms,
+            "latencia_promedio_ms": self._suma_latencia_ms / self.lotes_escritos if self.lotes_escritos else 0.0
+        }
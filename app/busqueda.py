@@ -0,0 +1,118 @@
+"""
+Índice en memoria para buscar alumnos por nombre (autocompletado).
+
+Cada nombre se normaliza (sin acentos, en minúsculas) y se divide en
+palabras. Todas las palabras del padrón se guardan en un arreglo ordenado
+junto con el número de alumno al que pertenecen, de modo que las palabras
+que empiezan con un prefijo forman un rango contiguo que se encuentra con
+búsqueda binaria (bisect).
+
+Una búsqueda exige que cada palabra de la consulta sea prefijo de alguna
+palabra del nombre ("jose ram" encuentra "José Ramírez López"). Los
+resultados se ordenan por relevancia:
+1. El nombre completo empieza con la consulta
+2. Más palabras de la consulta coinciden completas (no solo como prefijo)
+3. Nombres más cortos y después orden alfabético
+
+Los alumnos se numeran en el orden del punto 3, así que el número ya sirve
+de desempate. Los rangos se combinan con máscaras de numpy del tamaño del
+padrón: una consulta muy corta ("a") que coincide con casi todos los alumnos
+cuesta lo mismo que una selectiva, unos pocos milisegundos con 100k alumnos.
+
+El índice es de solo lectura: cuando el padrón cambia se construye uno
+nuevo y se reemplaza la referencia (ver usuario_service.buscar_alumnos).
+"""
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+# Carácter mayor que cualquier letra normalizada: cierra el rango de un prefijo
+_FIN_PREFIJO = "￿"
+_SEPARADORES = re.compile(r"[^0-9a-z]+")
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas y sin acentos (ñ -> n), con los separadores colapsados en un espacio"""
+    texto = unicodedata.normalize("NFKD", str(texto or "").lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _SEPARADORES.sub(" ", texto).strip()
+
+class IndiceNombres:
+    """Palabras de los nombres ordenadas, con el alumno al que pertenece cada una"""
+
+    def __init__(self, alumnos: Iterable[Tuple[str, Dict]], version: Tuple = ()):
+        """
+        alumnos: pares (nivel, alumno) con el alumno como dict (campo "nombre").
+        version: versión de las colecciones con la que se construyó.
+        """
+        self.version = version
+        normalizados = []
+        for nivel, alumno in alumnos:
+            nombre = normalizar_texto(alumno.get("nombre", ""))
+            if nombre:
+                normalizados.append((len(nombre), nombre, nivel, alumno))
+        normalizados.sort(key=lambda entrada: entrada[:2])
+
+        self._alumnos: List[Tuple[str, Dict]] = [(nivel, alumno) for _, _, nivel, alumno in normalizados]
+        pares = []
+        nombres = []
+        for numero, (_, nombre, _, _) in enumerate(normalizados):
+            pares.extend((palabra, numero) for palabra in set(nombre.split()))
+            nombres.append((nombre, numero))
+        pares.sort()
+        nombres.sort()
+
+        self._palabras = [palabra for palabra, _ in pares]
+        self._numeros = np.fromiter((numero for _, numero in pares), dtype=np.int32, count=len(pares))
+        self._nombres = [nombre for nombre, _ in nombres]
+        self._orden_nombres = np.fromiter((numero for _, numero in nombres), dtype=np.int32, count=len(nombres))
+
+    def __len__(self) -> int:
+        return len(self._alumnos)
+
+    def _mascara(self, numeros: np.ndarray) -> np.ndarray:
+        mascara = np.zeros(len(self._alumnos), dtype=bool)
+        mascara[numeros] = True
+        return mascara
+
+    def buscar(self, consulta: str, limite: int) -> List[Tuple[str, Dict]]:
+        """Hasta `limite` pares (nivel, alumno) que coinciden con la consulta, por relevancia"""
+        consulta = normalizar_texto(consulta)
+        palabras = list(dict.fromkeys(consulta.split()))
+        if not palabras:
+            return []
+
+        candidatos = None
+        exactas = np.zeros(len(self._alumnos), dtype=np.int8)
+        for palabra in palabras:
+            # [inicio, fin_exacto): la palabra completa; [inicio, fin): como prefijo
+            inicio = bisect_left(self._palabras, palabra)
+            fin = bisect_left(self._palabras, palabra + _FIN_PREFIJO, inicio)
+            if inicio == fin:
+                return []
+            fin_exacto = bisect_right(self._palabras, palabra, inicio, fin)
+
+            coinciden = self._mascara(self._numeros[inicio:fin])
+            candidatos = coinciden if candidatos is None else candidatos & coinciden
+            exactas[self._numeros[inicio:fin_exacto]] += 1
+
+        numeros = np.flatnonzero(candidatos)
+        if not len(numeros):
+            return []
+
+        inicio = bisect_left(self._nombres, consulta)
+        fin = bisect_left(self._nombres, consulta + _FIN_PREFIJO, inicio)
+        empieza = self._mascara(self._orden_nombres[inicio:fin])
+
+        # Relevancia en un solo entero: menor es mejor (ver docstring del módulo)
+        total = len(self._alumnos)
+        claves = (
+            (~empieza[numeros]).astype(np.int64) * (len(palabras) + 1) * total
+            + (len(palabras) - exactas[numeros]).astype(np.int64) * total
+            + numeros
+        )
+        if len(claves) > limite:
+            seleccion = np.argpartition(claves, limite - 1)[:limite]
+            claves, numeros = claves[seleccion], numeros[seleccion]
+        return [self._alumnos[numero] for numero in numeros[np.argsort(claves)]]
@@ -0,0 +1,100 @@
+"""
+Caché en memoria del padrón de alumnos (roster) por matrícula.
+
+Los datos de alumnos cambian pocas veces por semestre pero se consultan en
+cada escaneo del kiosco, así que las búsquedas por matrícula pasan primero
+por esta caché (read-through):
+- Cada entrada expira tras ROSTER_CACHE_TTL segundos
+- El tamaño está acotado a ROSTER_CACHE_MAX entradas con desalojo LRU
+- También se guardan los "no encontrado", para que el kiosco no repita la
+  consulta al buscar en bachillerato a un alumno de universidad, pero solo
+  por ROSTER_CACHE_TTL_NO_ENCONTRADO segundos: un alumno recién dado de alta
+  en otro worker no debe responder 404 durante todo el TTL
+- crear_alumno_* y eliminar_alumno_* invalidan la matrícula afectada
+
+La caché es por proceso: con varios workers, un cambio hecho en otro proceso
+se refleja aquí a más tardar al expirar el TTL.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+from app.config import Config
+
+class CacheRoster:
+    """Caché LRU con expiración por entrada y contadores de aciertos/fallos"""
+
+    def __init__(self, nombre: str, ttl: float, max_entradas: int, ttl_no_encontrado: float = None):
+        self.nombre = nombre
+        self.ttl = ttl
+        self.ttl_no_encontrado = ttl if ttl_no_encontrado is None else min(ttl, ttl_no_encontrado)
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def obtener(self, clave: str) -> Tuple[bool, Any]:
+        """
+        Busca una clave. Retorna (True, valor) si está vigente o (False, None) si no.
+        El valor puede ser None cuando se guardó un "no encontrado".
+        """
+        entrada = self._entradas.get(clave)
+        if entrada is not None:
+            expira, valor = entrada
+            if expira > time.monotonic():
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return True, valor
+            del self._entradas[clave]
+
+        self.fallos += 1
+        return False, None
+
+    def guardar(self, clave: str, valor: Any):
+        """
+        Guarda un valor, desalojando la entrada menos usada si se excede el tamaño.
+        Un "no encontrado" (valor None) expira tras ttl_no_encontrado.
+        """
+        ttl = self.ttl_no_encontrado if valor is None else self.ttl
+        self._entradas[clave] = (time.monotonic() + ttl, valor)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self.desalojos += 1
+
+    def invalidar(self, clave: str):
+        """Elimina una clave de la caché"""
+        self._entradas.pop(clave, None)
+
+    def limpiar(self):
+        """Vacía la caché completa"""
+        self._entradas.clear()
+
+    def estadisticas(self) -> Dict:
+        """Contadores para monitoreo"""
+        consultas = self.aciertos + self.fallos
+        return {
+            "cache": self.nombre,
+            "entradas": len(self._entradas),
+            "max_entradas": self.max_entradas,
+            "ttl_segundos": self.ttl,
+            "ttl_no_encontrado_segundos": self.ttl_no_encontrado,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "desalojos": self.desalojos,
+            "tasa_aciertos": self.aciertos / consultas if consultas else 0.0
+        }
+
+cache_bachillerato = CacheRoster(
+    "alumnos_bachillerato_apodaca", Config.ROSTER_CACHE_TTL, Config.ROSTER_CACHE_MAX, Config.ROSTER_CACHE_TTL_NO_ENCONTRADO
+)
+cache_universidad = CacheRoster(
+    "alumnos_universidad_apodaca", Config.ROSTER_CACHE_TTL, Config.ROSTER_CACHE_MAX, Config.ROSTER_CACHE_TTL_NO_ENCONTRADO
+)
+
+def obtener_estadisticas_cache() -> Dict:
+    """Estadísticas de todas las cachés de roster"""
+    return {
+        "bachillerato": cache_bachillerato.estadisticas(),
+        "universidad": cache_universidad.estadisticas()
+    }
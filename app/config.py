@@ -5,8 +5,18 @@ Este módulo carga las variables de entorno desde un archivo .env y define
 la clase Config con todos los parámetros necesarios para la aplicación:
 - MONGODB_URI: URI de conexión a MongoDB (desde Render.com o local)
 - DATABASE_NAME: Nombre de la base de datos
+- USUARIOS_DATABASE_NAME: Base de datos de usuarios de Apodaca (mismo cliente)
+- MONGO_*: Pool de conexiones, timeouts, compresión y lectura de reportes
 - HOST y PORT: Configuración del servidor
-- EXCEL_DIR: Directorio para reportes Excel
+- EXCEL_DIR, REPORTES_GRACIA_SEGUNDOS: Directorio y vigencia de los reportes Excel
+- BCRYPT_*: Costo de bcrypt y tamaño del pool que calcula los hashes
+- STREAM_BATCH_SIZE: Documentos por lote al transmitir colecciones en streaming
+- FICHADOS_RESUMEN: Usar la colección materializada fichados_resumen
+- FICHADOS_BUFFER*, FICHADOS_ACK: Escritura diferida de fichados por lotes
+- ROSTER_CACHE_*: Expiración y tamaño de la caché de alumnos por matrícula
+- ROSTER_SNAPSHOT*: Snapshot del roster compartido entre workers vía mmap
+- CONSULTAS_LENTAS_*: Umbral, log JSONL y explain de las consultas lentas
+- KIOSCO_*: Agente sin conexión de los kioscos (ver kiosco/)
 """
 import os
 from dotenv import load_dotenv
@@ -16,8 +26,64 @@ load_dotenv()
 class Config:
     MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
     DATABASE_NAME = os.getenv("DATABASE_NAME", "asistencia_edec")
+    USUARIOS_DATABASE_NAME = os.getenv("USUARIOS_DATABASE_NAME", "usuarios_edec")
+    # Pool de conexiones del cliente compartido (por proceso) y timeouts en milisegundos
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 10000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000))
+    # Compresión del protocolo en orden de preferencia; se omiten las que no tengan su
+    # módulo instalado (zstd: zstandard, snappy: python-snappy; zlib siempre está)
+    MONGO_COMPRESSORS = [c.strip() for c in os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib").split(",") if c.strip()]
+    # Preferencia de lectura de las consultas pesadas (reportes): primary, primaryPreferred,
+    # secondary, secondaryPreferred o nearest
+    MONGO_LECTURA_REPORTES = os.getenv("MONGO_LECTURA_REPORTES", "secondaryPreferred")
     HOST = os.getenv("HOST", "0.0.0.0")
     # Render.com proporciona PORT automáticamente, usar 8000 como fallback
     PORT = int(os.getenv("PORT", 8000))
     EXCEL_DIR = os.getenv("EXCEL_DIR", "./excel_reports")
-
+    # Segundos después del fin del rango de un reporte en que todavía pueden llegar
+    # asistencias atrasadas (kioscos sin conexión); antes de eso el reporte se regenera
+    REPORTES_GRACIA_SEGUNDOS = float(os.getenv("REPORTES_GRACIA_SEGUNDOS", 86400))
+    # Costo (work factor) de bcrypt; los hashes con otro costo se regeneran al iniciar sesión
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+    # Hilos dedicados a bcrypt y máximo de operaciones en espera antes de rechazar
+    BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", os.cpu_count() or 2))
+    BCRYPT_MAX_COLA = int(os.getenv("BCRYPT_MAX_COLA", 64))
+    # Documentos que MongoDB envía por lote al recorrer un cursor en streaming
+    STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 500))
+    # Mantener fichados_resumen con $inc al registrar y leer la vista agrupada desde ahí.
+    # Antes de activarlo, construir la colección con scripts/reconstruir_resumen_fichados.py
+    FICHADOS_RESUMEN = os.getenv("FICHADOS_RESUMEN", "false").lower() == "true"
+    # Escritura diferida de fichados: se agrupan en un insert_many cada FICHADOS_BUFFER_MS
+    # milisegundos o al juntar FICHADOS_BUFFER_MAX documentos.
+    # FICHADOS_ACK: "encolado" responde al encolar, "durable" espera a que se escriba el lote
+    # (otro valor detiene el arranque con FICHADOS_BUFFER activo)
+    FICHADOS_BUFFER = os.getenv("FICHADOS_BUFFER", "false").lower() == "true"
+    FICHADOS_BUFFER_MS = int(os.getenv("FICHADOS_BUFFER_MS", 200))
+    FICHADOS_BUFFER_MAX = int(os.getenv("FICHADOS_BUFFER_MAX", 500))
+    FICHADOS_ACK = os.getenv("FICHADOS_ACK", "durable").strip().lower()
+    # Caché en memoria de alumnos por matrícula: segundos de vigencia y máximo de entradas
+    ROSTER_CACHE_TTL = float(os.getenv("ROSTER_CACHE_TTL", 300))
+    ROSTER_CACHE_MAX = int(os.getenv("ROSTER_CACHE_MAX", 50000))
+    # Vigencia de un "no encontrado": corta para que un alumno recién creado en otro worker se vea pronto
+    ROSTER_CACHE_TTL_NO_ENCONTRADO = float(os.getenv("ROSTER_CACHE_TTL_NO_ENCONTRADO", 5))
+    # Snapshot del roster en un archivo mapeado en memoria, compartido por todos los workers
+    ROSTER_SNAPSHOT = os.getenv("ROSTER_SNAPSHOT", "false").lower() == "true"
+    ROSTER_SNAPSHOT_DIR = os.getenv("ROSTER_SNAPSHOT_DIR", "./roster_snapshots")
+    # Comandos de MongoDB más lentos que CONSULTAS_LENTAS_MS se registran en el log JSONL
+    # (vacío: solo el resumen en memoria) y se explican una vez por forma de consulta,
+    # repitiendo el explain como máximo cada CONSULTAS_LENTAS_EXPLAIN_INTERVALO segundos
+    CONSULTAS_LENTAS_MS = float(os.getenv("CONSULTAS_LENTAS_MS", 100))
+    CONSULTAS_LENTAS_LOG = os.getenv("CONSULTAS_LENTAS_LOG", "./logs/consultas_lentas.jsonl")
+    CONSULTAS_LENTAS_EXPLAIN = os.getenv("CONSULTAS_LENTAS_EXPLAIN", "true").lower() == "true"
+    CONSULTAS_LENTAS_EXPLAIN_INTERVALO = float(os.getenv("CONSULTAS_LENTAS_EXPLAIN_INTERVALO", 600))
+    # Agente de kiosco (corre en el kiosco, no en el servidor): URL de la API, base SQLite
+    # local, escaneos por lote, segundos entre sincronizaciones y entre actualizaciones
+    # del padrón, e intentos antes de dejar un escaneo rechazado como error
+    KIOSCO_API_URL = os.getenv("KIOSCO_API_URL", "http://localhost:8000")
+    KIOSCO_DB = os.getenv("KIOSCO_DB", "./kiosco.sqlite3")
+    KIOSCO_LOTE = int(os.getenv("KIOSCO_LOTE", 500))
+    KIOSCO_SYNC_SEGUNDOS = float(os.getenv("KIOSCO_SYNC_SEGUNDOS", 5))
+    KIOSCO_ROSTER_SEGUNDOS = float(os.getenv("KIOSCO_ROSTER_SEGUNDOS", 900))
+    KIOSCO_MAX_INTENTOS = int(os.getenv("KIOSCO_MAX_INTENTOS", 5))
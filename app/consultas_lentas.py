@@ -0,0 +1,225 @@
+"""
+Registro de consultas lentas de MongoDB con planes de ejecución automáticos.
+
+Un CommandListener de PyMongo (registrado en connect_db) mide cada comando.
+Los que tardan más de CONSULTAS_LENTAS_MS se registran:
+- Como una línea JSON en CONSULTAS_LENTAS_LOG con la fecha, la duración, el
+  comando, la colección, la ruta de la API que lo originó (ver
+  metricas.ruta_actual) y la forma de la consulta
+- En un resumen en memoria por forma (conteo, tiempo total y máximo) que
+  lista GET /api/monitoreo/consultas-lentas
+
+La forma es el filtro (o el pipeline) con los valores reemplazados por "?":
+{"Matricula": {"$in": "?"}} agrupa todas las búsquedas por matrícula sin
+guardar matrículas en el log. La primera vez que una forma resulta lenta, y
+después cada CONSULTAS_LENTAS_EXPLAIN_INTERVALO segundos como máximo, se
+ejecuta el mismo comando con explain("executionStats") en segundo plano y se
+guarda un resumen del plan (etapas, claves y documentos examinados) para
+distinguir un COLLSCAN o un índice faltante de un problema de red.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo.monitoring import CommandListener
+from app.config import Config
+from app.metricas import ruta_actual
+
+# Comandos que se pueden repetir con explain
+COMANDOS_EXPLICABLES = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Campos del comando que agregan el driver o la sesión, no la consulta
+CAMPOS_DRIVER = {"lsid", "txnNumber", "$clusterTime", "$db", "$readPreference", "signature", "apiVersion"}
+# Partes del comando que definen su forma, por comando
+CAMPOS_FORMA = ("filter", "query", "q", "pipeline", "sort", "updates", "deletes", "key")
+# Máximo de formas distintas que se resumen en memoria
+MAX_FORMAS = 500
+
+def redactar(valor: Any) -> Any:
+    """Conserva llaves y operadores; reemplaza los valores por "?" """
+    if isinstance(valor, dict):
+        return {llave: redactar(contenido) for llave, contenido in valor.items()}
+    if isinstance(valor, (list, tuple)) and valor and all(isinstance(elemento, dict) for elemento in valor):
+        return [redactar(elemento) for elemento in valor]
+    return "?"
+
+def forma_comando(comando_nombre: str, comando: Dict) -> Dict:
+    """Forma de un comando: colección y partes que determinan el plan, sin valores"""
+    forma = {}
+    for campo in CAMPOS_FORMA:
+        if campo not in comando:
+            continue
+        # sort y key (distinct) se conservan: son nombres de campos y direcciones, no datos
+        if campo == "sort":
+            forma[campo] = dict(comando[campo])
+        elif campo == "key":
+            forma[campo] = comando[campo]
+        else:
+            forma[campo] = redactar(comando[campo])
+    return forma
+
+def _resumir_plan(explain: Dict) -> Dict:
+    """Etapas del plan ganador y contadores de executionStats"""
+    planificador = explain.get("queryPlanner") or {}
+    if not planificador and explain.get("stages"):
+        # aggregate: el plan de la consulta inicial está en la etapa $cursor
+        planificador = (explain["stages"][0].get("$cursor") or {}).get("queryPlanner") or {}
+    etapas = []
+    plan = planificador.get("winningPlan") or {}
+    plan = plan.get("queryPlan", plan)
+    while plan:
+        etapa = plan.get("stage")
+        if etapa:
+            etapas.append(etapa + (f" {plan['indexName']}" if plan.get("indexName") else ""))
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+
+    estadisticas = explain.get("executionStats") or {}
+    return {
+        "etapas": etapas,
+        "coleccion_completa": "COLLSCAN" in etapas,
+        "documentos_retornados": estadisticas.get("nReturned"),
+        "claves_examinadas": estadisticas.get("totalKeysExamined"),
+        "documentos_examinados": estadisticas.get("totalDocsExamined"),
+        "tiempo_ejecucion_ms": estadisticas.get("executionTimeMillis")
+    }
+
+class RegistroConsultasLentas(CommandListener):
+    """Listener que registra los comandos más lentos que el umbral y explica cada forma nueva"""
+
+    def __init__(self):
+        # (conexión, request_id) -> datos del comando entre su inicio y su fin
+        self._en_curso: Dict[Tuple, Tuple] = {}
+        self._formas: Dict[str, Dict] = {}
+        self._explicando = set()
+        self.cliente = None  # lo asigna connect_db; se usa para el explain
+
+    def started(self, event):
+        if event.command_name == "explain":
+            return
+        self._en_curso[(event.connection_id, event.request_id)] = (
+            event.command_name, event.command, event.database_name, ruta_actual.get()
+        )
+
+    def succeeded(self, event):
+        datos = self._en_curso.pop((event.connection_id, event.request_id), None)
+        if datos is not None and event.duration_micros >= Config.CONSULTAS_LENTAS_MS * 1000:
+            self._registrar(datos, event.duration_micros / 1000, None)
+
+    def failed(self, event):
+        datos = self._en_curso.pop((event.connection_id, event.request_id), None)
+        if datos is not None and event.duration_micros >= Config.CONSULTAS_LENTAS_MS * 1000:
+            self._registrar(datos, event.duration_micros / 1000, str(event.failure.get("errmsg", "")))
+
+    def _registrar(self, datos: Tuple, duracion_ms: float, error: Optional[str]):
+        comando_nombre, comando, base, ruta = datos
+        coleccion = comando.get("collection") if comando_nombre == "getMore" else comando.get(comando_nombre)
+        coleccion = coleccion if isinstance(coleccion, str) else ""
+        forma = forma_comando(comando_nombre, comando)
+        texto_forma = json.dumps(forma, sort_keys=True, default=str)
+        forma_id = hashlib.sha1(f"{base}.{coleccion}.{comando_nombre}.{texto_forma}".encode()).hexdigest()[:16]
+        ahora = time.time()
+
+        resumen = self._formas.get(forma_id)
+        if resumen is None and len(self._formas) < MAX_FORMAS:
+            resumen = self._formas[forma_id] = {
+                "forma_id": forma_id, "comando": comando_nombre, "base": base, "coleccion": coleccion,
+                "forma": forma, "rutas": [], "conteo": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "ultima": None, "explain": None, "explain_en": 0.0
+            }
+        if resumen is not None:
+            resumen["conteo"] += 1
+            resumen["total_ms"] += duracion_ms
+            resumen["max_ms"] = max(resumen["max_ms"], duracion_ms)
+            resumen["ultima"] = ahora
+            if ruta and ruta not in resumen["rutas"] and len(resumen["rutas"]) < 10:
+                resumen["rutas"].append(ruta)
+            if self._debe_explicar(comando_nombre, comando, resumen, ahora):
+                resumen["explain_en"] = ahora
+                self._programar_explain(forma_id, base, comando)
+
+        self._escribir({
+            "tipo": "consulta_lenta",
+            "fecha": datetime.fromtimestamp(ahora, timezone.utc).isoformat(),
+            "duracion_ms": round(duracion_ms, 3),
+            "comando": comando_nombre,
+            "base": base,
+            "coleccion": coleccion,
+            "ruta": ruta,
+            "forma_id": forma_id,
+            "forma": forma,
+            **({"error": error} if error else {})
+        })
+
+    def _debe_explicar(self, comando_nombre: str, comando: Dict, resumen: Dict, ahora: float) -> bool:
+        if not Config.CONSULTAS_LENTAS_EXPLAIN or self.cliente is None:
+            return False
+        if comando_nombre not in COMANDOS_EXPLICABLES or resumen["forma_id"] in self._explicando:
+            return False
+        # Un pipeline con $out/$merge escribe: no se repite
+        if any(("$out" in etapa or "$merge" in etapa) for etapa in comando.get("pipeline", []) if isinstance(etapa, dict)):
+            return False
+        return resumen["explain"] is None or ahora - resumen["explain_en"] >= Config.CONSULTAS_LENTAS_EXPLAIN_INTERVALO
+
+    def _programar_explain(self, forma_id: str, base: str, comando: Dict):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        original = {llave: valor for llave, valor in comando.items() if llave not in CAMPOS_DRIVER}
+        if "aggregate" in original:
+            original["cursor"] = {}
+        # explain de update/delete acepta una sola sentencia: se explica la primera
+        for campo in ("updates", "deletes"):
+            if campo in original:
+                original[campo] = list(original[campo])[:1]
+        self._explicando.add(forma_id)
+        loop.create_task(self._explicar(forma_id, base, original))
+
+    async def _explicar(self, forma_id: str, base: str, comando: Dict):
+        try:
+            explain = await self.cliente[base].command({"explain": comando, "verbosity": "executionStats"})
+            plan = _resumir_plan(explain)
+            resumen = self._formas.get(forma_id)
+            if resumen is not None:
+                resumen["explain"] = plan
+            self._escribir({
+                "tipo": "explain",
+                "fecha": datetime.now(timezone.utc).isoformat(),
+                "forma_id": forma_id,
+                "plan": plan
+            })
+        except Exception as e:
+            print(f"⚠️  No se pudo obtener el explain de la forma {forma_id}: {e}")
+        finally:
+            self._explicando.discard(forma_id)
+
+    def _escribir(self, registro: Dict):
+        """Agrega una línea al log (solo consultas lentas: pocas y cortas, escritura directa)"""
+        if not Config.CONSULTAS_LENTAS_LOG:
+            return
+        try:
+            directorio = os.path.dirname(Config.CONSULTAS_LENTAS_LOG)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            with open(Config.CONSULTAS_LENTAS_LOG, "a", encoding="utf-8") as archivo:
+                archivo.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            print(f"⚠️  No se pudo escribir el log de consultas lentas: {e}")
+
+    def formas_mas_lentas(self, limite: int, orden: str = "total_ms") -> List[Dict]:
+        """Formas ordenadas por tiempo total (o max_ms / conteo), con promedio y plan"""
+        formas = sorted(self._formas.values(), key=lambda resumen: resumen[orden], reverse=True)[:limite]
+        return [
+            {
+                **{llave: valor for llave, valor in resumen.items() if llave != "explain_en"},
+                "total_ms": round(resumen["total_ms"], 3),
+                "max_ms": round(resumen["max_ms"], 3),
+                "promedio_ms": round(resumen["total_ms"] / resumen["conteo"], 3),
+                "ultima": datetime.fromtimestamp(resumen["ultima"], timezone.utc).isoformat()
+            }
+            for resumen in formas
+        ]
+
+registro_consultas_lentas = RegistroConsultasLentas()
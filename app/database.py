@@ -1,37 +1,211 @@
 """
 Gestión de conexión a la base de datos MongoDB.
 
-Este módulo maneja la conexión y desconexión de MongoDB usando PyMongo.
+Este módulo maneja la conexión y desconexión de MongoDB usando la API
+asíncrona de PyMongo (AsyncMongoClient). Las operaciones se ejecutan sin
+bloquear el event loop, de modo que varias peticiones pueden esperar a
+MongoDB al mismo tiempo.
 Proporciona una instancia singleton de la base de datos que se reutiliza
 en toda la aplicación para evitar múltiples conexiones.
+
+El cliente se crea una sola vez con la configuración de Config (tamaño del
+pool, timeouts, compresión del protocolo) y lo comparten la base principal
+y la de usuarios. Las consultas pesadas (reportes) pueden leer de
+secundarios con get_db_lectura. Un listener de eventos del pool de PyMongo
+lleva los contadores de conexiones que expone /api/monitoreo/pool-mongo, y
+otro mide la latencia de cada comando para /metrics (ver app/metricas.py) y
+otro registra las consultas lentas (ver app/consultas_lentas.py).
 """
-from pymongo import MongoClient
+import importlib.util
+from typing import Dict, List, Optional
+from pymongo import AsyncMongoClient, ReadPreference
+from pymongo.monitoring import ConnectionPoolListener
 from app.config import Config
+from app.metricas import metricas_comandos
+from app.consultas_lentas import registro_consultas_lentas
+
+# Módulo de Python que necesita cada compresor (zlib viene con Python)
+_MODULOS_COMPRESORES = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
+
+PREFERENCIAS_LECTURA = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+class EstadisticasPool(ConnectionPoolListener):
+    """Contadores del pool de conexiones por servidor, a partir de los eventos de PyMongo"""
+
+    def __init__(self):
+        self._servidores: Dict[str, Dict] = {}
+
+    def _servidor(self, evento) -> Dict:
+        direccion = "%s:%s" % evento.address
+        servidor = self._servidores.get(direccion)
+        if servidor is None:
+            servidor = self._servidores[direccion] = {
+                "abiertas": 0, "en_uso": 0, "esperando": 0,
+                "creadas": 0, "cerradas": 0, "checkouts": 0, "checkouts_fallidos": 0,
+                "limpiezas": 0, "espera_max_ms": 0.0, "espera_total_ms": 0.0
+            }
+        return servidor
+
+    def pool_created(self, event):
+        self._servidor(event)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._servidor(event)["limpiezas"] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        servidor = self._servidor(event)
+        servidor["creadas"] += 1
+        servidor["abiertas"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        servidor = self._servidor(event)
+        servidor["cerradas"] += 1
+        servidor["abiertas"] -= 1
+
+    def connection_check_out_started(self, event):
+        self._servidor(event)["esperando"] += 1
+
+    def connection_check_out_failed(self, event):
+        servidor = self._servidor(event)
+        servidor["esperando"] -= 1
+        servidor["checkouts_fallidos"] += 1
+
+    def connection_checked_out(self, event):
+        servidor = self._servidor(event)
+        servidor["esperando"] -= 1
+        servidor["en_uso"] += 1
+        servidor["checkouts"] += 1
+        # duration: segundos que la operación esperó una conexión libre
+        espera_ms = (event.duration or 0) * 1000
+        servidor["espera_total_ms"] += espera_ms
+        servidor["espera_max_ms"] = max(servidor["espera_max_ms"], espera_ms)
+
+    def connection_checked_in(self, event):
+        self._servidor(event)["en_uso"] -= 1
+
+    def estadisticas(self) -> Dict:
+        """Contadores para monitoreo"""
+        return {
+            direccion: {
+                **servidor,
+                "espera_promedio_ms": round(servidor["espera_total_ms"] / servidor["checkouts"], 3) if servidor["checkouts"] else 0.0,
+                "espera_max_ms": round(servidor["espera_max_ms"], 3),
+                "espera_total_ms": round(servidor["espera_total_ms"], 3)
+            }
+            for direccion, servidor in self._servidores.items()
+        }
 
 class Database:
-    client: MongoClient = None
+    client: AsyncMongoClient = None
     db = None
+    db_usuarios = None
+    compresores: List[str] = []
+    # Bases de datos con otra preferencia de lectura, por nombre de la preferencia
+    lecturas: Dict[str, object] = {}
 
 database = Database()
+estadisticas_pool = EstadisticasPool()
+
+def compresores_disponibles() -> List[str]:
+    """Compresores de MONGO_COMPRESSORS cuyo módulo está instalado, en orden de preferencia"""
+    disponibles = []
+    for compresor in Config.MONGO_COMPRESSORS:
+        if compresor not in _MODULOS_COMPRESORES:
+            print(f"⚠️  Compresor desconocido en MONGO_COMPRESSORS: {compresor}")
+            continue
+        modulo = _MODULOS_COMPRESORES[compresor]
+        if modulo is None or importlib.util.find_spec(modulo) is not None:
+            disponibles.append(compresor)
+    return disponibles
 
 def connect_db():
-    """Conecta a la base de datos MongoDB"""
-    database.client = MongoClient(Config.MONGODB_URI)
+    """
+    Conecta a la base de datos MongoDB (el cliente abre conexiones bajo demanda).
+    Si ya hay un cliente no crea otro.
+    """
+    if database.client is not None:
+        return
+
+    opciones = {
+        "maxPoolSize": Config.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": Config.MONGO_MIN_POOL_SIZE,
+        "connectTimeoutMS": Config.MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "event_listeners": [estadisticas_pool, metricas_comandos, registro_consultas_lentas],
+    }
+    compresores = compresores_disponibles()
+    if compresores:
+        # El servidor usa el primero de la lista que también soporte
+        opciones["compressors"] = compresores
+
+    database.client = AsyncMongoClient(Config.MONGODB_URI, **opciones)
     database.db = database.client[Config.DATABASE_NAME]
-    print("✅ Conectado a MongoDB")
+    database.db_usuarios = database.client[Config.USUARIOS_DATABASE_NAME]
+    database.lecturas = {}
+    database.compresores = compresores
+    registro_consultas_lentas.cliente = database.client
+    print(f"✅ Conectado a MongoDB (pool {Config.MONGO_MIN_POOL_SIZE}-{Config.MONGO_MAX_POOL_SIZE}, compresión: {', '.join(compresores) or 'ninguna'})")
 
-def close_db():
+async def close_db():
     """Cierra la conexión a la base de datos"""
     if database.client:
-        database.client.close()
+        await database.client.close()
+        database.client = database.db = database.db_usuarios = None
+        database.lecturas = {}
         print("❌ Desconectado de MongoDB")
 
+def _cliente() -> AsyncMongoClient:
+    # Los scripts y pruebas pueden pedir la base antes del startup: se conecta una sola vez
+    if database.client is None:
+        connect_db()
+    return database.client
+
 def get_db():
     """Retorna la instancia de la base de datos principal"""
+    _cliente()
     return database.db
 
 def get_db_usuarios():
-    """Retorna la instancia de la base de datos de usuarios"""
-    if database.client is None:
-        connect_db()
-    return database.client["usuarios_edec"]
\ No newline at end of file
+    """Retorna la instancia de la base de datos de usuarios (mismo cliente y pool)"""
+    _cliente()
+    return database.db_usuarios
+
+def get_db_lectura(preferencia: Optional[str] = None):
+    """
+    Retorna la base de datos principal con otra preferencia de lectura, para
+    consultas pesadas que pueden ir a un secundario (por defecto MONGO_LECTURA_REPORTES).
+    Comparte el cliente y el pool; en un servidor sin réplicas lee del primario.
+    """
+    preferencia = preferencia or Config.MONGO_LECTURA_REPORTES
+    if preferencia not in PREFERENCIAS_LECTURA:
+        raise ValueError(f"Preferencia de lectura no válida: {preferencia}")
+    db = database.lecturas.get(preferencia)
+    if db is None:
+        db = _cliente().get_database(Config.DATABASE_NAME, read_preference=PREFERENCIAS_LECTURA[preferencia])
+        database.lecturas[preferencia] = db
+    return db
+
+def obtener_estadisticas_pool() -> Dict:
+    """Configuración del cliente y contadores del pool por servidor"""
+    return {
+        "max_pool": Config.MONGO_MAX_POOL_SIZE,
+        "min_pool": Config.MONGO_MIN_POOL_SIZE,
+        "compresores": database.compresores,
+        "lectura_reportes": Config.MONGO_LECTURA_REPORTES,
+        "servidores": estadisticas_pool.estadisticas()
+    }
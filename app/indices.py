@@ -0,0 +1,96 @@
+"""
+Gestión de índices de MongoDB.
+
+Este módulo declara los índices que necesitan las consultas de la aplicación
+y los crea al iniciar el servidor. create_index es idempotente: si el índice
+ya existe con la misma definición no se hace nada, por lo que es seguro
+ejecutarlo en cada arranque.
+- asistencia_general_apodaca: índice único (Matricula, Fecha), garantiza un
+  registro por matrícula por día y permite detectar duplicados en una sola escritura
+- asistencia_general(_apodaca): (timestamp, _id) para la paginación por cursor
+- asistencia_general_apodaca: (fecha_dia, timestamp) para consultas por rango de días
+- usuarios_apodaca: índice único por correo y (fecha_creacion, _id) para paginar
+- alumnos_*_apodaca: índice (Matricula, _id) para búsquedas y paginación
+- fichados_apodaca: índice (matricula, fecha_registro_ficha)
+- fichados_resumen: índice por ultima_ficha para leer la vista agrupada ya ordenada
+- estadisticas_diarias: índice por fecha_dia para leer un rango de días
+
+Los índices que no se pudieron crear quedan registrados en estado_indices.
+Mientras falte el índice único (Matricula, Fecha), el registro de asistencia
+verifica los duplicados con una consulta antes de insertar.
+"""
+from pymongo import ASCENDING, DESCENDING
+from typing import Set, Tuple
+from pymongo.errors import OperationFailure
+from app.database import get_db, get_db_usuarios
+
+# (base de datos, colección, llaves, opciones)
+INDICES = [
+    ("principal", "asistencia_general_apodaca",
+     [("Matricula", ASCENDING), ("Fecha", ASCENDING)],
+     {"name": "matricula_fecha_unico", "unique": True}),
+    ("principal", "asistencia_general_apodaca",
+     [("timestamp", DESCENDING), ("_id", DESCENDING)],
+     {"name": "timestamp_id"}),
+    ("principal", "asistencia_general_apodaca",
+     [("fecha_dia", ASCENDING), ("timestamp", ASCENDING)],
+     {"name": "fecha_dia_timestamp"}),
+    ("principal", "asistencia_general",
+     [("timestamp", DESCENDING), ("_id", DESCENDING)],
+     {"name": "timestamp_id"}),
+    ("usuarios", "usuarios_apodaca",
+     [("correo", ASCENDING)],
+     {"name": "correo_unico", "unique": True}),
+    ("usuarios", "usuarios_apodaca",
+     [("fecha_creacion", DESCENDING), ("_id", DESCENDING)],
+     {"name": "fecha_creacion_id"}),
+    ("principal", "alumnos_bachillerato_apodaca",
+     [("Matricula", ASCENDING), ("_id", ASCENDING)],
+     {"name": "matricula_id"}),
+    ("principal", "alumnos_universidad_apodaca",
+     [("Matricula", ASCENDING), ("_id", ASCENDING)],
+     {"name": "matricula_id"}),
+    ("principal", "fichados_apodaca",
+     [("matricula", ASCENDING), ("fecha_registro_ficha", ASCENDING)],
+     {"name": "matricula_fecha_registro"}),
+    ("principal", "fichados_resumen",
+     [("ultima_ficha", DESCENDING)],
+     {"name": "ultima_ficha"}),
+    ("principal", "estadisticas_diarias",
+     [("fecha_dia", ASCENDING)],
+     {"name": "fecha_dia"}),
+]
+
+class EstadoIndices:
+    # (colección, nombre) de los índices que no se pudieron crear
+    faltantes: Set[Tuple[str, str]] = set()
+
+estado_indices = EstadoIndices()
+
+def indice_disponible(coleccion: str, nombre: str) -> bool:
+    """Indica si el índice se creó (o ya existía) en la última llamada a crear_indices"""
+    return (coleccion, nombre) not in estado_indices.faltantes
+
+async def crear_indices():
+    """
+    Crea todos los índices declarados en INDICES.
+    Un índice que no se puede crear (por ejemplo, un índice único sobre datos
+    duplicados) se reporta y se registra en estado_indices sin detener el
+    arranque de la aplicación; ver indice_disponible.
+    """
+    bases = {
+        "principal": get_db(),
+        "usuarios": get_db_usuarios()
+    }
+
+    for base, coleccion, llaves, opciones in INDICES:
+        try:
+            await bases[base][coleccion].create_index(llaves, **opciones)
+            estado_indices.faltantes.discard((coleccion, opciones["name"]))
+        except OperationFailure as e:
+            estado_indices.faltantes.add((coleccion, opciones["name"]))
+            print(f"⚠️  No se pudo crear el índice {opciones['name']} en {coleccion}: {e}")
+            if opciones.get("unique"):
+                print(f"⚠️  Sin el índice único {opciones['name']} los duplicados se verifican con una consulta previa")
+
+    print("✅ Índices verificados")
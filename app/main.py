@@ -1,6 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.buffer_escritura import validar_ack
 from app.database import connect_db, close_db
+from app.indices import crear_indices
+from app.matricula import cargar_estado_matricula
+from app.services.asistencia_service import buffer_fichados
+from app.services.hash_service import cerrar_pool_hash
+from app.services.usuario_service import construir_snapshots_roster
 from app.routes.endpoints import router
 from app.config import Config
 
@@ -30,6 +36,12 @@ app.include_router(router)
 async def startup_event():
     """Evento que se ejecuta al iniciar la aplicación"""
     connect_db()
+    await crear_indices()
+    await cargar_estado_matricula()
+    await construir_snapshots_roster()
+    if Config.FICHADOS_BUFFER:
+        validar_ack(Config.FICHADOS_ACK)
+        buffer_fichados.iniciar()
     # Crear directorio de Excel si no existe
     import os
     os.makedirs(Config.EXCEL_DIR, exist_ok=True)
@@ -37,7 +49,10 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Evento que se ejecuta al cerrar la aplicación"""
-    close_db()
+    # Escribir los fichados en cola antes de cerrar la conexión
+    await buffer_fichados.detener()
+    await close_db()
+    cerrar_pool_hash()
 
 @app.get("/")
 async def root():
@@ -0,0 +1,77 @@
+"""
+Tipo canónico de la matrícula.
+
+Históricamente algunas colecciones guardan Matricula como int y otras como
+string, por lo que las búsquedas hacían una consulta como string y, si no
+encontraban nada, otra como int. La forma canónica es string; el script
+scripts/migrar_matriculas.py convierte los documentos existentes y, al
+terminar, lo registra en la colección 'migraciones'.
+
+Mientras la migración no esté confirmada se usa un modo compatible que busca
+ambos tipos en una sola consulta con $in (un solo recorrido del índice).
+"""
+from typing import Any, Dict, Iterable
+from app.database import get_db
+
+# Documento de la colección 'migraciones' que marca la migración como terminada
+MIGRACION_MATRICULA_ID = "matricula_canonica"
+
+class EstadoMatricula:
+    migracion_completa: bool = False
+
+estado_matricula = EstadoMatricula()
+
+def normalizar_matricula(valor: Any) -> str:
+    """
+    Convierte una matrícula a su forma canónica (string sin espacios).
+    Los float enteros (por ejemplo 123.0, típicos al leer de Excel) se guardan como "123".
+    """
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+def filtro_matricula(matricula: Any, campo: str = "Matricula") -> Dict:
+    """
+    Construye el filtro de búsqueda por matrícula.
+    - Migración completa: igualdad contra el string canónico
+    - Modo compatible: un solo $in con el string y su equivalente int
+    """
+    matricula = normalizar_matricula(matricula)
+
+    if estado_matricula.migracion_completa:
+        return {campo: matricula}
+
+    try:
+        return {campo: {"$in": [matricula, int(matricula)]}}
+    except ValueError:
+        return {campo: matricula}
+
+def filtro_matriculas(matriculas: Iterable[Any], campo: str = "Matricula") -> Dict:
+    """
+    Filtro de varias matrículas en un solo $in.
+    En modo compatible incluye también el equivalente int de cada una.
+    """
+    valores = []
+    for matricula in matriculas:
+        matricula = normalizar_matricula(matricula)
+        valores.append(matricula)
+        if not estado_matricula.migracion_completa:
+            try:
+                valores.append(int(matricula))
+            except ValueError:
+                pass
+    return {campo: {"$in": valores}}
+
+async def cargar_estado_matricula():
+    """
+    Lee de la colección 'migraciones' si la matrícula ya es canónica en todas las colecciones.
+    Se ejecuta al iniciar la aplicación.
+    """
+    db = get_db()
+    migracion = await db.migraciones.find_one({"_id": MIGRACION_MATRICULA_ID})
+    estado_matricula.migracion_completa = bool(migracion and migracion.get("completada"))
+
+    if estado_matricula.migracion_completa:
+        print("✅ Matrícula canónica: búsquedas por igualdad")
+    else:
+        print("⚠️  Migración de matrícula pendiente: búsquedas en modo compatible ($in string/int)")
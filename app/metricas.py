@@ -0,0 +1,192 @@
+"""
+Métricas en formato de texto de Prometheus (GET /metrics).
+
+- Latencia por ruta (histograma), peticiones en curso y respuestas por
+  código de estado, medidas por RutaMedida: la clase de ruta del APIRouter
+  envuelve cada endpoint, así que la etiqueta "route" es la plantilla de la
+  ruta (/api/alumnos/{matricula}) y no la URL, y el número de series no
+  crece con las matrículas consultadas
+- Latencia de cada comando de MongoDB por colección y comando, con el
+  CommandListener que connect_db registra en el cliente
+- Medidores de cachés, pool y colas, leídos de sus estadisticas() al
+  generar la respuesta (ver familia())
+
+RutaMedida también guarda la ruta en la variable de contexto ruta_actual,
+para que los listeners de MongoDB sepan qué endpoint originó cada comando.
+
+Registrar una observación es una búsqueda en un dict y un bisect sobre los
+límites del histograma, sin candados (todo corre en el event loop): del
+orden de un microsegundo por petición. En respuestas en streaming la
+latencia llega hasta que el endpoint retorna la respuesta, no hasta que
+termina de enviarse el cuerpo.
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, Iterable, List, Tuple
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from pymongo.monitoring import CommandListener
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+LIMITES_HTTP = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_MONGO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _etiquetas(nombres: Iterable[str], valores: Iterable) -> str:
+    pares = ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores))
+    return "{" + pares + "}" if pares else ""
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class Metrica:
+    """Serie de valores por combinación de etiquetas"""
+    tipo = "untyped"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._series: Dict[Tuple, float] = {}
+
+    def sumar(self, etiquetas: Tuple, valor: float = 1):
+        self._series[etiquetas] = self._series.get(etiquetas, 0) + valor
+
+    def exponer(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for valores, valor in sorted(self._series.items()):
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {_numero(valor)}")
+        return lineas
+
+class Contador(Metrica):
+    tipo = "counter"
+
+class Medidor(Metrica):
+    tipo = "gauge"
+
+class Histograma(Metrica):
+    """Conteos por límite (no acumulados hasta exponerlos), suma y total"""
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...], limites: Tuple[float, ...]):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = limites
+        self._series: Dict[Tuple, List] = {}
+
+    def observar(self, etiquetas: Tuple, valor: float):
+        serie = self._series.get(etiquetas)
+        if serie is None:
+            # Un conteo por límite, uno para +Inf y al final la suma
+            serie = self._series[etiquetas] = [0] * (len(self.limites) + 1) + [0.0]
+        serie[bisect_left(self.limites, valor)] += 1
+        serie[-1] += valor
+
+    def exponer(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        nombres_le = (*self.etiquetas, "le")
+        for valores, serie in sorted(self._series.items()):
+            acumulado = 0
+            for limite, conteo in zip((*self.limites, "+Inf"), serie):
+                acumulado += conteo
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(nombres_le, (*valores, limite))} {acumulado}")
+            etiquetas = _etiquetas(self.etiquetas, valores)
+            lineas.append(f"{self.nombre}_sum{etiquetas} {_numero(serie[-1])}")
+            lineas.append(f"{self.nombre}_count{etiquetas} {acumulado}")
+        return lineas
+
+http_duracion = Histograma(
+    "asistencia_http_request_duration_seconds", "Latencia de las peticiones por ruta",
+    ("method", "route"), LIMITES_HTTP
+)
+http_en_curso = Medidor("asistencia_http_requests_in_progress", "Peticiones en curso por ruta", ("method", "route"))
+http_respuestas = Contador(
+    "asistencia_http_responses_total", "Respuestas por ruta y código de estado", ("method", "route", "status")
+)
+mongo_duracion = Histograma(
+    "asistencia_mongodb_command_duration_seconds", "Latencia de los comandos de MongoDB",
+    ("collection", "command"), LIMITES_MONGO
+)
+mongo_fallidos = Contador(
+    "asistencia_mongodb_command_failures_total", "Comandos de MongoDB con error", ("collection", "command")
+)
+
+# Plantilla de la ruta que atiende la petición actual (la leen los listeners de MongoDB)
+ruta_actual: ContextVar[str] = ContextVar("ruta_actual", default="")
+
+METRICAS = [http_duracion, http_en_curso, http_respuestas, mongo_duracion, mongo_fallidos]
+
+class RutaMedida(APIRoute):
+    """APIRoute que mide latencia, peticiones en curso y código de estado del endpoint"""
+
+    def get_route_handler(self):
+        manejador = super().get_route_handler()
+        ruta = self.path_format
+
+        async def manejador_medido(request):
+            etiquetas = (request.method, ruta)
+            ruta_actual.set(ruta)
+            http_en_curso.sumar(etiquetas, 1)
+            inicio = perf_counter()
+            estado = 500
+            try:
+                respuesta = await manejador(request)
+                estado = respuesta.status_code
+                return respuesta
+            except StarletteHTTPException as e:
+                estado = e.status_code
+                raise
+            except RequestValidationError:
+                estado = 422
+                raise
+            finally:
+                http_duracion.observar(etiquetas, perf_counter() - inicio)
+                http_respuestas.sumar((*etiquetas, estado))
+                http_en_curso.sumar(etiquetas, -1)
+
+        return manejador_medido
+
+class MetricasComandos(CommandListener):
+    """Latencia de cada comando de MongoDB por colección (listener de PyMongo)"""
+
+    def __init__(self):
+        # (conexión, request_id) -> (colección, comando) entre el inicio y el fin del comando
+        self._en_curso: Dict[Tuple, Tuple[str, str]] = {}
+
+    def started(self, event):
+        comando = event.command_name
+        coleccion = event.command.get("collection") if comando == "getMore" else event.command.get(comando)
+        self._en_curso[(event.connection_id, event.request_id)] = (
+            coleccion if isinstance(coleccion, str) else "", comando
+        )
+
+    def succeeded(self, event):
+        etiquetas = self._en_curso.pop((event.connection_id, event.request_id), None)
+        if etiquetas is not None:
+            mongo_duracion.observar(etiquetas, event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        etiquetas = self._en_curso.pop((event.connection_id, event.request_id), None)
+        if etiquetas is not None:
+            mongo_duracion.observar(etiquetas, event.duration_micros / 1_000_000)
+            mongo_fallidos.sumar(etiquetas)
+
+metricas_comandos = MetricasComandos()
+
+def familia(nombre: str, tipo: str, ayuda: str, muestras: Iterable[Tuple[Dict[str, str], float]]) -> List[str]:
+    """Líneas de una métrica calculada al exponer (medidores de cachés, pool y colas)"""
+    lineas = [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+    for etiquetas, valor in muestras:
+        lineas.append(f"{nombre}{_etiquetas(etiquetas.keys(), etiquetas.values())} {_numero(valor)}")
+    return lineas
+
+def exponer_metricas(familias_adicionales: Iterable[List[str]] = ()) -> str:
+    """Texto completo en formato de exposición de Prometheus 0.0.4"""
+    lineas = []
+    for metrica in METRICAS:
+        lineas.extend(metrica.exponer())
+    for lineas_familia in familias_adicionales:
+        lineas.extend(lineas_familia)
+    return "\n".join(lineas) + "\n"
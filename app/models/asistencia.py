@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+from typing import List, Optional, Union
 
 class AsistenciaCreate(BaseModel):
     """Modelo para crear un registro de asistencia"""
@@ -13,3 +13,20 @@ class Asistencia(BaseModel):
     hora: str  # Formato: HH:MM
     timestamp: datetime
 
+class AsistenciaLoteItem(BaseModel):
+    """Un escaneo guardado por el kiosco para registrarse en lote"""
+    matricula: Union[str, int]
+    nombre: str
+    timestamp: Optional[datetime] = None  # Momento del escaneo; sin zona se asume horario de México
+
+class AsistenciaLote(BaseModel):
+    """Modelo para registrar varias asistencias en una sola petición"""
+    registros: List[AsistenciaLoteItem] = Field(..., min_length=1, max_length=1000)
+
+class ReporteAsistenciasCreate(BaseModel):
+    """Filtros de un reporte Excel de asistencias (rango de fechas en horario de México, inclusivo)"""
+    desde: date
+    hasta: date
+    campus: Optional[str] = None
+    programa: Optional[str] = None
+    turno: Optional[str] = None
@@ -7,6 +7,7 @@ Este módulo define los esquemas de validación (Pydantic) para:
 - LoginRequest: Datos de autenticación (username y password)
 - usuario_datos: Modelo completo con información detallada de alumnos
   (matrícula, nombre, coordinador, graduado, correo, campus, programa, ciclo, turno)
+- AlumnoNivelResponse: Alumno encontrado sin conocer su nivel, con el nivel
 - UsuarioCreate: Modelo para crear nuevos usuarios en usuarios_apodaca
 - UsuarioLogin: Modelo para autenticación de usuarios
 - UsuarioResponseApodaca: Respuesta con datos del usuario autenticado
@@ -43,6 +44,10 @@ class usuario_datos(BaseModel):
     ciclo: str
     turno: str
 
+class AlumnoNivelResponse(BaseModel):
+    nivel: str  # "bachillerato" o "universidad"
+    alumno: usuario_datos
+
 # Modelos para usuarios de Apodaca
 class UsuarioCreate(BaseModel):
     nombre_completo: str
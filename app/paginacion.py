@@ -0,0 +1,123 @@
+"""
+Paginación por cursor (keyset) para los endpoints que listan colecciones completas.
+
+En lugar de usar skip/offset, cada página continúa desde el último documento
+de la página anterior: se ordena por (campo, _id) y el filtro pide los
+documentos estrictamente posteriores a ese par. Con un índice sobre
+(campo, _id) el costo de cada página es el mismo sin importar qué tan lejos
+esté en la colección.
+
+El cursor que recibe el cliente ("siguiente") es opaco: un JSON con el valor
+del campo de orden y el _id, codificado en base64 url-safe.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+
+def _codificar_valor(valor: Any) -> Dict:
+    """Convierte el valor del campo de orden a JSON conservando su tipo"""
+    if isinstance(valor, datetime):
+        return {"t": "fecha", "v": valor.isoformat()}
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return {"t": "numero", "v": valor}
+    if valor is None:
+        return {"t": "nulo", "v": None}
+    return {"t": "texto", "v": str(valor)}
+
+def _decodificar_valor(dato: Dict) -> Any:
+    tipo = dato.get("t")
+    if tipo == "fecha":
+        return datetime.fromisoformat(dato["v"])
+    if tipo == "numero":
+        return dato["v"]
+    if tipo == "nulo":
+        return None
+    if tipo == "texto":
+        return str(dato["v"])
+    raise ValueError("Tipo de cursor desconocido")
+
+def codificar_cursor(documento: Dict, campo: str) -> str:
+    """Genera el cursor opaco a partir del último documento de una página"""
+    contenido = {
+        "c": _codificar_valor(documento.get(campo)),
+        "id": str(documento["_id"])
+    }
+    crudo = json.dumps(contenido, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+def decodificar_cursor(cursor: str) -> Tuple[Any, ObjectId]:
+    """
+    Recupera (valor, _id) de un cursor.
+    Lanza ValueError si el cursor no es válido.
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        contenido = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return _decodificar_valor(contenido["c"]), ObjectId(contenido["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError("El cursor de paginación no es válido")
+
+def filtro_despues_de(campo: str, direccion: int, valor: Any, ultimo_id: ObjectId) -> Dict:
+    """
+    Filtro keyset para los documentos posteriores a (valor, ultimo_id) en el orden
+    (campo direccion, _id direccion).
+    """
+    operador = "$gt" if direccion > 0 else "$lt"
+    condiciones: List[Dict] = [
+        {campo: valor, "_id": {operador: ultimo_id}}
+    ]
+
+    if valor is None:
+        # Los nulos van primero en orden ascendente y al final en descendente
+        if direccion > 0:
+            condiciones.append({campo: {"$ne": None}})
+    else:
+        condiciones.append({campo: {operador: valor}})
+        # MongoDB compara por tipo: en orden ascendente los números van antes que
+        # los strings (matrículas aún sin migrar), así que al pasar un número
+        # también se incluyen todos los strings; en descendente es al revés
+        if direccion > 0 and isinstance(valor, (int, float)):
+            condiciones.append({campo: {"$type": "string"}})
+        if direccion < 0:
+            if isinstance(valor, str):
+                condiciones.append({campo: {"$type": "number"}})
+            # En descendente los nulos (y el campo ausente) van al final
+            condiciones.append({campo: None})
+
+    return {"$or": condiciones}
+
+async def obtener_pagina(
+    coleccion,
+    campo: str,
+    direccion: int,
+    limite: int,
+    cursor: Optional[str] = None,
+    filtro: Optional[Dict] = None,
+    proyeccion: Optional[Dict] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Obtiene una página de documentos ordenada por (campo, _id).
+    Retorna los documentos y el cursor de la siguiente página (None si es la última).
+    """
+    consulta = dict(filtro or {})
+    if cursor:
+        valor, ultimo_id = decodificar_cursor(cursor)
+        consulta = {"$and": [consulta, filtro_despues_de(campo, direccion, valor, ultimo_id)]}
+
+    # Se pide un documento extra para saber si existe una página siguiente
+    documentos = await coleccion.find(consulta, proyeccion).sort(
+        [(campo, direccion), ("_id", direccion)]
+    ).limit(limite + 1).to_list()
+
+    siguiente = None
+    if len(documentos) > limite:
+        documentos = documentos[:limite]
+        siguiente = codificar_cursor(documentos[-1], campo)
+
+    return documentos, siguiente
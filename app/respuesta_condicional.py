@@ -0,0 +1,149 @@
+"""
+Respuestas condicionales (ETag / If-None-Match) con cuerpos precomprimidos.
+
+El ETag de una respuesta se forma con la versión de su colección (ver
+app/versiones.py) y la variante pedida (por ejemplo, la página). Si el
+cliente envía If-None-Match con ese ETag se responde 304 sin consultar la
+colección.
+
+Para las respuestas completas que los frontends consultan una y otra vez,
+el último cuerpo generado se guarda ya comprimido (gzip y, si está instalado
+el paquete brotli, br): cuando el padrón cambia se comprime una sola vez y
+las siguientes peticiones reciben los bytes guardados según su Accept-Encoding.
+"""
+import asyncio
+import gzip
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi import Request
+from fastapi.responses import Response
+from app.serializacion import a_json
+from app.versiones import versiones
+
+try:
+    import brotli
+except ImportError:  # Sin brotli: solo gzip
+    brotli = None
+
+NIVEL_GZIP = 6
+CALIDAD_BROTLI = 5
+
+class CuerpoPrecomprimido:
+    """Cuerpo JSON de una versión con sus codificaciones"""
+
+    def __init__(self, version: int, etag: str, cuerpo: bytes):
+        self.version = version
+        self.etag = etag
+        self.codificaciones: Dict[str, bytes] = {"identity": cuerpo}
+        self.codificaciones["gzip"] = gzip.compress(cuerpo, compresslevel=NIVEL_GZIP)
+        if brotli is not None:
+            self.codificaciones["br"] = brotli.compress(cuerpo, quality=CALIDAD_BROTLI)
+
+class CacheRespuestas:
+    """Últimos cuerpos precomprimidos por (colección, variante) y contadores de uso"""
+
+    def __init__(self):
+        self._cuerpos: Dict[str, CuerpoPrecomprimido] = {}
+        self.no_modificados = 0
+        self.aciertos = 0
+        self.generados = 0
+
+    def obtener(self, clave: str, version: int) -> Optional[CuerpoPrecomprimido]:
+        cuerpo = self._cuerpos.get(clave)
+        if cuerpo is not None and cuerpo.version == version:
+            return cuerpo
+        return None
+
+    def guardar(self, clave: str, cuerpo: CuerpoPrecomprimido):
+        self._cuerpos[clave] = cuerpo
+
+    def estadisticas(self) -> Dict:
+        """Contadores para monitoreo"""
+        return {
+            "respuestas_304": self.no_modificados,
+            "aciertos_precomprimidos": self.aciertos,
+            "cuerpos_generados": self.generados,
+            "brotli": brotli is not None,
+            "cuerpos": {
+                clave: {
+                    "version": cuerpo.version,
+                    "bytes": {codificacion: len(datos) for codificacion, datos in cuerpo.codificaciones.items()}
+                }
+                for clave, cuerpo in self._cuerpos.items()
+            }
+        }
+
+cache_respuestas = CacheRespuestas()
+
+def _etag(coleccion: str, version: int, variante: str) -> str:
+    # ETag débil: el mismo contenido se envía con distintas codificaciones.
+    # crc32 (y no hash()) para que todos los workers generen el mismo ETag
+    if not variante:
+        return f'W/"{coleccion}-{version}"'
+    return f'W/"{coleccion}-{version}-{zlib.crc32(variante.encode()):08x}"'
+
+def _coincide_etag(request: Request, etag: str) -> bool:
+    encabezado = request.headers.get("if-none-match")
+    if not encabezado:
+        return False
+    etiquetas = [etiqueta.strip() for etiqueta in encabezado.split(",")]
+    # La comparación de If-None-Match es débil: se ignora el prefijo W/
+    return "*" in etiquetas or etag.removeprefix("W/") in [e.removeprefix("W/") for e in etiquetas]
+
+def _elegir_codificacion(request: Request, disponibles: Dict[str, bytes]) -> str:
+    """Codificación preferida (br, luego gzip) entre las que acepta el cliente"""
+    aceptadas = set()
+    for parte in request.headers.get("accept-encoding", "").split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        if parametros.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        aceptadas.add(nombre.strip().lower())
+    for codificacion in ("br", "gzip"):
+        if codificacion in disponibles and (codificacion in aceptadas or "*" in aceptadas):
+            return codificacion
+    return "identity"
+
+def _encabezados(etag: str) -> Dict[str, str]:
+    # no-cache: el cliente puede guardar la respuesta pero debe revalidarla con If-None-Match
+    return {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+async def respuesta_condicional(
+    request: Request,
+    coleccion: str,
+    generar: Callable[[], Awaitable[Any]],
+    variante: str = "",
+    precomprimir: bool = False
+) -> Response:
+    """
+    Responde el contenido de una colección con ETag según su versión.
+    - If-None-Match con el ETag actual: 304 sin llamar a generar
+    - precomprimir=True: reutiliza el cuerpo comprimido de la versión actual
+      o lo genera y comprime una sola vez
+    - generar: corrutina que produce el contenido (dict/lista) si hace falta
+    """
+    version = await versiones.obtener(coleccion)
+    etag = _etag(coleccion, version, variante)
+    encabezados = _encabezados(etag)
+
+    if _coincide_etag(request, etag):
+        cache_respuestas.no_modificados += 1
+        return Response(status_code=304, headers=encabezados)
+
+    if not precomprimir:
+        cache_respuestas.generados += 1
+        return Response(a_json(await generar()), media_type="application/json", headers=encabezados)
+
+    clave = f"{coleccion}:{variante}"
+    cuerpo = cache_respuestas.obtener(clave, version)
+    if cuerpo is not None:
+        cache_respuestas.aciertos += 1
+    else:
+        contenido = a_json(await generar())
+        cuerpo = await asyncio.to_thread(CuerpoPrecomprimido, version, etag, contenido)
+        cache_respuestas.guardar(clave, cuerpo)
+        cache_respuestas.generados += 1
+
+    codificacion = _elegir_codificacion(request, cuerpo.codificaciones)
+    if codificacion != "identity":
+        encabezados["Content-Encoding"] = codificacion
+    return Response(cuerpo.codificaciones[codificacion], media_type="application/json", headers=encabezados)
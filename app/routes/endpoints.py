@@ -6,10 +6,25 @@ Este módulo define todas las rutas HTTP de la API, organizadas en:
 - Endpoints de alumnos: datos detallados de bachillerato y universidad
 - Endpoints de asistencias: registro y consulta de asistencias
 - Endpoints de autenticación: login de usuarios
+- Endpoints de monitoreo: estadísticas por proceso y métricas de Prometheus (/metrics)
 
 Las rutas están organizadas con tags para documentación automática en Swagger/OpenAPI.
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import FileResponse, Response
+from typing import Literal, Optional
+from datetime import date
+import os
+from app.config import Config
+from app.database import obtener_estadisticas_pool
+from app.metricas import RutaMedida, exponer_metricas, familia
+from app.consultas_lentas import MAX_FORMAS, registro_consultas_lentas
+from app.paginacion import LIMITE_POR_DEFECTO, LIMITE_MAXIMO
+from app.serializacion import RespuestaJSON
+from app.respuesta_condicional import respuesta_condicional, cache_respuestas
+from app.streaming import respuesta_ndjson
+from app.cache import obtener_estadisticas_cache
+from app.snapshot import obtener_estadisticas_snapshot
 from app.services.usuario_service import (
     obtener_usuario_por_matricula,
     obtener_usuario_por_credenciales_db,
@@ -17,12 +32,20 @@ from app.services.usuario_service import (
     obtener_todos_maestros,
     obtener_datos_alumno_bachillerato,
     obtener_datos_alumno_universidad,
+    obtener_datos_alumno,
+    buscar_alumnos,
     obtener_todos_alumnos_bachillerato,
     obtener_todos_alumnos_universidad,
+    obtener_alumnos_bachillerato_paginados,
+    obtener_alumnos_universidad_paginados,
+    iterar_alumnos_bachillerato,
+    iterar_alumnos_universidad,
     crear_usuario_apodaca,
     autenticar_usuario_apodaca,
     cambiar_contraseña_usuario_apodaca,
     obtener_todos_usuarios_apodaca,
+    obtener_usuarios_apodaca_paginados,
+    iterar_usuarios_apodaca,
     obtener_usuario_por_correo_apodaca,
     eliminar_usuario_por_correo_apodaca,
     crear_alumno_bachillerato,
@@ -32,18 +55,33 @@ from app.services.usuario_service import (
 )
 from app.services.asistencia_service import (
     registrar_asistencia, 
+    registrar_asistencias_lote,
     obtener_todas_asistencias,
+    obtener_asistencias_paginadas,
+    iterar_asistencias,
     obtener_asistencias_por_matricula,
     obtener_todas_asistencias_apodaca,
+    obtener_asistencias_apodaca_paginadas,
+    iterar_asistencias_apodaca,
     obtener_asistencias_apodaca_por_matricula,
+    obtener_asistencias_apodaca_por_rango,
+    iterar_asistencias_apodaca_por_rango,
+    semana_actual,
+    obtener_hora_mexico,
     registrar_fichado_apodaca,
-    obtener_fichados_apodaca_agrupados
+    obtener_fichados_apodaca_agrupados,
+    buffer_fichados
 )
-from app.models.usuario import UsuarioResponse, LoginRequest, usuario_datos, UsuarioCreate, UsuarioLogin, UsuarioResponseApodaca, UsuarioCambiarContraseña, FichadoCreate
-from app.models.asistencia import AsistenciaCreate
+from app.services.importacion_service import importar_alumnos, leer_filas
+from app.services.estadisticas_service import obtener_estadisticas_diarias
+from app.services.reporte_service import solicitar_reporte_asistencias, obtener_estado_reporte, obtener_archivo_reporte
+from app.services.hash_service import ColaHashLlenaError
+from app.models.usuario import UsuarioResponse, LoginRequest, usuario_datos, AlumnoNivelResponse, UsuarioCreate, UsuarioLogin, UsuarioResponseApodaca, UsuarioCambiarContraseña, FichadoCreate
+from app.models.asistencia import AsistenciaCreate, AsistenciaLote, ReporteAsistenciasCreate
 
 # Router principal
-router = APIRouter()
+# RutaMedida registra latencia y código de estado de cada endpoint (ver app/metricas.py)
+router = APIRouter(route_class=RutaMedida)
 
 # ============================================================================
 # ENDPOINTS DE USUARIOS
@@ -52,44 +90,117 @@ router = APIRouter()
 
 
 @router.get("/api/usuarios/maestros/todos", tags=["usuarios"])
-async def obtener_maestros():
+async def obtener_maestros(request: Request):
     """
-    Obtiene todos los maestros de la colección 'maestros'
+    Obtiene todos los maestros de la colección 'maestros'.
+    Responde con ETag según la versión de la colección (304 con If-None-Match)
+    y con el cuerpo precomprimido (gzip/br) según Accept-Encoding.
     """
-    try:
-        maestros = obtener_todos_maestros()
+    async def generar():
+        maestros = await obtener_todos_maestros()
         return {
             "total": len(maestros),
             "maestros": maestros
         }
+
+    try:
+        return await respuesta_condicional(request, "maestros", generar, precomprimir=True)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/api/alumnos/bachillerato", tags=["alumnos"])
-async def obtener_todos_alumnos_bachillerato_endpoint():
-    """
-    Obtiene todos los alumnos de bachillerato de la colección 'alumnos_bachillerato'
-    """
-    try:
-        alumnos = obtener_todos_alumnos_bachillerato()
+async def obtener_todos_alumnos_bachillerato_endpoint(
+    request: Request,
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    completo: bool = False,
+    formato: Literal["json", "ndjson"] = "json"
+):
+    """
+    Obtiene los alumnos de bachillerato de la colección 'alumnos_bachillerato',
+    paginados por cursor: 'siguiente' se envía como 'cursor' para pedir la página siguiente.
+    Con completo=true retorna la colección completa en una sola respuesta.
+    Con formato=ndjson transmite la colección completa en streaming, un documento por línea.
+    Las respuestas JSON llevan ETag según la versión de la colección (304 con
+    If-None-Match); la colección completa se sirve precomprimida (gzip/br).
+    """
+    async def generar_completo():
+        alumnos = await obtener_todos_alumnos_bachillerato()
         return {
             "total": len(alumnos),
             "alumnos": alumnos
         }
+
+    async def generar_pagina():
+        alumnos, siguiente = await obtener_alumnos_bachillerato_paginados(limite, cursor)
+        return {
+            "total": len(alumnos),
+            "alumnos": alumnos,
+            "siguiente": siguiente
+        }
+
+    try:
+        if formato == "ndjson":
+            return respuesta_ndjson(iterar_alumnos_bachillerato())
+
+        if completo:
+            return await respuesta_condicional(
+                request, "alumnos_bachillerato_apodaca", generar_completo, precomprimir=True
+            )
+
+        return await respuesta_condicional(
+            request, "alumnos_bachillerato_apodaca", generar_pagina, variante=f"{limite}:{cursor or ''}"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/api/alumnos/universidad", tags=["alumnos"])
-async def obtener_todos_alumnos_universidad_endpoint():
-    """
-    Obtiene todos los alumnos de universidad de la colección 'alumnos_universidad'
-    """
-    try:
-        alumnos = obtener_todos_alumnos_universidad()
+async def obtener_todos_alumnos_universidad_endpoint(
+    request: Request,
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    completo: bool = False,
+    formato: Literal["json", "ndjson"] = "json"
+):
+    """
+    Obtiene los alumnos de universidad de la colección 'alumnos_universidad',
+    paginados por cursor: 'siguiente' se envía como 'cursor' para pedir la página siguiente.
+    Con completo=true retorna la colección completa en una sola respuesta.
+    Con formato=ndjson transmite la colección completa en streaming, un documento por línea.
+    Las respuestas JSON llevan ETag según la versión de la colección (304 con
+    If-None-Match); la colección completa se sirve precomprimida (gzip/br).
+    """
+    async def generar_completo():
+        alumnos = await obtener_todos_alumnos_universidad()
         return {
             "total": len(alumnos),
             "alumnos": alumnos
         }
+
+    async def generar_pagina():
+        alumnos, siguiente = await obtener_alumnos_universidad_paginados(limite, cursor)
+        return {
+            "total": len(alumnos),
+            "alumnos": alumnos,
+            "siguiente": siguiente
+        }
+
+    try:
+        if formato == "ndjson":
+            return respuesta_ndjson(iterar_alumnos_universidad())
+
+        if completo:
+            return await respuesta_condicional(
+                request, "alumnos_universidad_apodaca", generar_completo, precomprimir=True
+            )
+
+        return await respuesta_condicional(
+            request, "alumnos_universidad_apodaca", generar_pagina, variante=f"{limite}:{cursor or ''}"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -100,7 +211,7 @@ async def obtener_alumno_bachillerato(matricula: str):
     de la colección 'alumnos_bachillerato'
     """
     try:
-        alumno = obtener_datos_alumno_bachillerato(matricula)
+        alumno = await obtener_datos_alumno_bachillerato(matricula)
         if not alumno:
             raise HTTPException(status_code=404, detail="Alumno no encontrado")
         return alumno
@@ -116,7 +227,7 @@ async def obtener_alumno_universidad(matricula: str):
     de la colección 'alumnos_universidad'
     """
     try:
-        alumno = obtener_datos_alumno_universidad(matricula)
+        alumno = await obtener_datos_alumno_universidad(matricula)
         if not alumno:
             raise HTTPException(status_code=404, detail="Alumno no encontrado")
         return alumno
@@ -125,6 +236,44 @@ async def obtener_alumno_universidad(matricula: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/api/alumnos/buscar", tags=["alumnos"])
+async def buscar_alumnos_endpoint(
+    q: str = Query(..., min_length=1, max_length=100),
+    limite: int = Query(10, ge=1, le=50)
+):
+    """
+    Busca alumnos de bachillerato y universidad por nombre (autocompletado).
+    No distingue acentos ni mayúsculas; cada palabra de q debe ser el inicio
+    de una palabra del nombre. Retorna los más relevantes primero, con su nivel.
+    """
+    try:
+        alumnos = await buscar_alumnos(q, limite)
+        return RespuestaJSON({
+            "total": len(alumnos),
+            "alumnos": alumnos
+        })
+    except Exception as e:
+        print(f"Error en búsqueda de alumnos: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/alumnos/{matricula}", response_model=AlumnoNivelResponse, tags=["alumnos"])
+async def obtener_alumno(matricula: str):
+    """
+    Obtiene los datos de un alumno por su matrícula sin conocer su nivel:
+    busca en bachillerato y universidad en una sola petición y retorna el nivel.
+    Se declara después de las rutas fijas de /api/alumnos/... para no ocultarlas.
+    """
+    try:
+        resultado = await obtener_datos_alumno(matricula)
+        if not resultado:
+            raise HTTPException(status_code=404, detail="Alumno no encontrado")
+        nivel, alumno = resultado
+        return {"nivel": nivel, "alumno": alumno}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ============================================================================
 # ENDPOINTS DE ASISTENCIAS
 # ============================================================================
@@ -144,7 +293,7 @@ async def crear_registro_asistencia(asistencia: dict):
         if "nombre" not in asistencia:
             raise HTTPException(status_code=400, detail="El nombre es requerido")
         
-        resultado = registrar_asistencia(
+        resultado = await registrar_asistencia(
             matricula=asistencia["matricula"],
             nombre=asistencia["nombre"]
         )
@@ -160,13 +309,27 @@ async def crear_registro_asistencia(asistencia: dict):
 
 
 
+@router.post("/api/asistencias/registrar/lote", tags=["asistencias"])
+async def crear_registros_asistencia_lote(lote: AsistenciaLote):
+    """
+    Registra en una sola escritura las asistencias que un kiosco acumuló sin conexión.
+    Cada elemento lleva matricula, nombre y el timestamp original del escaneo.
+    Retorna por elemento si quedó registrado, si era duplicado o si falló.
+    """
+    try:
+        registros = [item.model_dump() for item in lote.registros]
+        return await registrar_asistencias_lote(registros)
+    except Exception as e:
+        print(f"Error al registrar lote de asistencias: {e}")
+        raise HTTPException(status_code=500, detail=f"Error al registrar lote de asistencias: {str(e)}")
+
 @router.get("/api/asistencias/matricula/{matricula}", tags=["asistencias"])
 async def obtener_asistencias_por_matricula_endpoint(matricula: str):
     """
     Obtiene todos los registros de asistencia de una matrícula específica
     """
     try:
-        asistencias = obtener_asistencias_por_matricula(matricula)
+        asistencias = await obtener_asistencias_por_matricula(matricula)
         return {
             "matricula": matricula,
             "total": len(asistencias),
@@ -176,35 +339,118 @@ async def obtener_asistencias_por_matricula_endpoint(matricula: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/api/asistencias/todas", tags=["asistencias"])
-async def obtener_todas_las_asistencias():
+async def obtener_todas_las_asistencias(
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    completo: bool = False,
+    formato: Literal["json", "ndjson"] = "json"
+):
     """
-    Obtiene todos los registros de la colección 'asistencia_general'
+    Obtiene los registros de la colección 'asistencia_general', más recientes primero,
+    paginados por cursor. Con completo=true retorna todos los registros.
+    Con formato=ndjson transmite la colección completa en streaming, un documento por línea.
     """
     try:
-        asistencias = obtener_todas_asistencias()
-        return {
+        if formato == "ndjson":
+            return respuesta_ndjson(iterar_asistencias())
+
+        if completo:
+            asistencias = await obtener_todas_asistencias()
+            return RespuestaJSON({
+                "coleccion": "asistencia_general",
+                "total": len(asistencias),
+                "asistencias": asistencias
+            })
+
+        asistencias, siguiente = await obtener_asistencias_paginadas(limite, cursor)
+        return RespuestaJSON({
             "coleccion": "asistencia_general",
             "total": len(asistencias),
-            "asistencias": asistencias
-        }
+            "asistencias": asistencias,
+            "siguiente": siguiente
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/api/asistencias/apodaca/todas", tags=["asistencias"])
-async def obtener_todas_las_asistencias_apodaca():
+async def obtener_todas_las_asistencias_apodaca(
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    completo: bool = False,
+    formato: Literal["json", "ndjson"] = "json"
+):
     """
-    Obtiene todos los registros de asistencia de la colección 'asistencia_general_apodaca'
+    Obtiene los registros de asistencia de la colección 'asistencia_general_apodaca',
+    más recientes primero, paginados por cursor. Con completo=true retorna todos los registros.
+    Con formato=ndjson transmite la colección completa en streaming, un documento por línea.
     """
     try:
-        asistencias = obtener_todas_asistencias_apodaca()
-        return {
+        if formato == "ndjson":
+            return respuesta_ndjson(iterar_asistencias_apodaca())
+
+        if completo:
+            asistencias = await obtener_todas_asistencias_apodaca()
+            return RespuestaJSON({
+                "coleccion": "asistencia_general_apodaca",
+                "total": len(asistencias),
+                "asistencias": asistencias
+            })
+
+        asistencias, siguiente = await obtener_asistencias_apodaca_paginadas(limite, cursor)
+        return RespuestaJSON({
             "coleccion": "asistencia_general_apodaca",
             "total": len(asistencias),
+            "asistencias": asistencias,
+            "siguiente": siguiente
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _respuesta_asistencias_por_rango(desde: date, hasta: date, formato: str):
+    """Respuesta común de los endpoints por rango de días"""
+    if hasta < desde:
+        raise HTTPException(status_code=400, detail="La fecha 'hasta' no puede ser anterior a 'desde'")
+    try:
+        if formato == "ndjson":
+            return respuesta_ndjson(iterar_asistencias_apodaca_por_rango(desde, hasta))
+
+        asistencias = await obtener_asistencias_apodaca_por_rango(desde, hasta)
+        return RespuestaJSON({
+            "coleccion": "asistencia_general_apodaca",
+            "desde": desde.isoformat(),
+            "hasta": hasta.isoformat(),
+            "total": len(asistencias),
             "asistencias": asistencias
-        }
+        })
     except Exception as e:
+        print(f"Error al obtener asistencias por rango: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/api/asistencias/semana-actual", tags=["asistencias"])
+async def obtener_asistencias_semana_actual(formato: Literal["json", "ndjson"] = "json"):
+    """
+    Obtiene los registros de asistencia de Apodaca de la semana actual
+    (lunes a domingo, horario de México), en orden cronológico.
+    """
+    desde, hasta = semana_actual()
+    return await _respuesta_asistencias_por_rango(desde, hasta, formato)
+
+@router.get("/api/asistencias/rango", tags=["asistencias"])
+async def obtener_asistencias_por_rango(
+    desde: date,
+    hasta: date,
+    formato: Literal["json", "ndjson"] = "json"
+):
+    """
+    Obtiene los registros de asistencia de Apodaca entre dos fechas
+    (YYYY-MM-DD, horario de México, inclusivo), en orden cronológico.
+    """
+    return await _respuesta_asistencias_por_rango(desde, hasta, formato)
+
 @router.get("/api/asistencias/apodaca/{matricula}", tags=["asistencias"])
 async def obtener_asistencias_apodaca_por_matricula_endpoint(matricula: str):
     """
@@ -212,7 +458,7 @@ async def obtener_asistencias_apodaca_por_matricula_endpoint(matricula: str):
     de la colección 'asistencia_general_apodaca'
     """
     try:
-        asistencias = obtener_asistencias_apodaca_por_matricula(matricula)
+        asistencias = await obtener_asistencias_apodaca_por_matricula(matricula)
         return {
             "matricula": matricula,
             "coleccion": "asistencia_general_apodaca",
@@ -229,7 +475,7 @@ async def login_usuario(datos: LoginRequest):
     Verifica credenciales de un usuario en la colección 'login'
     """
     try:
-        usuario = obtener_usuario_por_credenciales_db(
+        usuario = await obtener_usuario_por_credenciales_db(
             datos.username,
             datos.password
         )
@@ -262,13 +508,15 @@ async def crear_usuario(usuario: UsuarioCreate):
     La contraseña se hashea automáticamente antes de guardarse.
     """
     try:
-        nuevo_usuario = crear_usuario_apodaca(usuario)
+        nuevo_usuario = await crear_usuario_apodaca(usuario)
         return {
             "mensaje": "Usuario creado exitosamente",
             "usuario": nuevo_usuario
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except ColaHashLlenaError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"Error al crear usuario: {e}")
         raise HTTPException(status_code=500, detail=f"Error al crear usuario: {str(e)}")
@@ -280,7 +528,7 @@ async def login_usuario_apodaca(datos: UsuarioLogin):
     Verifica el correo y contraseña (hasheada).
     """
     try:
-        usuario = autenticar_usuario_apodaca(
+        usuario = await autenticar_usuario_apodaca(
             datos.correo,
             datos.contraseña
         )
@@ -298,6 +546,8 @@ async def login_usuario_apodaca(datos: UsuarioLogin):
 
     except HTTPException:
         raise
+    except ColaHashLlenaError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"Error en el servidor al intentar login: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -309,26 +559,48 @@ async def cambiar_contraseña(datos: UsuarioCambiarContraseña):
     Requiere validar la contraseña actual antes de cambiarla por la nueva.
     """
     try:
-        resultado = cambiar_contraseña_usuario_apodaca(datos)
+        resultado = await cambiar_contraseña_usuario_apodaca(datos)
         return resultado
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except ColaHashLlenaError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"Error al cambiar contraseña: {e}")
         raise HTTPException(status_code=500, detail=f"Error al cambiar contraseña: {str(e)}")
 
 @router.get("/api/usuarios/apodaca", tags=["usuarios_apodaca"])
-async def obtener_todos_usuarios():
-    """
-    Obtiene todos los usuarios de la base de datos usuarios_edec, colección usuarios_apodaca.
+async def obtener_todos_usuarios(
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    completo: bool = False,
+    formato: Literal["json", "ndjson"] = "json"
+):
+    """
+    Obtiene los usuarios de la base de datos usuarios_edec, colección usuarios_apodaca,
+    paginados por cursor. Con completo=true retorna todos los usuarios.
     Retorna todos los datos excepto las contraseñas.
+    Con formato=ndjson transmite la colección completa en streaming, un documento por línea.
     """
     try:
-        usuarios = obtener_todos_usuarios_apodaca()
-        return {
+        if formato == "ndjson":
+            return respuesta_ndjson(iterar_usuarios_apodaca())
+
+        if completo:
+            usuarios = await obtener_todos_usuarios_apodaca()
+            return RespuestaJSON({
+                "total": len(usuarios),
+                "usuarios": usuarios
+            })
+
+        usuarios, siguiente = await obtener_usuarios_apodaca_paginados(limite, cursor)
+        return RespuestaJSON({
             "total": len(usuarios),
-            "usuarios": usuarios
-        }
+            "usuarios": usuarios,
+            "siguiente": siguiente
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error al obtener usuarios: {e}")
         raise HTTPException(status_code=500, detail=f"Error al obtener usuarios: {str(e)}")
@@ -340,7 +612,7 @@ async def obtener_usuario_por_correo(correo: str):
     Retorna todos los datos del usuario excepto la contraseña.
     """
     try:
-        usuario = obtener_usuario_por_correo_apodaca(correo)
+        usuario = await obtener_usuario_por_correo_apodaca(correo)
         if not usuario:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         return usuario
@@ -357,7 +629,7 @@ async def eliminar_usuario(correo: str):
     Retorna información sobre el usuario eliminado.
     """
     try:
-        resultado = eliminar_usuario_por_correo_apodaca(correo)
+        resultado = await eliminar_usuario_por_correo_apodaca(correo)
         return resultado
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -377,7 +649,7 @@ async def registrar_fichado(fichado: FichadoCreate):
     """
     try:
         fichado_dict = fichado.model_dump()
-        resultado = registrar_fichado_apodaca(fichado_dict)
+        resultado = await registrar_fichado_apodaca(fichado_dict)
         return {
             "mensaje": "Fichado registrado exitosamente",
             "fichado": resultado
@@ -394,11 +666,11 @@ async def obtener_fichados_agrupados():
     con un campo cantidad_fichas que indica cuántas veces se repite.
     """
     try:
-        fichados = obtener_fichados_apodaca_agrupados()
-        return {
+        fichados = await obtener_fichados_apodaca_agrupados()
+        return RespuestaJSON({
             "total": len(fichados),
             "fichados": fichados
-        }
+        })
     except Exception as e:
         print(f"Error al obtener fichados: {e}")
         raise HTTPException(status_code=500, detail=f"Error al obtener fichados: {str(e)}")
@@ -414,7 +686,7 @@ async def crear_alumno_bachillerato_endpoint(alumno: usuario_datos):
     Requiere todos los campos del modelo de alumno.
     """
     try:
-        nuevo_alumno = crear_alumno_bachillerato(alumno)
+        nuevo_alumno = await crear_alumno_bachillerato(alumno)
         return {
             "mensaje": "Alumno creado exitosamente en bachillerato",
             "alumno": nuevo_alumno
@@ -432,7 +704,7 @@ async def crear_alumno_universidad_endpoint(alumno: usuario_datos):
     Requiere todos los campos del modelo de alumno.
     """
     try:
-        nuevo_alumno = crear_alumno_universidad(alumno)
+        nuevo_alumno = await crear_alumno_universidad(alumno)
         return {
             "mensaje": "Alumno creado exitosamente en universidad",
             "alumno": nuevo_alumno
@@ -443,6 +715,24 @@ async def crear_alumno_universidad_endpoint(alumno: usuario_datos):
         print(f"Error al crear alumno en universidad: {e}")
         raise HTTPException(status_code=500, detail=f"Error al crear alumno: {str(e)}")
 
+@router.post("/api/alumnos/{nivel}/importar", tags=["alumnos"])
+async def importar_alumnos_endpoint(nivel: Literal["bachillerato", "universidad"], archivo: UploadFile = File(...)):
+    """
+    Importa el padrón de alumnos de un nivel desde un archivo .xlsx o .csv.
+    La primera fila debe tener los encabezados (Matricula y Nombre son obligatorios;
+    Coordinador, Graduado, Correo, Campus, Programa, Ciclo y Turno son opcionales).
+    Las matrículas existentes se actualizan y las nuevas se insertan.
+    Retorna los totales y el reporte de errores por número de fila.
+    """
+    try:
+        filas = leer_filas(archivo.file, archivo.filename or "")
+        return await importar_alumnos(nivel, filas)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error al importar alumnos de {nivel}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error al importar alumnos: {str(e)}")
+
 @router.delete("/api/alumnos/bachillerato/{matricula}", tags=["alumnos"])
 async def eliminar_alumno_bachillerato_endpoint(matricula: str):
     """
@@ -450,7 +740,7 @@ async def eliminar_alumno_bachillerato_endpoint(matricula: str):
     Retorna información sobre el alumno eliminado.
     """
     try:
-        resultado = eliminar_alumno_bachillerato(matricula)
+        resultado = await eliminar_alumno_bachillerato(matricula)
         return resultado
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -465,10 +755,200 @@ async def eliminar_alumno_universidad_endpoint(matricula: str):
     Retorna información sobre el alumno eliminado.
     """
     try:
-        resultado = eliminar_alumno_universidad(matricula)
+        resultado = await eliminar_alumno_universidad(matricula)
         return resultado
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         print(f"Error al eliminar alumno de universidad: {e}")
-        raise HTTPException(status_code=500, detail=f"Error al eliminar alumno: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al eliminar alumno: {str(e)}")
+
+# ============================================================================
+# ENDPOINTS DE ESTADÍSTICAS
+# ============================================================================
+
+@router.get("/api/estadisticas/diarias", tags=["estadisticas"])
+async def obtener_estadisticas_diarias_endpoint(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    campus: Optional[str] = None,
+    programa: Optional[str] = None,
+    turno: Optional[str] = None,
+    agrupar_por: Optional[Literal["campus", "programa", "turno"]] = None
+):
+    """
+    Retorna por día el total de asistencias y su desglose por campus/programa/turno,
+    desde la colección pre-agregada estadisticas_diarias (sin recorrer los registros).
+    - desde / hasta: rango de días (YYYY-MM-DD, horario de México); por defecto hoy
+    - campus, programa, turno: filtran los grupos
+    - agrupar_por: suma el desglose solo por ese campo (ej: agrupar_por=programa)
+    """
+    hoy = obtener_hora_mexico().date()
+    desde = desde or hasta or hoy
+    hasta = hasta or desde
+    try:
+        dias = await obtener_estadisticas_diarias(desde, hasta, campus, programa, turno, agrupar_por)
+        return {
+            "desde": desde.isoformat(),
+            "hasta": hasta.isoformat(),
+            "total": sum(dia["total"] for dia in dias),
+            "dias": dias
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error al obtener estadísticas diarias: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ============================================================================
+# ENDPOINTS DE REPORTES EXCEL
+# ============================================================================
+
+@router.post("/api/reportes/asistencias", tags=["reportes"])
+async def solicitar_reporte_asistencias_endpoint(filtros: ReporteAsistenciasCreate):
+    """
+    Solicita un reporte Excel de asistencias de Apodaca por rango de fechas,
+    opcionalmente filtrado por campus, programa y turno del alumno.
+    El reporte se genera en segundo plano: consultar su estado con
+    GET /api/reportes/{id} y descargarlo con GET /api/reportes/{id}/descargar.
+    Si ya existe un reporte con los mismos filtros se reutiliza.
+    """
+    try:
+        return await solicitar_reporte_asistencias(**filtros.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error al solicitar reporte: {e}")
+        raise HTTPException(status_code=500, detail=f"Error al solicitar reporte: {str(e)}")
+
+@router.get("/api/reportes/{reporte_id}", tags=["reportes"])
+async def obtener_estado_reporte_endpoint(reporte_id: str):
+    """
+    Retorna el estado de un reporte (pendiente, en_proceso, completado o error).
+    """
+    try:
+        return obtener_estado_reporte(reporte_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/api/reportes/{reporte_id}/descargar", tags=["reportes"])
+async def descargar_reporte_endpoint(reporte_id: str):
+    """
+    Descarga el archivo .xlsx de un reporte completado.
+    """
+    try:
+        ruta = obtener_archivo_reporte(reporte_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return FileResponse(
+        ruta,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename=os.path.basename(ruta)
+    )
+
+# ============================================================================
+# ENDPOINTS DE MONITOREO
+# ============================================================================
+
+@router.get("/api/monitoreo/cache", tags=["monitoreo"])
+async def obtener_estadisticas_cache_endpoint():
+    """
+    Retorna los contadores de la caché de alumnos por matrícula
+    (entradas, aciertos, fallos, desalojos y tasa de aciertos) de este proceso.
+    """
+    return obtener_estadisticas_cache()
+
+@router.get("/api/monitoreo/snapshot", tags=["monitoreo"])
+async def obtener_estadisticas_snapshot_endpoint():
+    """
+    Retorna la versión, número de alumnos y tamaño de los snapshots de roster
+    compartidos que tiene mapeados este proceso.
+    """
+    return obtener_estadisticas_snapshot()
+
+@router.get("/api/monitoreo/fichados-buffer", tags=["monitoreo"])
+async def obtener_estadisticas_buffer_fichados():
+    """
+    Retorna la profundidad de la cola de escritura diferida de fichados y la
+    latencia de sus escrituras por lote (última, promedio y máxima) en este proceso.
+    """
+    return {"habilitado": Config.FICHADOS_BUFFER, "ack": Config.FICHADOS_ACK, **buffer_fichados.estadisticas()}
+
+@router.get("/api/monitoreo/pool-mongo", tags=["monitoreo"])
+async def obtener_estadisticas_pool_endpoint():
+    """
+    Retorna la configuración del cliente de MongoDB (pool, compresión, lectura de
+    reportes) y, por servidor, las conexiones abiertas, en uso y en espera, los
+    checkouts y el tiempo de espera por una conexión libre en este proceso.
+    """
+    return obtener_estadisticas_pool()
+
+@router.get("/api/monitoreo/consultas-lentas", tags=["monitoreo"])
+async def obtener_consultas_lentas(
+    limite: int = Query(20, ge=1, le=MAX_FORMAS),
+    orden: Literal["total_ms", "max_ms", "conteo"] = "total_ms"
+):
+    """
+    Retorna las formas de consulta más lentas de este proceso (comandos sobre
+    CONSULTAS_LENTAS_MS): colección, forma sin valores, rutas que las originan,
+    conteo, tiempo total, promedio y máximo, y el resumen del plan (explain).
+    """
+    return {
+        "umbral_ms": Config.CONSULTAS_LENTAS_MS,
+        "formas": registro_consultas_lentas.formas_mas_lentas(limite, orden)
+    }
+
+def _familias_monitoreo() -> list:
+    """Medidores de cachés, pool de MongoDB y cola de fichados para /metrics"""
+    caches = obtener_estadisticas_cache().values()
+    servidores = obtener_estadisticas_pool()["servidores"]
+    buffer = buffer_fichados.estadisticas()
+    respuestas = cache_respuestas.estadisticas()
+    return [
+        familia("asistencia_roster_cache_entries", "gauge", "Entradas en la caché de alumnos",
+                [({"cache": c["cache"]}, c["entradas"]) for c in caches]),
+        familia("asistencia_roster_cache_hits_total", "counter", "Aciertos de la caché de alumnos",
+                [({"cache": c["cache"]}, c["aciertos"]) for c in caches]),
+        familia("asistencia_roster_cache_misses_total", "counter", "Fallos de la caché de alumnos",
+                [({"cache": c["cache"]}, c["fallos"]) for c in caches]),
+        familia("asistencia_roster_cache_evictions_total", "counter", "Desalojos de la caché de alumnos",
+                [({"cache": c["cache"]}, c["desalojos"]) for c in caches]),
+        familia("asistencia_mongodb_pool_connections", "gauge", "Conexiones del pool por estado",
+                [({"server": servidor, "state": estado}, datos[clave])
+                 for servidor, datos in servidores.items()
+                 for estado, clave in (("open", "abiertas"), ("in_use", "en_uso"), ("waiting", "esperando"))]),
+        familia("asistencia_mongodb_pool_max_connections", "gauge", "Tamaño máximo del pool",
+                [({}, Config.MONGO_MAX_POOL_SIZE)]),
+        familia("asistencia_mongodb_pool_checkouts_total", "counter", "Conexiones tomadas del pool",
+                [({"server": servidor}, datos["checkouts"]) for servidor, datos in servidores.items()]),
+        familia("asistencia_mongodb_pool_checkout_wait_seconds_total", "counter", "Tiempo esperando una conexión libre",
+                [({"server": servidor}, datos["espera_total_ms"] / 1000) for servidor, datos in servidores.items()]),
+        familia("asistencia_fichados_buffer_depth", "gauge", "Fichados en cola de escritura",
+                [({}, buffer["profundidad_cola"])]),
+        familia("asistencia_fichados_buffer_documents_total", "counter", "Fichados escritos por lote",
+                [({}, buffer["documentos_escritos"])]),
+        familia("asistencia_fichados_buffer_errors_total", "counter", "Fichados con error de escritura",
+                [({}, buffer["errores"])]),
+        familia("asistencia_http_not_modified_total", "counter", "Respuestas 304 por ETag",
+                [({}, respuestas["respuestas_304"])]),
+    ]
+
+@router.get("/metrics", tags=["monitoreo"])
+async def obtener_metricas():
+    """
+    Métricas de este proceso en formato de texto de Prometheus: latencia,
+    peticiones en curso y códigos de estado por ruta, latencia de comandos de
+    MongoDB por colección, y medidores de cachés, pool y cola de fichados.
+    """
+    return Response(
+        exponer_metricas(_familias_monitoreo()),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@router.get("/api/monitoreo/respuestas", tags=["monitoreo"])
+async def obtener_estadisticas_respuestas():
+    """
+    Retorna las respuestas 304, los aciertos de cuerpos precomprimidos y el
+    tamaño por codificación de cada cuerpo guardado en este proceso.
+    """
+    return cache_respuestas.estadisticas()
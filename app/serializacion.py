@@ -0,0 +1,50 @@
+"""
+Serialización rápida de documentos de MongoDB a JSON.
+
+Los endpoints de listas devuelven documentos crudos de BSON (con ObjectId y
+datetime) y este módulo los convierte directamente a bytes con orjson, que
+serializa datetime/date de forma nativa; ObjectId se resuelve en la función
+default. Así se evita construir un modelo Pydantic por registro, los ciclos
+que convertían cada _id y timestamp a string, y la segunda pasada de
+validación/codificación de FastAPI (jsonable_encoder + json.dumps).
+
+Si orjson no está instalado se usa json de la biblioteca estándar con la
+misma función default (mismo resultado, más lento).
+"""
+import json
+from datetime import date, datetime
+from typing import Any
+from bson import ObjectId
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Sin orjson: json estándar
+    orjson = None
+
+def _json_default(valor: Any):
+    """Serializa los tipos de BSON que el codificador no conoce"""
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+def a_json(contenido: Any) -> bytes:
+    """Codifica un valor (dicts/listas con ObjectId y datetime) como JSON UTF-8"""
+    if orjson is not None:
+        return orjson.dumps(contenido, default=_json_default)
+    return json.dumps(
+        contenido, default=_json_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+class RespuestaJSON(Response):
+    """
+    Respuesta JSON que serializa el contenido con a_json.
+    FastAPI no vuelve a validar ni codificar un Response, así que el contenido
+    puede llevar documentos de MongoDB sin convertir.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return a_json(content)
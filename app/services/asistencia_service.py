@@ -1,15 +1,25 @@
 """
 Servicios de lógica de negocio para operaciones con asistencias.
 
-Este módulo contiene las funciones que interactúan con MongoDB para:
-- Registrar asistencias con matrícula, nombre, fecha y hora
-- Obtener listas completas de asistencias
+Este módulo contiene las funciones asíncronas que interactúan con MongoDB para:
+- Registrar asistencias con matrícula, nombre, fecha y hora (una a una o en lote)
+- Obtener listas completas de asistencias, paginadas por cursor (keyset)
+  o como iteradores para respuestas en streaming
 - Consultar asistencias por matrícula específica
 - Manejo de zona horaria de México para fechas y horas
 """
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.buffer_escritura import BufferEscritura
+from app.config import Config
 from app.database import get_db
-from typing import List, Dict
+from app.indices import indice_disponible
+from app.matricula import normalizar_matricula, filtro_matricula, filtro_matriculas
+from app.paginacion import obtener_pagina
+from app.services.estadisticas_service import incrementar_estadisticas_diarias
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 import pytz
 
 def obtener_hora_mexico():
@@ -20,43 +30,94 @@ def obtener_hora_mexico():
     ahora_mexico = datetime.now(zona_mexico)
     return ahora_mexico
 
-def registrar_asistencia(matricula: str, nombre: str) -> dict:
+def a_hora_mexico(momento: datetime) -> datetime:
+    """
+    Convierte un datetime al horario de México.
+    Un datetime sin zona horaria se interpreta como hora local de México.
+    """
+    zona_mexico = pytz.timezone('America/Mexico_City')
+    if momento.tzinfo is None:
+        return zona_mexico.localize(momento)
+    return momento.astimezone(zona_mexico)
+
+def dia_mexico(momento_mexico: datetime) -> datetime:
+    """
+    Día calendario (horario de México) de un momento, como datetime a medianoche.
+    MongoDB no tiene tipo fecha sin hora; así el día se puede ordenar y consultar por rango.
+    """
+    return datetime(momento_mexico.year, momento_mexico.month, momento_mexico.day)
+
+def semana_actual() -> Tuple[date, date]:
+    """Lunes y domingo de la semana actual en horario de México"""
+    hoy = obtener_hora_mexico().date()
+    lunes = hoy - timedelta(days=hoy.weekday())
+    return lunes, lunes + timedelta(days=6)
+
+def _crear_registro_asistencia(matricula: str, nombre: str, momento_mexico: datetime) -> Dict:
+    """Construye el documento de asistencia con campos en mayúscula (como en MongoDB)"""
+    return {
+        "Matricula": matricula,
+        "Nombre": nombre,
+        "Fecha": momento_mexico.strftime("%d/%m/%Y"),
+        "Hora": momento_mexico.strftime("%H:%M"),
+        "fecha_dia": dia_mexico(momento_mexico),
+        "timestamp": momento_mexico
+    }
+
+def _indice_unico_disponible() -> bool:
+    return indice_disponible("asistencia_general_apodaca", "matricula_fecha_unico")
+
+async def _duplicados_sin_indice(coleccion, documentos: List[Dict]) -> Dict[int, Dict]:
+    """
+    Respaldo mientras falta el índice único (Matricula, Fecha): marca como
+    duplicados (código 11000, como el índice) los documentos que ya tienen
+    registro en su fecha y los repetidos dentro del mismo lote.
+    """
+    existentes = set()
+    filtro = {
+        **filtro_matriculas(documento["Matricula"] for documento in documentos),
+        "Fecha": {"$in": list({documento["Fecha"] for documento in documentos})}
+    }
+    async for registro in coleccion.find(filtro, {"Matricula": 1, "Fecha": 1, "_id": 0}):
+        existentes.add((normalizar_matricula(registro["Matricula"]), registro["Fecha"]))
+
+    errores = {}
+    for indice, documento in enumerate(documentos):
+        clave = (documento["Matricula"], documento["Fecha"])
+        if clave in existentes:
+            errores[indice] = {"index": indice, "code": 11000, "errmsg": "Registro duplicado"}
+        existentes.add(clave)
+    return errores
+
+async def registrar_asistencia(matricula: str, nombre: str) -> dict:
     """
     Registra la asistencia de entrada de una matrícula.
-    - Solo permite un registro por matrícula por día
+    - Solo permite un registro por matrícula por día (índice único Matricula + Fecha)
     - Guarda: Matricula, Nombre, Fecha (DD/MM/YYYY), Hora (HH:MM)
     - Almacena en la colección 'asistencia_general_apodaca'
     """
 
     db = get_db()
     coleccion = db.asistencia_general_apodaca
+    matricula = normalizar_matricula(matricula)
 
-    # Obtener fecha y hora en horario de México
-    ahora_mexico = obtener_hora_mexico()
-    fecha_formato = ahora_mexico.strftime("%d/%m/%Y")
-    hora_formato = ahora_mexico.strftime("%H:%M")
-
-    # Verificar si ya existe un registro para esta matrícula hoy
-    registro_existente = coleccion.find_one({
-        "Matricula": matricula,
-        "Fecha": fecha_formato
-    })
+    # Crear el registro con la fecha y hora en horario de México
+    registro = _crear_registro_asistencia(matricula, nombre, obtener_hora_mexico())
+    fecha_formato = registro["Fecha"]
 
-    if registro_existente:
+    # Insertar en la colección. El índice único (Matricula, Fecha) rechaza
+    # un segundo registro del mismo día sin necesidad de consultarlo antes
+    if not _indice_unico_disponible() and await coleccion.find_one(
+        {**filtro_matricula(matricula), "Fecha": fecha_formato}, {"_id": 1}
+    ):
         raise ValueError(f"La matrícula {matricula} ya tiene un registro de asistencia para hoy ({fecha_formato})")
-
-    # Crear el registro con campos en mayúscula (como en MongoDB)
-    registro = {
-        "Matricula": matricula,
-        "Nombre": nombre,
-        "Fecha": fecha_formato,
-        "Hora": hora_formato,
-        "timestamp": ahora_mexico
-    }
-
-    # Insertar en la colección
-    resultado = coleccion.insert_one(registro)
+    try:
+        resultado = await coleccion.insert_one(registro)
+    except DuplicateKeyError:
+        raise ValueError(f"La matrícula {matricula} ya tiene un registro de asistencia para hoy ({fecha_formato})")
+    await incrementar_estadisticas_diarias([registro])
     registro["_id"] = str(resultado.inserted_id)
+    registro["fecha_dia"] = registro["fecha_dia"].date().isoformat()
 
     return {
         "id": registro["_id"],
@@ -64,31 +125,129 @@ def registrar_asistencia(matricula: str, nombre: str) -> dict:
         "registro": registro
     }
 
-
-
-def obtener_todas_asistencias() -> List[Dict]:
+async def registrar_asistencias_lote(registros: List[Dict]) -> Dict:
     """
-    Obtiene todos los registros de la colección 'asistencia_general'
+    Registra varias asistencias en una sola escritura (insert_many sin orden).
+    - Cada registro usa el timestamp del escaneo original (o la hora actual si no lo trae),
+      por lo que la Fecha corresponde al día en que se escaneó
+    - El índice único (Matricula, Fecha) marca los duplicados, incluidos los repetidos
+      dentro del mismo lote; el resto del lote se inserta de todas formas. Si el
+      índice no existe, los duplicados se buscan con una consulta previa
+    - Retorna el resultado de cada elemento en el mismo orden en que se recibió
     """
     db = get_db()
-    coleccion = db.asistencia_general
-    registros = list(coleccion.find().sort("timestamp", -1))  # Más recientes primero
-    
-    # Convertir ObjectId a string y timestamp a ISO format
+    coleccion = db.asistencia_general_apodaca
+
+    documentos = []
+    for item in registros:
+        momento = item.get("timestamp")
+        momento_mexico = a_hora_mexico(momento) if momento else obtener_hora_mexico()
+        documentos.append(_crear_registro_asistencia(
+            normalizar_matricula(item["matricula"]),
+            item["nombre"],
+            momento_mexico
+        ))
+
+    errores = {} if _indice_unico_disponible() else await _duplicados_sin_indice(coleccion, documentos)
+    por_insertar = [indice for indice in range(len(documentos)) if indice not in errores]
+    if por_insertar:
+        try:
+            await coleccion.insert_many([documentos[indice] for indice in por_insertar], ordered=False)
+        except BulkWriteError as e:
+            # index de cada error es la posición dentro de por_insertar
+            for error in e.details.get("writeErrors", []):
+                errores[por_insertar[error["index"]]] = error
+
+    await incrementar_estadisticas_diarias(
+        documento for indice, documento in enumerate(documentos) if indice not in errores
+    )
+
+    resultados = []
+    for indice, documento in enumerate(documentos):
+        resultado = {
+            "indice": indice,
+            "matricula": documento["Matricula"],
+            "fecha": documento["Fecha"],
+            "hora": documento["Hora"]
+        }
+        error = errores.get(indice)
+        if error is None:
+            resultado["estado"] = "registrado"
+            resultado["id"] = str(documento["_id"])
+        elif error.get("code") == 11000:
+            resultado["estado"] = "duplicado"
+            resultado["mensaje"] = f"La matrícula {documento['Matricula']} ya tiene un registro de asistencia para el {documento['Fecha']}"
+        else:
+            resultado["estado"] = "error"
+            resultado["mensaje"] = error.get("errmsg", "Error desconocido")
+        resultados.append(resultado)
+
+    return {
+        "mensaje": "Lote de asistencias procesado",
+        "total": len(resultados),
+        "registrados": sum(1 for r in resultados if r["estado"] == "registrado"),
+        "duplicados": sum(1 for r in resultados if r["estado"] == "duplicado"),
+        "errores": sum(1 for r in resultados if r["estado"] == "error"),
+        "resultados": resultados
+    }
+
+def _serializar_registros(registros: List[Dict]) -> List[Dict]:
+    """Convierte ObjectId a string, timestamp a ISO format y fecha_dia a YYYY-MM-DD"""
     for registro in registros:
         registro["_id"] = str(registro["_id"])
         if isinstance(registro.get("timestamp"), datetime):
             registro["timestamp"] = registro["timestamp"].isoformat()
-    
+        if isinstance(registro.get("fecha_dia"), datetime):
+            registro["fecha_dia"] = registro["fecha_dia"].date().isoformat()
     return registros
 
-def obtener_asistencias_por_matricula(matricula: str) -> List[Dict]:
+def _preparar_registro(registro: Dict) -> Dict:
+    """
+    Deja el registro crudo para app/serializacion.py (ObjectId y datetime se
+    codifican al responder); solo fecha_dia se reduce a la fecha (YYYY-MM-DD)
+    """
+    fecha_dia = registro.get("fecha_dia")
+    if isinstance(fecha_dia, datetime):
+        registro["fecha_dia"] = fecha_dia.date()
+    return registro
+
+async def obtener_todas_asistencias() -> List[Dict]:
+    """
+    Obtiene todos los registros de la colección 'asistencia_general'
+    """
+    db = get_db()
+    coleccion = db.asistencia_general
+    # Más recientes primero; documentos crudos (ver app/serializacion.py)
+    return await coleccion.find().sort("timestamp", -1).to_list()
+
+async def obtener_asistencias_paginadas(limite: int, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Obtiene una página de la colección 'asistencia_general', más recientes primero.
+    Retorna los registros y el cursor de la siguiente página.
+    """
+    db = get_db()
+    return await obtener_pagina(db.asistencia_general, "timestamp", -1, limite, cursor)
+
+async def iterar_asistencias() -> AsyncIterator[Dict]:
+    """
+    Recorre la colección 'asistencia_general' por lotes, más recientes primero,
+    sin cargarla completa en memoria.
+    """
+    db = get_db()
+    cursor = db.asistencia_general.find().sort("timestamp", -1).batch_size(Config.STREAM_BATCH_SIZE)
+    try:
+        async for registro in cursor:
+            yield registro
+    finally:
+        await cursor.close()
+
+async def obtener_asistencias_por_matricula(matricula: str) -> List[Dict]:
     """
     Obtiene todos los registros de asistencia de una matrícula específica
     """
     db = get_db()
     coleccion = db.asistencia_general
-    registros = list(coleccion.find({"matricula": matricula}).sort("timestamp", -1))
+    registros = await coleccion.find({"matricula": matricula}).sort("timestamp", -1).to_list()
     
     # Convertir ObjectId a string y timestamp a ISO format
     for registro in registros:
@@ -98,53 +257,90 @@ def obtener_asistencias_por_matricula(matricula: str) -> List[Dict]:
     
     return registros
 
-def obtener_todas_asistencias_apodaca() -> List[Dict]:
+async def obtener_todas_asistencias_apodaca() -> List[Dict]:
     """
     Obtiene todos los registros de asistencia de la colección 'asistencia_general_apodaca'
     """
     db = get_db()
     coleccion = db.asistencia_general_apodaca
-    registros = list(coleccion.find().sort("timestamp", -1))  # Más recientes primero
-    
-    # Convertir ObjectId a string y timestamp a ISO format
-    for registro in registros:
-        registro["_id"] = str(registro["_id"])
-        if isinstance(registro.get("timestamp"), datetime):
-            registro["timestamp"] = registro["timestamp"].isoformat()
-    
-    return registros
+    registros = await coleccion.find().sort("timestamp", -1).to_list()  # Más recientes primero
+
+    return [_preparar_registro(registro) for registro in registros]
+
+async def obtener_asistencias_apodaca_paginadas(limite: int, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Obtiene una página de la colección 'asistencia_general_apodaca', más recientes primero.
+    Retorna los registros y el cursor de la siguiente página.
+    """
+    db = get_db()
+    registros, siguiente = await obtener_pagina(db.asistencia_general_apodaca, "timestamp", -1, limite, cursor)
+    return [_preparar_registro(registro) for registro in registros], siguiente
 
-def obtener_asistencias_apodaca_por_matricula(matricula: str) -> List[Dict]:
+async def iterar_asistencias_apodaca() -> AsyncIterator[Dict]:
+    """
+    Recorre la colección 'asistencia_general_apodaca' por lotes, más recientes primero,
+    sin cargarla completa en memoria.
+    """
+    db = get_db()
+    cursor = db.asistencia_general_apodaca.find().sort("timestamp", -1).batch_size(Config.STREAM_BATCH_SIZE)
+    try:
+        async for registro in cursor:
+            yield _preparar_registro(registro)
+    finally:
+        await cursor.close()
+
+async def obtener_asistencias_apodaca_por_matricula(matricula: str) -> List[Dict]:
     """
     Obtiene todos los registros de asistencia de una matrícula específica
     de la colección 'asistencia_general_apodaca'
     """
     db = get_db()
     coleccion = db.asistencia_general_apodaca
-    # Buscar por Matricula (con mayúscula) como string
-    registros = list(coleccion.find({"Matricula": matricula}).sort("timestamp", -1))
-    
-    # Si no se encuentra, intentar como int
-    if not registros:
-        try:
-            matricula_int = int(matricula)
-            registros = list(coleccion.find({"Matricula": matricula_int}).sort("timestamp", -1))
-        except (ValueError, TypeError):
-            pass
-    
-    # Convertir ObjectId a string y timestamp a ISO format
-    for registro in registros:
-        registro["_id"] = str(registro["_id"])
-        if isinstance(registro.get("timestamp"), datetime):
-            registro["timestamp"] = registro["timestamp"].isoformat()
-    
-    return registros
+    # Una sola consulta por Matricula (con mayúscula), ver app/matricula.py
+    registros = await coleccion.find(filtro_matricula(matricula)).sort("timestamp", -1).to_list()
+
+    return _serializar_registros(registros)
+
+def _filtro_rango_dias(desde: date, hasta: date) -> Dict:
+    """Filtro por fecha_dia entre desde y hasta (inclusivo)"""
+    if hasta < desde:
+        raise ValueError("La fecha 'hasta' no puede ser anterior a 'desde'")
+    return {"fecha_dia": {"$gte": datetime.combine(desde, time.min), "$lte": datetime.combine(hasta, time.min)}}
+
+# Orden del índice fecha_dia_timestamp: el rango y el orden se resuelven con un solo recorrido del índice
+ORDEN_RANGO_DIAS = [("fecha_dia", 1), ("timestamp", 1)]
+
+async def obtener_asistencias_apodaca_por_rango(desde: date, hasta: date) -> List[Dict]:
+    """
+    Obtiene los registros de 'asistencia_general_apodaca' entre dos días
+    (horario de México, inclusivo), en orden cronológico.
+    """
+    db = get_db()
+    registros = await db.asistencia_general_apodaca.find(
+        _filtro_rango_dias(desde, hasta)
+    ).sort(ORDEN_RANGO_DIAS).to_list()
+    return [_preparar_registro(registro) for registro in registros]
+
+async def iterar_asistencias_apodaca_por_rango(desde: date, hasta: date) -> AsyncIterator[Dict]:
+    """
+    Recorre por lotes los registros de 'asistencia_general_apodaca' entre dos días
+    (horario de México, inclusivo), en orden cronológico.
+    """
+    db = get_db()
+    cursor = db.asistencia_general_apodaca.find(
+        _filtro_rango_dias(desde, hasta)
+    ).sort(ORDEN_RANGO_DIAS).batch_size(Config.STREAM_BATCH_SIZE)
+    try:
+        async for registro in cursor:
+            yield _preparar_registro(registro)
+    finally:
+        await cursor.close()
 
 # ============================================================================
 # FUNCIONES PARA FICHADOS DE APODACA (Base de datos asistencia_edec)
 # ============================================================================
 
-def registrar_fichado_apodaca(fichado_data: dict) -> Dict:
+async def registrar_fichado_apodaca(fichado_data: dict) -> Dict:
     """
     Registra un fichado en la base de datos asistencia_edec, colección fichados_apodaca.
     Agrega automáticamente la fecha_registro_ficha con fecha y hora actual.
@@ -157,7 +353,7 @@ def registrar_fichado_apodaca(fichado_data: dict) -> Dict:
     
     # Crear el documento del fichado
     fichado = {
-        "matricula": fichado_data["matricula"],
+        "matricula": normalizar_matricula(fichado_data["matricula"]),
         "nombre": fichado_data["nombre"],
         "coordinador": fichado_data["coordinador"],
         "graduado": fichado_data["graduado"],
@@ -169,9 +365,18 @@ def registrar_fichado_apodaca(fichado_data: dict) -> Dict:
         "fecha_registro_ficha": ahora_mexico
     }
     
-    # Insertar en la base de datos
-    resultado = coleccion.insert_one(fichado)
-    fichado["_id"] = str(resultado.inserted_id)
+    if Config.FICHADOS_BUFFER:
+        # Escritura diferida: el _id se genera aquí para poder responder antes del insert
+        fichado["_id"] = ObjectId()
+        await buffer_fichados.agregar(dict(fichado), ack=Config.FICHADOS_ACK)
+    else:
+        # Insertar en la base de datos
+        resultado = await coleccion.insert_one(fichado)
+        fichado["_id"] = resultado.inserted_id
+        if Config.FICHADOS_RESUMEN:
+            await _actualizar_resumen_fichados([fichado])
+
+    fichado["_id"] = str(fichado["_id"])
     
     # Convertir fecha_registro_ficha a ISO format
     if isinstance(fichado.get("fecha_registro_ficha"), datetime):
@@ -179,44 +384,81 @@ def registrar_fichado_apodaca(fichado_data: dict) -> Dict:
     
     return fichado
 
-def obtener_fichados_apodaca_agrupados() -> List[Dict]:
+CAMPOS_FICHADO = ["coordinador", "graduado", "correo", "campus", "programa", "ciclo", "turno"]
+
+async def _actualizar_resumen_fichados(fichados: List[Dict]):
+    """
+    Mantiene el conteo materializado con $inc atómicos (un documento por alumno).
+    Los updates van en orden para que el $set del fichado más reciente prevalezca.
+    """
+    if not Config.FICHADOS_RESUMEN:
+        return
+    operaciones = [
+        UpdateOne(
+            {"_id": {"nombre": fichado["nombre"], "matricula": fichado["matricula"]}},
+            {
+                "$inc": {"cantidad_fichas": 1},
+                "$set": {campo: fichado[campo] for campo in CAMPOS_FICHADO},
+                "$max": {"ultima_ficha": fichado["fecha_registro_ficha"]}
+            },
+            upsert=True
+        )
+        for fichado in fichados
+    ]
+    await get_db().fichados_resumen.bulk_write(operaciones, ordered=True)
+
+# Cola de escritura diferida de fichados (solo se usa con FICHADOS_BUFFER activo)
+buffer_fichados = BufferEscritura(
+    "fichados_apodaca",
+    lambda: get_db().fichados_apodaca,
+    Config.FICHADOS_BUFFER_MS,
+    Config.FICHADOS_BUFFER_MAX,
+    despues_de_escribir=_actualizar_resumen_fichados
+)
+
+def pipeline_fichados_agrupados() -> List[Dict]:
+    """
+    Pipeline de agregación que agrupa los fichados por (nombre, matricula).
+    Conserva los datos del fichado más reciente de cada alumno y cuenta sus fichas;
+    los grupos quedan ordenados del fichado más reciente al más antiguo.
+    """
+    return [
+        {"$sort": {"fecha_registro_ficha": -1}},
+        {"$group": {
+            "_id": {"nombre": "$nombre", "matricula": "$matricula"},
+            **{campo: {"$first": f"${campo}"} for campo in CAMPOS_FICHADO},
+            "cantidad_fichas": {"$sum": 1},
+            "ultima_ficha": {"$max": "$fecha_registro_ficha"}
+        }},
+        {"$sort": {"ultima_ficha": -1}}
+    ]
+
+def _formatear_fichado_agrupado(grupo: Dict) -> Dict:
+    """Da al resultado del $group (o de fichados_resumen) el formato de la respuesta"""
+    fichado_agrupado = {
+        "matricula": grupo["_id"].get("matricula") or "",
+        "nombre": grupo["_id"].get("nombre") or ""
+    }
+    for campo in CAMPOS_FICHADO:
+        fichado_agrupado[campo] = grupo.get(campo) or ""
+    fichado_agrupado["cantidad_fichas"] = grupo.get("cantidad_fichas", 0)
+    return fichado_agrupado
+
+async def obtener_fichados_apodaca_agrupados() -> List[Dict]:
     """
     Obtiene todos los fichados de la colección fichados_apodaca.
     Si existen varios objetos con el mismo nombre y matricula, muestra solo uno
     con un campo cantidad_fichas que indica cuántas veces se repite.
+    - Con FICHADOS_RESUMEN activo se lee la colección materializada fichados_resumen
+      (un documento por alumno)
+    - Si no, la agrupación se hace en MongoDB con un pipeline $group
     """
     db = get_db()
-    coleccion = db.fichados_apodaca
-    
-    # Obtener todos los fichados
-    fichados = list(coleccion.find().sort("fecha_registro_ficha", -1))
-    
-    # Agrupar por nombre y matricula
-    fichados_agrupados = {}
-    
-    for fichado in fichados:
-        clave = f"{fichado.get('nombre', '')}_{fichado.get('matricula', '')}"
-        
-        if clave not in fichados_agrupados:
-            # Primera vez que vemos esta combinación, guardar el fichado
-            fichado_agrupado = {
-                "matricula": fichado.get("matricula", ""),
-                "nombre": fichado.get("nombre", ""),
-                "coordinador": fichado.get("coordinador", ""),
-                "graduado": fichado.get("graduado", ""),
-                "correo": fichado.get("correo", ""),
-                "campus": fichado.get("campus", ""),
-                "programa": fichado.get("programa", ""),
-                "ciclo": fichado.get("ciclo", ""),
-                "turno": fichado.get("turno", ""),
-                "cantidad_fichas": 1
-            }
-            fichados_agrupados[clave] = fichado_agrupado
-        else:
-            # Ya existe, incrementar contador
-            fichados_agrupados[clave]["cantidad_fichas"] += 1
-    
-    # Convertir el diccionario a lista
-    resultado = list(fichados_agrupados.values())
-    
-    return resultado
\ No newline at end of file
+
+    if Config.FICHADOS_RESUMEN:
+        grupos = await db.fichados_resumen.find().sort("ultima_ficha", -1).to_list()
+    else:
+        cursor = await db.fichados_apodaca.aggregate(pipeline_fichados_agrupados())
+        grupos = await cursor.to_list()
+
+    return [_formatear_fichado_agrupado(grupo) for grupo in grupos]
@@ -0,0 +1,181 @@
+"""
+Servicios para las estadísticas diarias de asistencia.
+
+La colección estadisticas_diarias guarda un documento por (día, campus,
+programa, turno) con el total de asistencias registradas. Cada registro de
+asistencia incrementa su documento con $inc (los datos del alumno se toman
+del padrón, vía caché/snapshot), así que consultar un rango de días lee unos
+cuantos documentos por día en lugar de todos los registros de asistencia.
+
+Si el conteo se desvía (por ejemplo, registros anteriores a esta colección o
+cambios de programa de un alumno) se recalcula con
+scripts/reconstruir_estadisticas_diarias.py.
+"""
+from collections import Counter
+from datetime import date, datetime, time
+from typing import Dict, Iterable, List, Optional
+from pymongo import UpdateOne
+from app.config import Config
+from app.database import get_db
+from app.matricula import normalizar_matricula
+from app.services.usuario_service import (
+    obtener_datos_alumnos,
+    cargar_padron_alumnos
+)
+
+CAMPOS_AGRUPACION = ["campus", "programa", "turno"]
+
+def _clave_estadistica(fecha_dia: datetime, campus: str, programa: str, turno: str) -> Dict:
+    """_id del documento de estadísticas (el orden de los campos es parte de la igualdad)"""
+    return {"fecha_dia": fecha_dia, "campus": campus, "programa": programa, "turno": turno}
+
+def _operaciones_incremento(conteos: Counter) -> List[UpdateOne]:
+    return [
+        UpdateOne(
+            {"_id": _clave_estadistica(*clave)},
+            {
+                "$inc": {"total": total},
+                "$setOnInsert": dict(zip(["fecha_dia", *CAMPOS_AGRUPACION], clave))
+            },
+            upsert=True
+        )
+        for clave, total in conteos.items()
+    ]
+
+async def incrementar_estadisticas_diarias(registros: Iterable[Dict]):
+    """
+    Suma a estadisticas_diarias los registros de asistencia recién insertados.
+    Los datos de todos los alumnos del lote se leen de una vez (ver
+    obtener_datos_alumnos) y los registros del mismo grupo se acumulan en un
+    solo $inc. Un alumno fuera del padrón cuenta con campus, programa y turno vacíos.
+    Un error aquí no invalida la asistencia ya registrada: se reporta y
+    el conteo se corrige con la reconstrucción.
+    """
+    try:
+        registros = list(registros)
+        if not registros:
+            return
+        alumnos = await obtener_datos_alumnos(registro["Matricula"] for registro in registros)
+
+        conteos = Counter()
+        for registro in registros:
+            resultado = alumnos.get(normalizar_matricula(registro["Matricula"]))
+            if resultado is None:
+                conteos[(registro["fecha_dia"], "", "", "")] += 1
+            else:
+                _, alumno = resultado
+                conteos[(registro["fecha_dia"], alumno.campus, alumno.programa, alumno.turno)] += 1
+        await get_db().estadisticas_diarias.bulk_write(_operaciones_incremento(conteos), ordered=False)
+    except Exception as e:
+        print(f"⚠️  No se pudieron actualizar las estadísticas diarias: {e}")
+
+async def obtener_estadisticas_diarias(
+    desde: date,
+    hasta: date,
+    campus: Optional[str] = None,
+    programa: Optional[str] = None,
+    turno: Optional[str] = None,
+    agrupar_por: Optional[str] = None
+) -> List[Dict]:
+    """
+    Retorna por día el total de asistencias y su desglose por grupo.
+    Con agrupar_por ('campus', 'programa' o 'turno') el desglose se suma por ese campo.
+    """
+    if hasta < desde:
+        raise ValueError("La fecha 'hasta' no puede ser anterior a 'desde'")
+
+    filtro = {"fecha_dia": {"$gte": datetime.combine(desde, time.min), "$lte": datetime.combine(hasta, time.min)}}
+    for campo, valor in (("campus", campus), ("programa", programa), ("turno", turno)):
+        if valor is not None:
+            filtro[campo] = valor
+
+    documentos = await get_db().estadisticas_diarias.find(filtro, {"_id": 0}).sort("fecha_dia", 1).to_list()
+
+    campos = [agrupar_por] if agrupar_por else CAMPOS_AGRUPACION
+    dias: Dict[date, Dict] = {}
+    for documento in documentos:
+        dia = documento["fecha_dia"].date()
+        resumen = dias.setdefault(dia, {"fecha": dia.isoformat(), "total": 0, "grupos": Counter()})
+        resumen["total"] += documento["total"]
+        resumen["grupos"][tuple(documento.get(campo, "") for campo in campos)] += documento["total"]
+
+    return [
+        {
+            "fecha": resumen["fecha"],
+            "total": resumen["total"],
+            "grupos": [
+                {**dict(zip(campos, clave)), "total": total}
+                for clave, total in sorted(resumen["grupos"].items())
+            ]
+        }
+        for resumen in dias.values()
+    ]
+
+async def _reemplazar_dia(coleccion, fecha_dia: datetime, conteos: Counter):
+    """
+    Deja los documentos de un día con los conteos recalculados: $set del total
+    de cada grupo y borrado de los grupos que ya no tienen asistencias.
+    """
+    operaciones = [
+        UpdateOne(
+            {"_id": _clave_estadistica(*clave)},
+            {
+                "$set": {"total": total},
+                "$setOnInsert": dict(zip(["fecha_dia", *CAMPOS_AGRUPACION], clave))
+            },
+            upsert=True
+        )
+        for clave, total in conteos.items()
+    ]
+    for inicio in range(0, len(operaciones), Config.STREAM_BATCH_SIZE):
+        await coleccion.bulk_write(operaciones[inicio:inicio + Config.STREAM_BATCH_SIZE], ordered=False)
+    await coleccion.delete_many({
+        "fecha_dia": fecha_dia,
+        "_id": {"$nin": [_clave_estadistica(*clave) for clave in conteos]}
+    })
+
+async def reconstruir_estadisticas_diarias() -> Dict:
+    """
+    Recalcula estadisticas_diarias desde todo el historial de asistencia_general_apodaca.
+    Recorre los registros ordenados por fecha_dia (índice fecha_dia_timestamp)
+    y reemplaza los documentos de cada día en cuanto termina de contarlo, sobre
+    la misma colección: los días que no se están recalculando conservan los
+    $inc de las asistencias que llegan mientras tanto, y la colección mantiene
+    sus índices. Al final se borran los días que ya no tienen asistencias.
+    """
+    db = get_db()
+    coleccion = db.estadisticas_diarias
+    padron = await cargar_padron_alumnos()
+
+    dias = []
+    documentos = 0
+    asistencias = 0
+    sin_fecha = 0
+    dia_actual: Optional[datetime] = None
+    conteos = Counter()
+
+    cursor = db.asistencia_general_apodaca.find({}, {"Matricula": 1, "fecha_dia": 1, "_id": 0}).sort("fecha_dia", 1)
+    async for registro in cursor.batch_size(Config.STREAM_BATCH_SIZE):
+        if not isinstance(registro.get("fecha_dia"), datetime):
+            sin_fecha += 1
+            continue
+        if registro["fecha_dia"] != dia_actual:
+            if dia_actual is not None:
+                await _reemplazar_dia(coleccion, dia_actual, conteos)
+                documentos += len(conteos)
+            dia_actual, conteos = registro["fecha_dia"], Counter()
+            dias.append(dia_actual)
+        _, campus, programa, turno = padron.get(normalizar_matricula(registro.get("Matricula", "")), ["", "", "", ""])
+        conteos[(dia_actual, campus, programa, turno)] += 1
+        asistencias += 1
+
+    if dia_actual is not None:
+        await _reemplazar_dia(coleccion, dia_actual, conteos)
+        documentos += len(conteos)
+    await coleccion.delete_many({"fecha_dia": {"$nin": dias}})
+
+    return {
+        "documentos": documentos,
+        "asistencias": asistencias,
+        "sin_fecha_dia": sin_fecha
+    }
@@ -0,0 +1,108 @@
+"""
+Servicio para calcular y verificar hashes de contraseñas con bcrypt.
+
+bcrypt consume cientos de milisegundos de CPU por llamada, por lo que las
+operaciones se ejecutan en un pool de hilos dedicado (bcrypt libera el GIL)
+en lugar de hacerlo dentro del event loop. El pool tiene un límite de
+operaciones en espera (BCRYPT_MAX_COLA); al superarlo se rechaza la petición
+con ColaHashLlenaError en lugar de acumular latencia sin límite.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import bcrypt
+from app.config import Config
+
+class ColaHashLlenaError(Exception):
+    """Se lanza cuando hay demasiadas operaciones de bcrypt en espera"""
+
+class PoolHash:
+    executor: Optional[ThreadPoolExecutor] = None
+    pendientes: int = 0
+
+pool_hash = PoolHash()
+
+def _obtener_executor() -> ThreadPoolExecutor:
+    """Crea el pool de hilos la primera vez que se necesita"""
+    if pool_hash.executor is None:
+        pool_hash.executor = ThreadPoolExecutor(
+            max_workers=Config.BCRYPT_WORKERS,
+            thread_name_prefix="bcrypt"
+        )
+    return pool_hash.executor
+
+async def _ejecutar_en_pool(funcion, *args):
+    """
+    Ejecuta una función de bcrypt en el pool respetando el límite de la cola.
+    El contador solo se modifica desde el event loop, por lo que no requiere candado.
+    """
+    if pool_hash.pendientes >= Config.BCRYPT_MAX_COLA:
+        raise ColaHashLlenaError("El servidor está ocupado verificando contraseñas, intenta de nuevo")
+
+    pool_hash.pendientes += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_obtener_executor(), funcion, *args)
+    finally:
+        pool_hash.pendientes -= 1
+
+def _hashear(contraseña: str, rounds: int) -> str:
+    return bcrypt.hashpw(
+        contraseña.encode('utf-8'),
+        bcrypt.gensalt(rounds=rounds)
+    ).decode('utf-8')
+
+def _verificar(contraseña: str, contraseña_hasheada: str) -> bool:
+    try:
+        return bcrypt.checkpw(
+            contraseña.encode('utf-8'),
+            contraseña_hasheada.encode('utf-8')
+        )
+    except ValueError:
+        # Hash vacío o con formato inválido
+        return False
+
+async def hashear_contraseña(contraseña: str, rounds: Optional[int] = None) -> str:
+    """
+    Genera el hash bcrypt de una contraseña con el costo configurado
+    (o con el costo indicado en rounds).
+    """
+    return await _ejecutar_en_pool(_hashear, contraseña, rounds or Config.BCRYPT_ROUNDS)
+
+async def verificar_contraseña(contraseña: str, contraseña_hasheada: str) -> bool:
+    """
+    Verifica una contraseña contra su hash bcrypt.
+    """
+    return await _ejecutar_en_pool(_verificar, contraseña, contraseña_hasheada)
+
+def obtener_costo_hash(contraseña_hasheada: str) -> Optional[int]:
+    """
+    Extrae el costo de un hash bcrypt con formato $2b$<costo>$<sal+hash>.
+    Retorna None si el hash no tiene ese formato.
+    """
+    partes = contraseña_hasheada.split("$")
+    if len(partes) < 4:
+        return None
+    try:
+        return int(partes[2])
+    except ValueError:
+        return None
+
+def necesita_rehash(contraseña_hasheada: str) -> bool:
+    """
+    Indica si el hash fue generado con un costo distinto al configurado.
+    """
+    return obtener_costo_hash(contraseña_hasheada) != Config.BCRYPT_ROUNDS
+
+def pool_ocupado() -> bool:
+    """
+    Indica si todos los hilos de bcrypt están en uso: una operación nueva
+    tendría que esperar en la cola.
+    """
+    return pool_hash.pendientes >= Config.BCRYPT_WORKERS
+
+def cerrar_pool_hash():
+    """Libera los hilos del pool de bcrypt"""
+    if pool_hash.executor is not None:
+        pool_hash.executor.shutdown(wait=False, cancel_futures=True)
+        pool_hash.executor = None
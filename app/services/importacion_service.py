@@ -0,0 +1,226 @@
+"""
+Servicios para la importación masiva del padrón de alumnos desde Excel/CSV.
+
+El archivo se lee en streaming (openpyxl en modo read-only para XLSX, pandas
+por bloques para CSV) y cada bloque de filas se escribe con un solo
+bulk_write no ordenado de upserts por matrícula, en lugar de un find_one más
+un insert_one por alumno. Las filas inválidas no detienen la importación:
+se reportan con su número de fila en el resultado.
+"""
+import asyncio
+import time
+import unicodedata
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from openpyxl import load_workbook
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+import pandas as pd
+from app.database import get_db
+from app.matricula import filtro_matricula, normalizar_matricula
+from app.models.usuario import usuario_datos
+from app.services.usuario_service import recargar_roster_alumnos
+
+# Filas por cada bulk_write
+TAMAÑO_LOTE_IMPORTACION = 1000
+
+# Máximo de errores incluidos en el reporte (el total siempre se cuenta)
+MAX_ERRORES_REPORTE = 1000
+
+NIVELES = {
+    "bachillerato": "alumnos_bachillerato_apodaca",
+    "universidad": "alumnos_universidad_apodaca"
+}
+
+# Encabezado normalizado (sin acentos, minúsculas, sin espacios ni guiones bajos) -> campo de usuario_datos
+COLUMNAS_ALUMNO = {
+    "matricula": "matricula",
+    "nombre": "nombre",
+    "nombrecompleto": "nombre",
+    "coordinador": "coordinador",
+    "graduado": "graduado",
+    "correo": "correo",
+    "correoelectronico": "correo",
+    "email": "correo",
+    "campus": "campus",
+    "programa": "programa",
+    "ciclo": "ciclo",
+    "turno": "turno"
+}
+
+COLUMNAS_REQUERIDAS = ["matricula", "nombre"]
+
+def _normalizar_encabezado(encabezado: Any) -> str:
+    texto = unicodedata.normalize("NFKD", str(encabezado or ""))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return texto.lower().replace(" ", "").replace("_", "").strip()
+
+def _mapear_encabezados(encabezados: List[Any]) -> Dict[int, str]:
+    """
+    Relaciona la posición de cada columna reconocida con su campo de usuario_datos.
+    Lanza ValueError si falta alguna columna requerida.
+    """
+    columnas = {}
+    for posicion, encabezado in enumerate(encabezados):
+        campo = COLUMNAS_ALUMNO.get(_normalizar_encabezado(encabezado))
+        if campo and campo not in columnas.values():
+            columnas[posicion] = campo
+
+    faltantes = [campo for campo in COLUMNAS_REQUERIDAS if campo not in columnas.values()]
+    if faltantes:
+        raise ValueError(f"Faltan columnas requeridas en el archivo: {', '.join(faltantes)}")
+    return columnas
+
+def _valor_celda(valor: Any) -> str:
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+def leer_filas_xlsx(archivo) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """
+    Recorre la primera hoja de un XLSX en modo read-only (sin cargarla completa).
+    Genera (número de fila en la hoja, campos de usuario_datos).
+    """
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezados = next(filas, None)
+        if encabezados is None:
+            raise ValueError("El archivo está vacío")
+        columnas = _mapear_encabezados(list(encabezados))
+
+        for numero_fila, fila in enumerate(filas, start=2):
+            if not any(valor not in (None, "") for valor in fila):
+                continue
+            yield numero_fila, {
+                campo: _valor_celda(fila[posicion]) if posicion < len(fila) else ""
+                for posicion, campo in columnas.items()
+            }
+    finally:
+        libro.close()
+
+def leer_filas_csv(archivo) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """
+    Recorre un CSV por bloques con pandas (todas las columnas como texto).
+    Genera (número de fila en el archivo, campos de usuario_datos).
+    """
+    bloques = pd.read_csv(
+        archivo, dtype=str, keep_default_na=False, encoding="utf-8-sig",
+        chunksize=TAMAÑO_LOTE_IMPORTACION
+    )
+    columnas = None
+    numero_fila = 1
+    for bloque in bloques:
+        if columnas is None:
+            columnas = _mapear_encabezados(list(bloque.columns))
+        for fila in bloque.itertuples(index=False, name=None):
+            numero_fila += 1
+            if not any(fila):
+                continue
+            yield numero_fila, {campo: _valor_celda(fila[posicion]) for posicion, campo in columnas.items()}
+
+def leer_filas(archivo, nombre_archivo: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Elige el lector según la extensión del archivo (.xlsx o .csv)"""
+    extension = nombre_archivo.lower().rsplit(".", 1)[-1] if "." in nombre_archivo else ""
+    if extension in ("xlsx", "xlsm"):
+        return leer_filas_xlsx(archivo)
+    if extension == "csv":
+        return leer_filas_csv(archivo)
+    raise ValueError("Formato no soportado: se acepta .xlsx o .csv")
+
+def _tomar_lote(filas: Iterator, tamaño: int) -> List:
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamaño:
+            break
+    return lote
+
+def _documento_alumno(alumno: usuario_datos) -> Dict:
+    """Documento de MongoDB con campos en mayúscula inicial"""
+    return {
+        "Matricula": normalizar_matricula(alumno.matricula),
+        "Nombre": alumno.nombre,
+        "Coordinador": alumno.coordinador,
+        "Graduado": alumno.graduado,
+        "Correo": alumno.correo,
+        "Campus": alumno.campus,
+        "Programa": alumno.programa,
+        "Ciclo": alumno.ciclo,
+        "Turno": alumno.turno
+    }
+
+async def importar_alumnos(
+    nivel: str,
+    filas: Iterator[Tuple[int, Dict[str, str]]],
+    tamaño_lote: Optional[int] = None
+) -> Dict:
+    """
+    Importa alumnos al nivel indicado ('bachillerato' o 'universidad').
+    Cada alumno se inserta o, si su matrícula ya existe, se actualiza (upsert).
+    Los bloques de filas se leen en un hilo para no bloquear el event loop.
+    """
+    if nivel not in NIVELES:
+        raise ValueError(f"Nivel no válido: {nivel}")
+
+    coleccion = getattr(get_db(), NIVELES[nivel])
+    tamaño_lote = tamaño_lote or TAMAÑO_LOTE_IMPORTACION
+    inicio = time.perf_counter()
+
+    resultado = {
+        "nivel": nivel,
+        "filas_leidas": 0,
+        "insertados": 0,
+        "actualizados": 0,
+        "total_errores": 0,
+        "errores": []
+    }
+
+    def agregar_error(numero_fila: int, matricula: str, error: str):
+        resultado["total_errores"] += 1
+        if len(resultado["errores"]) < MAX_ERRORES_REPORTE:
+            resultado["errores"].append({"fila": numero_fila, "matricula": matricula, "error": error})
+
+    while True:
+        lote = await asyncio.to_thread(_tomar_lote, filas, tamaño_lote)
+        if not lote:
+            break
+        resultado["filas_leidas"] += len(lote)
+
+        operaciones = []
+        filas_operacion = []
+        for numero_fila, campos in lote:
+            try:
+                alumno = usuario_datos(**{campo: campos.get(campo, "") for campo in usuario_datos.model_fields})
+            except ValidationError as e:
+                agregar_error(numero_fila, campos.get("matricula", ""), str(e.errors()[0]["msg"]))
+                continue
+            if not alumno.matricula or not alumno.nombre:
+                agregar_error(numero_fila, alumno.matricula, "La matrícula y el nombre son obligatorios")
+                continue
+
+            documento = _documento_alumno(alumno)
+            operaciones.append(UpdateOne(filtro_matricula(documento["Matricula"]), {"$set": documento}, upsert=True))
+            filas_operacion.append((numero_fila, documento["Matricula"]))
+
+        if not operaciones:
+            continue
+
+        try:
+            escritura = await coleccion.bulk_write(operaciones, ordered=False)
+            resultado["insertados"] += escritura.upserted_count
+            resultado["actualizados"] += escritura.matched_count
+        except BulkWriteError as e:
+            resultado["insertados"] += e.details.get("nUpserted", 0)
+            resultado["actualizados"] += e.details.get("nMatched", 0)
+            for error in e.details.get("writeErrors", []):
+                numero_fila, matricula = filas_operacion[error["index"]]
+                agregar_error(numero_fila, matricula, error.get("errmsg", "Error de escritura"))
+
+    if resultado["insertados"] or resultado["actualizados"]:
+        await recargar_roster_alumnos(nivel)
+
+    resultado["duracion_segundos"] = round(time.perf_counter() - inicio, 3)
+    return resultado
@@ -0,0 +1,218 @@
+"""
+Servicios para generar reportes Excel de asistencia en segundo plano.
+
+Un reporte se identifica por una clave de contenido (hash de sus filtros):
+el archivo terminado se guarda en EXCEL_DIR como asistencias_<clave>.xlsx y las
+solicitudes posteriores con los mismos filtros se sirven desde disco.
+Un reporte todavía puede cambiar mientras su rango no termina y durante
+REPORTES_GRACIA_SEGUNDOS después (asistencias atrasadas de los kioscos), así
+que un archivo generado antes de ese momento se regenera si tiene más de
+VIGENCIA_REPORTE_ABIERTO segundos; uno generado después es definitivo.
+Los trabajos terminados se olvidan tras RETENCION_TRABAJOS segundos (los
+completados se siguen reconociendo por su archivo).
+
+La generación recorre el cursor de asistencias por lotes y escribe con
+openpyxl en modo write-only, por lo que la memoria no depende del número de
+registros. Los campos del alumno (nivel, campus, programa, turno) se toman del
+padrón de bachillerato y universidad.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import date, datetime, time as hora_dia, timedelta
+from typing import Dict, List, Optional
+from openpyxl import Workbook
+from app.config import Config
+from app.database import get_db_lectura
+from app.matricula import normalizar_matricula
+from app.services.asistencia_service import a_hora_mexico, obtener_hora_mexico
+from app.services.usuario_service import cargar_padron_alumnos
+
+ESTADO_PENDIENTE = "pendiente"
+ESTADO_EN_PROCESO = "en_proceso"
+ESTADO_COMPLETADO = "completado"
+ESTADO_ERROR = "error"
+
+# Segundos que se reutiliza un reporte que todavía puede cambiar
+VIGENCIA_REPORTE_ABIERTO = 300
+# Segundos que se conserva en memoria un trabajo terminado
+RETENCION_TRABAJOS = 3600
+
+ENCABEZADOS_REPORTE = ["Matricula", "Nombre", "Fecha", "Hora", "Nivel", "Campus", "Programa", "Turno"]
+
+# Trabajos conocidos por este proceso: clave -> estado
+_trabajos: Dict[str, Dict] = {}
+# Campos de un trabajo que no forman parte de su estado público
+_CAMPOS_INTERNOS = ("tarea", "terminado")
+
+def clave_reporte(filtros: Dict) -> str:
+    """Clave de contenido del reporte: hash estable de sus filtros"""
+    contenido = json.dumps(
+        {campo: (str(valor) if valor is not None else None) for campo, valor in sorted(filtros.items())},
+        sort_keys=True
+    )
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:32]
+
+def ruta_reporte(clave: str) -> str:
+    return os.path.join(Config.EXCEL_DIR, f"asistencias_{clave}.xlsx")
+
+def _reporte_vigente(clave: str, hasta: date) -> bool:
+    """
+    Indica si el archivo en disco puede servirse sin regenerarlo: es definitivo
+    si se generó después del fin de `hasta` más el periodo de gracia.
+    """
+    ruta = ruta_reporte(clave)
+    if not os.path.exists(ruta):
+        return False
+    generado = os.path.getmtime(ruta)
+    fin_rango = a_hora_mexico(datetime.combine(hasta + timedelta(days=1), hora_dia.min)).timestamp()
+    if generado >= fin_rango + Config.REPORTES_GRACIA_SEGUNDOS:
+        return True
+    return time.time() - generado < VIGENCIA_REPORTE_ABIERTO
+
+def _limpiar_trabajos():
+    """Olvida los trabajos terminados hace más de RETENCION_TRABAJOS segundos"""
+    limite = time.monotonic() - RETENCION_TRABAJOS
+    for clave in [clave for clave, trabajo in _trabajos.items() if trabajo.get("terminado", limite) < limite]:
+        del _trabajos[clave]
+
+def _estado_desde_disco(clave: str) -> Optional[Dict]:
+    ruta = ruta_reporte(clave)
+    if not os.path.exists(ruta):
+        return None
+    return {
+        "id": clave,
+        "estado": ESTADO_COMPLETADO,
+        "archivo": os.path.basename(ruta),
+        "bytes": os.path.getsize(ruta)
+    }
+
+def _filtro_padron(filtros: Dict) -> Dict:
+    """Filtro del padrón según campus/programa/turno del reporte"""
+    return {
+        campo_mongo: filtros[campo]
+        for campo, campo_mongo in (("campus", "Campus"), ("programa", "Programa"), ("turno", "Turno"))
+        if filtros.get(campo)
+    }
+
+def _agregar_filas(hoja, filas: List[List]):
+    for fila in filas:
+        hoja.append(fila)
+
+async def _generar_reporte(clave: str, filtros: Dict):
+    """Escribe el reporte en un archivo temporal y lo publica con os.replace"""
+    trabajo = _trabajos[clave]
+    trabajo["estado"] = ESTADO_EN_PROCESO
+    inicio = time.perf_counter()
+    temporal = f"{ruta_reporte(clave)}.{os.getpid()}.tmp"
+
+    try:
+        padron = await cargar_padron_alumnos(_filtro_padron(filtros), Config.MONGO_LECTURA_REPORTES)
+        filtrar_alumnos = any(filtros.get(campo) for campo in ("campus", "programa", "turno"))
+
+        libro = Workbook(write_only=True)
+        hoja = libro.create_sheet("Asistencias")
+        hoja.append(ENCABEZADOS_REPORTE)
+
+        desde = a_hora_mexico(datetime.combine(filtros["desde"], hora_dia.min))
+        hasta = a_hora_mexico(datetime.combine(filtros["hasta"] + timedelta(days=1), hora_dia.min))
+        # Lectura pesada: puede ir a un secundario (MONGO_LECTURA_REPORTES)
+        cursor = get_db_lectura().asistencia_general_apodaca.find(
+            {"timestamp": {"$gte": desde, "$lt": hasta}},
+            {"Matricula": 1, "Nombre": 1, "Fecha": 1, "Hora": 1, "_id": 0}
+        ).sort("timestamp", 1).batch_size(Config.STREAM_BATCH_SIZE)
+
+        filas = []
+        total = 0
+        async for registro in cursor:
+            matricula = normalizar_matricula(registro.get("Matricula", ""))
+            alumno = padron.get(matricula)
+            if alumno is None:
+                if filtrar_alumnos:
+                    continue
+                alumno = ["", "", "", ""]
+            filas.append([matricula, registro.get("Nombre", ""), registro.get("Fecha", ""), registro.get("Hora", ""), *alumno])
+            if len(filas) >= Config.STREAM_BATCH_SIZE:
+                await asyncio.to_thread(_agregar_filas, hoja, filas)
+                total += len(filas)
+                filas = []
+
+        if filas:
+            await asyncio.to_thread(_agregar_filas, hoja, filas)
+            total += len(filas)
+
+        await asyncio.to_thread(libro.save, temporal)
+        os.replace(temporal, ruta_reporte(clave))
+
+        trabajo.update({
+            "estado": ESTADO_COMPLETADO,
+            "registros": total,
+            "archivo": os.path.basename(ruta_reporte(clave)),
+            "bytes": os.path.getsize(ruta_reporte(clave)),
+            "duracion_segundos": round(time.perf_counter() - inicio, 3)
+        })
+    except Exception as e:
+        print(f"Error al generar reporte {clave}: {e}")
+        trabajo.update({"estado": ESTADO_ERROR, "error": str(e)})
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    finally:
+        trabajo["terminado"] = time.monotonic()
+
+async def solicitar_reporte_asistencias(
+    desde: date,
+    hasta: date,
+    campus: Optional[str] = None,
+    programa: Optional[str] = None,
+    turno: Optional[str] = None
+) -> Dict:
+    """
+    Solicita un reporte de asistencias. Si ya existe en disco (o se está generando)
+    retorna ese trabajo; si no, inicia la generación en segundo plano.
+    """
+    if hasta < desde:
+        raise ValueError("La fecha 'hasta' no puede ser anterior a 'desde'")
+
+    filtros = {"desde": desde, "hasta": hasta, "campus": campus, "programa": programa, "turno": turno}
+    clave = clave_reporte(filtros)
+    _limpiar_trabajos()
+
+    trabajo = _trabajos.get(clave)
+    if trabajo and trabajo["estado"] in (ESTADO_PENDIENTE, ESTADO_EN_PROCESO):
+        return obtener_estado_reporte(clave)
+
+    if _reporte_vigente(clave, hasta):
+        return obtener_estado_reporte(clave)
+
+    _trabajos[clave] = {
+        "id": clave,
+        "estado": ESTADO_PENDIENTE,
+        "filtros": {campo: (str(valor) if valor is not None else None) for campo, valor in filtros.items()},
+        "solicitado": obtener_hora_mexico().isoformat()
+    }
+    _trabajos[clave]["tarea"] = asyncio.create_task(_generar_reporte(clave, filtros))
+    return obtener_estado_reporte(clave)
+
+def obtener_estado_reporte(clave: str) -> Dict:
+    """Estado de un reporte; los generados por otro proceso se reconocen por su archivo"""
+    if not re.fullmatch(r"[0-9a-f]{32}", clave):
+        raise ValueError("Reporte no encontrado")
+
+    trabajo = _trabajos.get(clave)
+    if trabajo is not None:
+        return {campo: valor for campo, valor in trabajo.items() if campo not in _CAMPOS_INTERNOS}
+
+    estado = _estado_desde_disco(clave)
+    if estado is None:
+        raise ValueError("Reporte no encontrado")
+    return estado
+
+def obtener_archivo_reporte(clave: str) -> str:
+    """Ruta del archivo de un reporte terminado"""
+    estado = obtener_estado_reporte(clave)
+    if estado["estado"] != ESTADO_COMPLETADO:
+        raise ValueError(f"El reporte aún no está listo (estado: {estado['estado']})")
+    return ruta_reporte(clave)
@@ -1,28 +1,43 @@
 """
 Servicios de lógica de negocio para operaciones con usuarios.
 
-Este módulo contiene las funciones que interactúan con MongoDB para:
+Este módulo contiene las funciones asíncronas que interactúan con MongoDB para:
 - Buscar usuarios (alumnos y maestros) por matrícula
-- Obtener listas completas de alumnos y maestros
+- Obtener listas completas de alumnos y maestros, paginadas por cursor (keyset)
+  o como iteradores para respuestas en streaming
 - Autenticar usuarios mediante credenciales
 - Obtener datos detallados de alumnos de bachillerato y universidad
-  (incluye mapeo de campos de MongoDB con mayúscula inicial al modelo)
+  (incluye mapeo de campos de MongoDB con mayúscula inicial al modelo),
+  por nivel, en ambos niveles con una sola llamada o por lote de matrículas
 - Crear y autenticar usuarios en la base de datos usuarios_edec
 """
-from app.database import get_db, get_db_usuarios
+from app.config import Config
+from app.database import get_db, get_db_lectura, get_db_usuarios
+from app.matricula import filtro_matricula, filtro_matriculas, normalizar_matricula
+from app.cache import cache_bachillerato, cache_universidad
+from app.snapshot import (
+    snapshot_bachillerato, snapshot_universidad, codificar_registro,
+    adquirir_candado, liberar_candado
+)
+from app.services.hash_service import hashear_contraseña, verificar_contraseña, necesita_rehash, pool_ocupado
 from app.models.usuario import UsuarioResponse, usuario_datos, UsuarioCreate, UsuarioResponseApodaca, UsuarioCambiarContraseña
-from typing import List, Dict, Optional
+from app.paginacion import obtener_pagina
+from app.versiones import incrementar_version, versiones
+from app.busqueda import IndiceNombres
+from typing import AsyncIterator, Iterable, List, Dict, Optional, Tuple
 from datetime import datetime
-import bcrypt
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import os
 
-def obtener_usuario_por_matricula(matricula: str) -> UsuarioResponse:
+async def obtener_usuario_por_matricula(matricula: str) -> UsuarioResponse:
     """
     Busca un usuario (alumno o maestro) por su matrícula
     """
     db = get_db()
     
     # Buscar primero en alumnos
-    alumno = db.alumnos.find_one({"matricula": matricula})
+    alumno = await db.alumnos.find_one({"matricula": matricula})
     if alumno:
         return UsuarioResponse(
             matricula=alumno["matricula"],
@@ -33,7 +48,7 @@ def obtener_usuario_por_matricula(matricula: str) -> UsuarioResponse:
         )
     
     # Si no se encuentra, buscar en maestros
-    maestro = db.maestros.find_one({"matricula": matricula})
+    maestro = await db.maestros.find_one({"matricula": matricula})
     if maestro:
         return UsuarioResponse(
             matricula=maestro["matricula"],
@@ -52,40 +67,34 @@ def obtener_usuario_por_matricula(matricula: str) -> UsuarioResponse:
         encontrado=False
     )
 
-def obtener_todos_alumnos() -> List[Dict]:
+async def obtener_todos_alumnos() -> List[Dict]:
     """
-    Obtiene todos los alumnos de la colección 'alumnos'
+    Obtiene todos los alumnos de la colección 'alumnos' (documentos crudos de MongoDB)
     """
     db = get_db()
-    alumnos = list(db.alumnos.find().sort("matricula", 1))
-    
-    # Convertir ObjectId a string y limpiar datos
-    for alumno in alumnos:
-        alumno["_id"] = str(alumno["_id"])
-    
+    alumnos = await db.alumnos.find().sort("matricula", 1).to_list()
+
+    # Documentos crudos: app/serializacion.py convierte ObjectId al responder
     return alumnos
 
-def obtener_todos_maestros() -> List[Dict]:
+async def obtener_todos_maestros() -> List[Dict]:
     """
-    Obtiene todos los maestros de la colección 'maestros'
+    Obtiene todos los maestros de la colección 'maestros' (documentos crudos de MongoDB)
     """
     db = get_db()
-    maestros = list(db.maestros.find().sort("matricula", 1))
-    
-    # Convertir ObjectId a string y limpiar datos
-    for maestro in maestros:
-        maestro["_id"] = str(maestro["_id"])
-    
+    maestros = await db.maestros.find().sort("matricula", 1).to_list()
+
+    # Documentos crudos: app/serializacion.py convierte ObjectId al responder
     return maestros
 
-def obtener_usuario_por_credenciales_db(username: str, password: str):
+async def obtener_usuario_por_credenciales_db(username: str, password: str):
     """
     Busca un usuario en la colección 'login' por username y password.
     """
     db = get_db()
     coleccion = db.login
 
-    usuario = coleccion.find_one({
+    usuario = await coleccion.find_one({
         "username": username,
         "password": password
     })
@@ -98,137 +107,362 @@ def obtener_usuario_por_credenciales_db(username: str, password: str):
 
     return usuario
 
-def obtener_datos_alumno_bachillerato(matricula: str) -> Optional[usuario_datos]:
+def _buscar_alumno_local(clave: str, snapshot, cache) -> Tuple[bool, Optional[usuario_datos]]:
+    """
+    Busca un alumno sin ir a MongoDB: primero en el snapshot compartido (mmap,
+    con ROSTER_SNAPSHOT activo) y después en la caché de roster.
+    Retorna (encontrado, alumno); encontrado=True con alumno None es un
+    "no encontrado" guardado en la caché.
+    """
+    if Config.ROSTER_SNAPSHOT:
+        registro = snapshot.buscar(clave)
+        if registro is not None:
+            return True, usuario_datos.model_construct(**registro)
+    return cache.obtener(clave)
+
+async def _consultar_alumno(coleccion, cache, clave: str) -> Optional[usuario_datos]:
     """
-    Obtiene los datos de un alumno de bachillerato por su matrícula
-    de la colección 'alumnos_bachillerato_apodaca'
+    Consulta indexada por Matricula (ver app/matricula.py) y guarda el
+    resultado en la caché, incluido el "no encontrado".
     """
-    db = get_db()
-    # Buscar por Matricula (con mayúscula) como string
-    alumno = db.alumnos_bachillerato_apodaca.find_one({"Matricula": matricula})
-    
-    # Si no se encuentra, intentar como int
-    if not alumno:
-        try:
-            matricula_int = int(matricula)
-            alumno = db.alumnos_bachillerato_apodaca.find_one({"Matricula": matricula_int})
-        except (ValueError, TypeError):
-            pass
-    
-    if not alumno:
-        return None
-    
+    alumno_raw = await coleccion.find_one(filtro_matricula(clave))
+
     # Mapear campos de MongoDB (con mayúscula) al modelo (minúscula)
-    # La matrícula se mantiene como string según el modelo
-    matricula_valor = str(alumno.get("Matricula", matricula))
-    
-    return usuario_datos(
-        matricula=matricula_valor,
-        nombre=alumno.get("Nombre", ""),
-        coordinador=alumno.get("Coordinador", ""),
-        graduado=alumno.get("Graduado", ""),
-        correo=alumno.get("Correo", ""),
-        campus=alumno.get("Campus", ""),
-        programa=alumno.get("Programa", ""),
-        ciclo=alumno.get("Ciclo", ""),
-        turno=alumno.get("Turno", "")
-    )
+    alumno = _mapear_alumno(alumno_raw) if alumno_raw else None
+    cache.guardar(clave, alumno)
+
+    return alumno
 
-def obtener_datos_alumno_universidad(matricula: str) -> Optional[usuario_datos]:
+async def obtener_datos_alumno_bachillerato(matricula: str) -> Optional[usuario_datos]:
+    """
+    Obtiene los datos de un alumno de bachillerato por su matrícula
+    de la colección 'alumnos_bachillerato_apodaca'.
+    Con ROSTER_SNAPSHOT activo busca primero en el snapshot compartido (mmap).
+    Después consulta la caché de roster; en un fallo hace una sola consulta
+    indexada por Matricula (ver app/matricula.py) y guarda el resultado,
+    incluido el "no encontrado".
+    """
+    clave = normalizar_matricula(matricula)
+    encontrado, alumno = _buscar_alumno_local(clave, snapshot_bachillerato, cache_bachillerato)
+    if encontrado:
+        return alumno
+
+    return await _consultar_alumno(get_db().alumnos_bachillerato_apodaca, cache_bachillerato, clave)
+
+async def obtener_datos_alumno_universidad(matricula: str) -> Optional[usuario_datos]:
     """
     Obtiene los datos de un alumno de universidad por su matrícula
-    de la colección 'alumnos_universidad_apodaca'
+    de la colección 'alumnos_universidad_apodaca'.
+    Con ROSTER_SNAPSHOT activo busca primero en el snapshot compartido (mmap).
+    Después consulta la caché de roster; en un fallo hace una sola consulta
+    indexada por Matricula (ver app/matricula.py) y guarda el resultado,
+    incluido el "no encontrado".
+    """
+    clave = normalizar_matricula(matricula)
+    encontrado, alumno = _buscar_alumno_local(clave, snapshot_universidad, cache_universidad)
+    if encontrado:
+        return alumno
+
+    return await _consultar_alumno(get_db().alumnos_universidad_apodaca, cache_universidad, clave)
+
+async def obtener_datos_alumno(matricula: str) -> Optional[Tuple[str, usuario_datos]]:
     """
+    Busca un alumno sin conocer su nivel y retorna (nivel, alumno), con nivel
+    'bachillerato' o 'universidad', o None si no está en ninguno.
+    Usa el mismo camino que las búsquedas por nivel (snapshot, caché y consulta
+    indexada): los niveles que no se resuelven localmente se consultan en
+    MongoDB en paralelo. Si la matrícula estuviera en ambos niveles, gana
+    bachillerato.
+    """
+    clave = normalizar_matricula(matricula)
     db = get_db()
-    # Buscar por Matricula (con mayúscula) como string
-    alumno = db.alumnos_universidad_apodaca.find_one({"Matricula": matricula})
-    
-    # Si no se encuentra, intentar como int
-    if not alumno:
-        try:
-            matricula_int = int(matricula)
-            alumno = db.alumnos_universidad_apodaca.find_one({"Matricula": matricula_int})
-        except (ValueError, TypeError):
-            pass
-    
-    if not alumno:
-        return None
-    
-    # Mapear campos de MongoDB (con mayúscula) al modelo (minúscula)
-    # La matrícula se mantiene como string según el modelo
-    matricula_valor = str(alumno.get("Matricula", matricula))
-    
-    return usuario_datos(
-        matricula=matricula_valor,
-        nombre=alumno.get("Nombre", ""),
-        coordinador=alumno.get("Coordinador", ""),
-        graduado=alumno.get("Graduado", ""),
-        correo=alumno.get("Correo", ""),
-        campus=alumno.get("Campus", ""),
-        programa=alumno.get("Programa", ""),
-        ciclo=alumno.get("Ciclo", ""),
-        turno=alumno.get("Turno", "")
-    )
+    niveles = {
+        "bachillerato": (snapshot_bachillerato, cache_bachillerato, db.alumnos_bachillerato_apodaca),
+        "universidad": (snapshot_universidad, cache_universidad, db.alumnos_universidad_apodaca),
+    }
+
+    resultados = {}
+    pendientes = []
+    for nivel, (snapshot, cache, coleccion) in niveles.items():
+        encontrado, alumno = _buscar_alumno_local(clave, snapshot, cache)
+        if encontrado:
+            resultados[nivel] = alumno
+            # Bachillerato encontrado localmente: no hace falta consultar universidad
+            if alumno is not None and not pendientes:
+                return nivel, alumno
+        else:
+            pendientes.append(nivel)
 
-def obtener_todos_alumnos_bachillerato() -> List[usuario_datos]:
+    if pendientes:
+        consultas = [_consultar_alumno(niveles[nivel][2], niveles[nivel][1], clave) for nivel in pendientes]
+        resultados.update(zip(pendientes, await asyncio.gather(*consultas)))
+
+    for nivel in niveles:
+        if resultados[nivel] is not None:
+            return nivel, resultados[nivel]
+    return None
+
+async def _consultar_alumnos(coleccion, cache, claves: List[str]) -> Dict[str, Optional[usuario_datos]]:
     """
-    Obtiene todos los alumnos de bachillerato de la colección 'alumnos_bachillerato'
+    Consulta varias matrículas con un solo $in y guarda cada resultado en la
+    caché, incluido el "no encontrado".
+    """
+    encontrados = {}
+    async for alumno_raw in coleccion.find(filtro_matriculas(claves)).batch_size(Config.STREAM_BATCH_SIZE):
+        alumno = _mapear_alumno(alumno_raw)
+        encontrados[normalizar_matricula(alumno.matricula)] = alumno
+
+    for clave in claves:
+        cache.guardar(clave, encontrados.get(clave))
+    return {clave: encontrados.get(clave) for clave in claves}
+
+async def obtener_datos_alumnos(matriculas: Iterable) -> Dict[str, Tuple[str, usuario_datos]]:
+    """
+    Versión por lote de obtener_datos_alumno: retorna matrícula normalizada ->
+    (nivel, alumno) para las matrículas que están en el padrón.
+    Lo que no se resuelve localmente (snapshot y caché) se consulta con un solo
+    $in por nivel, los dos niveles en paralelo. Si una matrícula estuviera en
+    ambos niveles, gana bachillerato.
     """
+    claves = {normalizar_matricula(matricula) for matricula in matriculas}
     db = get_db()
-    alumnos_raw = list(db.alumnos_bachillerato_apodaca.find().sort("Matricula", 1))
-    
-    alumnos = []
-    for alumno_raw in alumnos_raw:
-        # Mapear campos de MongoDB (con mayúscula) al modelo (minúscula)
-        matricula_valor = str(alumno_raw.get("Matricula", ""))
-        
-        alumno = usuario_datos(
-            matricula=matricula_valor,
-            nombre=alumno_raw.get("Nombre", ""),
-            coordinador=alumno_raw.get("Coordinador", ""),
-            graduado=alumno_raw.get("Graduado", ""),
-            correo=alumno_raw.get("Correo", ""),
-            campus=alumno_raw.get("Campus", ""),
-            programa=alumno_raw.get("Programa", ""),
-            ciclo=alumno_raw.get("Ciclo", ""),
-            turno=alumno_raw.get("Turno", "")
-        )
-        alumnos.append(alumno)
-    
+    niveles = {
+        "bachillerato": (snapshot_bachillerato, cache_bachillerato, db.alumnos_bachillerato_apodaca),
+        "universidad": (snapshot_universidad, cache_universidad, db.alumnos_universidad_apodaca),
+    }
+
+    resultados: Dict[str, Dict[str, Optional[usuario_datos]]] = {nivel: {} for nivel in niveles}
+    consultas = []
+    for nivel, (snapshot, cache, coleccion) in niveles.items():
+        pendientes = []
+        for clave in claves:
+            encontrado, alumno = _buscar_alumno_local(clave, snapshot, cache)
+            if encontrado:
+                resultados[nivel][clave] = alumno
+            else:
+                pendientes.append(clave)
+        if pendientes:
+            consultas.append((nivel, _consultar_alumnos(coleccion, cache, pendientes)))
+
+    for (nivel, _), consultados in zip(consultas, await asyncio.gather(*(consulta for _, consulta in consultas))):
+        resultados[nivel].update(consultados)
+
+    alumnos = {}
+    for nivel in reversed(list(niveles)):
+        for clave, alumno in resultados[nivel].items():
+            if alumno is not None:
+                alumnos[clave] = (nivel, alumno)
     return alumnos
 
-def obtener_todos_alumnos_universidad() -> List[usuario_datos]:
+async def obtener_todos_alumnos_bachillerato() -> List[Dict]:
+    """
+    Obtiene todos los alumnos de bachillerato de la colección 'alumnos_bachillerato'
+    """
+    db = get_db()
+    alumnos_raw = await db.alumnos_bachillerato_apodaca.find().sort("Matricula", 1).to_list()
+    return [_alumno_a_dict(alumno_raw) for alumno_raw in alumnos_raw]
+
+async def obtener_todos_alumnos_universidad() -> List[Dict]:
     """
     Obtiene todos los alumnos de universidad de la colección 'alumnos_universidad_apodaca'
     """
     db = get_db()
-    alumnos_raw = list(db.alumnos_universidad_apodaca.find().sort("Matricula", 1))
-    
+    alumnos_raw = await db.alumnos_universidad_apodaca.find().sort("Matricula", 1).to_list()
+    return [_alumno_a_dict(alumno_raw) for alumno_raw in alumnos_raw]
+
+def _mapear_alumno(alumno_raw: Dict) -> usuario_datos:
+    """Mapea los campos de MongoDB (con mayúscula) al modelo (minúscula)"""
+    return usuario_datos(
+        matricula=str(alumno_raw.get("Matricula", "")),
+        nombre=alumno_raw.get("Nombre", ""),
+        coordinador=alumno_raw.get("Coordinador", ""),
+        graduado=alumno_raw.get("Graduado", ""),
+        correo=alumno_raw.get("Correo", ""),
+        campus=alumno_raw.get("Campus", ""),
+        programa=alumno_raw.get("Programa", ""),
+        ciclo=alumno_raw.get("Ciclo", ""),
+        turno=alumno_raw.get("Turno", "")
+    )
+
+def _alumno_a_dict(alumno_raw: Dict) -> Dict:
+    """
+    Mismo mapeo que _mapear_alumno pero a un dict simple, sin construir ni
+    validar un modelo Pydantic (para listas grandes serializadas con app/serializacion.py)
+    """
+    return {
+        "matricula": str(alumno_raw.get("Matricula", "")),
+        "nombre": alumno_raw.get("Nombre", ""),
+        "coordinador": alumno_raw.get("Coordinador", ""),
+        "graduado": alumno_raw.get("Graduado", ""),
+        "correo": alumno_raw.get("Correo", ""),
+        "campus": alumno_raw.get("Campus", ""),
+        "programa": alumno_raw.get("Programa", ""),
+        "ciclo": alumno_raw.get("Ciclo", ""),
+        "turno": alumno_raw.get("Turno", "")
+    }
+
+async def obtener_alumnos_bachillerato_paginados(limite: int, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Obtiene una página de alumnos de 'alumnos_bachillerato_apodaca' ordenados por Matricula.
+    Retorna los alumnos y el cursor de la siguiente página.
+    """
+    db = get_db()
+    alumnos_raw, siguiente = await obtener_pagina(db.alumnos_bachillerato_apodaca, "Matricula", 1, limite, cursor)
+    return [_alumno_a_dict(alumno_raw) for alumno_raw in alumnos_raw], siguiente
+
+async def obtener_alumnos_universidad_paginados(limite: int, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Obtiene una página de alumnos de 'alumnos_universidad_apodaca' ordenados por Matricula.
+    Retorna los alumnos y el cursor de la siguiente página.
+    """
+    db = get_db()
+    alumnos_raw, siguiente = await obtener_pagina(db.alumnos_universidad_apodaca, "Matricula", 1, limite, cursor)
+    return [_alumno_a_dict(alumno_raw) for alumno_raw in alumnos_raw], siguiente
+
+async def _iterar_alumnos(coleccion) -> AsyncIterator[Dict]:
+    """Recorre una colección de alumnos por lotes, ordenada por Matricula"""
+    cursor = coleccion.find().sort("Matricula", 1).batch_size(Config.STREAM_BATCH_SIZE)
+    try:
+        async for alumno_raw in cursor:
+            yield _alumno_a_dict(alumno_raw)
+    finally:
+        await cursor.close()
+
+def iterar_alumnos_bachillerato() -> AsyncIterator[Dict]:
+    """
+    Recorre 'alumnos_bachillerato_apodaca' sin cargarla completa en memoria.
+    """
+    return _iterar_alumnos(get_db().alumnos_bachillerato_apodaca)
+
+def iterar_alumnos_universidad() -> AsyncIterator[Dict]:
+    """
+    Recorre 'alumnos_universidad_apodaca' sin cargarla completa en memoria.
+    """
+    return _iterar_alumnos(get_db().alumnos_universidad_apodaca)
+
+# Un snapshot publicado hace menos de estos segundos se reutiliza al arrancar
+# (lo construyó otro worker durante el mismo despliegue)
+VIGENCIA_SNAPSHOT_ARRANQUE = 60
+
+async def construir_snapshots_roster():
+    """
+    Construye los snapshots de roster de bachillerato y universidad al iniciar.
+    El candado de archivo hace que solo un worker lea MongoDB y escriba el
+    snapshot; los demás esperan el candado y reutilizan la versión recién publicada.
+    """
+    if not Config.ROSTER_SNAPSHOT:
+        return
+
+    os.makedirs(Config.ROSTER_SNAPSHOT_DIR, exist_ok=True)
+    db = get_db()
+    niveles = [
+        (db.alumnos_bachillerato_apodaca, snapshot_bachillerato),
+        (db.alumnos_universidad_apodaca, snapshot_universidad)
+    ]
+
+    for coleccion, snapshot in niveles:
+        candado = await asyncio.to_thread(adquirir_candado, snapshot.ruta)
+        try:
+            if not snapshot.reciente(VIGENCIA_SNAPSHOT_ARRANQUE):
+                registros = await _leer_registros_snapshot(coleccion)
+                await asyncio.to_thread(snapshot.escribir, registros)
+        finally:
+            liberar_candado(candado)
+        snapshot.recargar()
+
+        print(f"✅ Snapshot {snapshot.nombre}: versión {snapshot.version}, {snapshot.total} alumnos")
+
+async def _leer_registros_snapshot(coleccion) -> Dict[str, bytes]:
+    """Lee todos los alumnos de una colección como registros codificados del snapshot"""
+    registros = {}
+    async for alumno_raw in coleccion.find().batch_size(Config.STREAM_BATCH_SIZE):
+        alumno = _mapear_alumno(alumno_raw)
+        registros[normalizar_matricula(alumno.matricula)] = codificar_registro(alumno.model_dump())
+    return registros
+
+async def cargar_padron_alumnos(filtro: Optional[Dict] = None, lectura: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Lee en streaming el padrón de bachillerato y universidad (solo los campos de agrupación).
+    filtro: filtro de MongoDB opcional (por ejemplo {"Campus": "Apodaca"}).
+    lectura: preferencia de lectura opcional (ver database.get_db_lectura).
+    Retorna matrícula -> [nivel, campus, programa, turno].
+    """
+    db = get_db_lectura(lectura) if lectura else get_db()
+    proyeccion = {"Matricula": 1, "Campus": 1, "Programa": 1, "Turno": 1, "_id": 0}
+    padron = {}
+    for nivel, coleccion in (("Bachillerato", db.alumnos_bachillerato_apodaca), ("Universidad", db.alumnos_universidad_apodaca)):
+        async for alumno in coleccion.find(filtro or {}, proyeccion).batch_size(Config.STREAM_BATCH_SIZE):
+            padron[normalizar_matricula(alumno.get("Matricula", ""))] = [
+                nivel, alumno.get("Campus", ""), alumno.get("Programa", ""), alumno.get("Turno", "")
+            ]
+    return padron
+
+async def recargar_roster_alumnos(nivel: str):
+    """
+    Después de un cambio masivo (importación) vacía la caché del nivel
+    ('bachillerato' o 'universidad') y publica un snapshot completo nuevo.
+    """
+    db = get_db()
+    if nivel == "bachillerato":
+        coleccion, cache, snapshot = db.alumnos_bachillerato_apodaca, cache_bachillerato, snapshot_bachillerato
+    else:
+        coleccion, cache, snapshot = db.alumnos_universidad_apodaca, cache_universidad, snapshot_universidad
+
+    cache.limpiar()
+    await incrementar_version(coleccion.name)
+    if not Config.ROSTER_SNAPSHOT:
+        return
+
+    os.makedirs(Config.ROSTER_SNAPSHOT_DIR, exist_ok=True)
+    candado = await asyncio.to_thread(adquirir_candado, snapshot.ruta)
+    try:
+        registros = await _leer_registros_snapshot(coleccion)
+        await asyncio.to_thread(snapshot.escribir, registros)
+    finally:
+        liberar_candado(candado)
+    snapshot.recargar()
+
+# Índice de nombres para /api/alumnos/buscar (ver app/busqueda.py), por proceso.
+# Se construye en la primera búsqueda y se reconstruye cuando cambia la versión
+# de alguna de las dos colecciones (crear, eliminar e importar la incrementan).
+_indice_nombres: Dict = {"indice": IndiceNombres([]), "tarea": None}
+
+async def _construir_indice_nombres(version: Tuple[int, int]):
+    """Lee los dos niveles en streaming y publica un índice nuevo"""
+    db = get_db()
     alumnos = []
-    for alumno_raw in alumnos_raw:
-        # Mapear campos de MongoDB (con mayúscula) al modelo (minúscula)
-        matricula_valor = str(alumno_raw.get("Matricula", ""))
-        
-        alumno = usuario_datos(
-            matricula=matricula_valor,
-            nombre=alumno_raw.get("Nombre", ""),
-            coordinador=alumno_raw.get("Coordinador", ""),
-            graduado=alumno_raw.get("Graduado", ""),
-            correo=alumno_raw.get("Correo", ""),
-            campus=alumno_raw.get("Campus", ""),
-            programa=alumno_raw.get("Programa", ""),
-            ciclo=alumno_raw.get("Ciclo", ""),
-            turno=alumno_raw.get("Turno", "")
-        )
-        alumnos.append(alumno)
-    
-    return alumnos
+    for nivel, coleccion in (("bachillerato", db.alumnos_bachillerato_apodaca), ("universidad", db.alumnos_universidad_apodaca)):
+        async for alumno_raw in coleccion.find({}, {"_id": 0}).batch_size(Config.STREAM_BATCH_SIZE):
+            alumnos.append((nivel, _alumno_a_dict(alumno_raw)))
+    _indice_nombres["indice"] = await asyncio.to_thread(IndiceNombres, alumnos, version)
+
+async def buscar_alumnos(consulta: str, limite: int) -> List[Dict]:
+    """
+    Busca alumnos de ambos niveles por nombre, sin distinguir acentos ni
+    mayúsculas: cada palabra de la consulta debe ser prefijo de una palabra
+    del nombre. Retorna hasta `limite` alumnos por relevancia, cada uno con su nivel.
+    Mientras se reconstruye el índice tras un cambio, responde con el anterior.
+    """
+    version = (
+        await versiones.obtener("alumnos_bachillerato_apodaca"),
+        await versiones.obtener("alumnos_universidad_apodaca")
+    )
+    if _indice_nombres["indice"].version != version:
+        tarea = _indice_nombres["tarea"]
+        if tarea is None or tarea.done():
+            tarea = asyncio.create_task(_construir_indice_nombres(version))
+            _indice_nombres["tarea"] = tarea
+        if not _indice_nombres["indice"].version:
+            # Todavía no hay índice que servir: esperar la primera construcción
+            await asyncio.shield(tarea)
+
+    return [{"nivel": nivel, **alumno} for nivel, alumno in _indice_nombres["indice"].buscar(consulta, limite)]
 
 # ============================================================================
 # FUNCIONES PARA USUARIOS DE APODACA (Base de datos usuarios_edec)
 # ============================================================================
 
-def crear_usuario_apodaca(usuario: UsuarioCreate) -> Dict:
+async def crear_usuario_apodaca(usuario: UsuarioCreate) -> Dict:
     """
     Crea un nuevo usuario en la base de datos usuarios_edec, colección usuarios_apodaca.
     Hashea la contraseña antes de guardarla.
@@ -237,15 +471,12 @@ def crear_usuario_apodaca(usuario: UsuarioCreate) -> Dict:
     coleccion = db.usuarios_apodaca
     
     # Verificar si el correo ya existe
-    usuario_existente = coleccion.find_one({"correo": usuario.correo})
+    usuario_existente = await coleccion.find_one({"correo": usuario.correo})
     if usuario_existente:
         raise ValueError(f"El correo '{usuario.correo}' ya está en uso")
     
-    # Hashear la contraseña
-    contraseña_hasheada = bcrypt.hashpw(
-        usuario.contraseña.encode('utf-8'),
-        bcrypt.gensalt()
-    ).decode('utf-8')
+    # Hashear la contraseña (en el pool de bcrypt, fuera del event loop)
+    contraseña_hasheada = await hashear_contraseña(usuario.contraseña)
     
     # Crear el documento del usuario
     nuevo_usuario = {
@@ -257,8 +488,11 @@ def crear_usuario_apodaca(usuario: UsuarioCreate) -> Dict:
         "fecha_creacion": datetime.now()
     }
     
-    # Insertar en la base de datos
-    resultado = coleccion.insert_one(nuevo_usuario)
+    # Insertar en la base de datos (el índice único de correo cubre registros simultáneos)
+    try:
+        resultado = await coleccion.insert_one(nuevo_usuario)
+    except DuplicateKeyError:
+        raise ValueError(f"El correo '{usuario.correo}' ya está en uso")
     
     # Retornar el usuario creado (sin la contraseña)
     nuevo_usuario["_id"] = str(resultado.inserted_id)
@@ -266,7 +500,7 @@ def crear_usuario_apodaca(usuario: UsuarioCreate) -> Dict:
     
     return nuevo_usuario
 
-def autenticar_usuario_apodaca(correo: str, contraseña: str) -> Optional[UsuarioResponseApodaca]:
+async def autenticar_usuario_apodaca(correo: str, contraseña: str) -> Optional[UsuarioResponseApodaca]:
     """
     Autentica un usuario verificando el correo y contraseña.
     Retorna los datos del usuario si las credenciales son correctas, None en caso contrario.
@@ -275,19 +509,30 @@ def autenticar_usuario_apodaca(correo: str, contraseña: str) -> Optional[Usuari
     coleccion = db.usuarios_apodaca
     
     # Buscar el usuario por correo
-    usuario = coleccion.find_one({"correo": correo})
+    usuario = await coleccion.find_one({"correo": correo})
     
     if not usuario:
         return None
     
     # Verificar la contraseña
     contraseña_hasheada = usuario.get("contraseña", "")
-    if not bcrypt.checkpw(
-        contraseña.encode('utf-8'),
-        contraseña_hasheada.encode('utf-8')
-    ):
+    if not await verificar_contraseña(contraseña, contraseña_hasheada):
         return None
     
+    # Si el hash se generó con otro costo, regenerarlo con el costo configurado.
+    # El filtro incluye el hash anterior para no pisar un cambio de contraseña concurrente.
+    # Es una mejora oportunista: con el pool de bcrypt saturado se deja para un
+    # login posterior, y un error no invalida un inicio de sesión correcto.
+    if necesita_rehash(contraseña_hasheada) and not pool_ocupado():
+        try:
+            nuevo_hash = await hashear_contraseña(contraseña)
+            await coleccion.update_one(
+                {"_id": usuario["_id"], "contraseña": contraseña_hasheada},
+                {"$set": {"contraseña": nuevo_hash}}
+            )
+        except Exception as e:
+            print(f"⚠️  No se pudo regenerar el hash de {correo}: {e}")
+    
     # Retornar los datos del usuario (sin la contraseña)
     return UsuarioResponseApodaca(
         nombre_completo=usuario.get("nombre_completo", ""),
@@ -297,7 +542,7 @@ def autenticar_usuario_apodaca(correo: str, contraseña: str) -> Optional[Usuari
         fecha_creacion=usuario.get("fecha_creacion", datetime.now())
     )
 
-def cambiar_contraseña_usuario_apodaca(datos: UsuarioCambiarContraseña) -> Dict:
+async def cambiar_contraseña_usuario_apodaca(datos: UsuarioCambiarContraseña) -> Dict:
     """
     Cambia la contraseña de un usuario en la base de datos usuarios_edec.
     Valida que la contraseña actual sea correcta antes de cambiarla.
@@ -306,27 +551,21 @@ def cambiar_contraseña_usuario_apodaca(datos: UsuarioCambiarContraseña) -> Dic
     coleccion = db.usuarios_apodaca
     
     # Buscar el usuario por correo
-    usuario = coleccion.find_one({"correo": datos.correo})
+    usuario = await coleccion.find_one({"correo": datos.correo})
     
     if not usuario:
         raise ValueError("Usuario no encontrado")
     
     # Verificar que la contraseña actual sea correcta
     contraseña_hasheada_actual = usuario.get("contraseña", "")
-    if not bcrypt.checkpw(
-        datos.contraseña_actual.encode('utf-8'),
-        contraseña_hasheada_actual.encode('utf-8')
-    ):
+    if not await verificar_contraseña(datos.contraseña_actual, contraseña_hasheada_actual):
         raise ValueError("La contraseña actual es incorrecta")
     
     # Hashear la nueva contraseña
-    nueva_contraseña_hasheada = bcrypt.hashpw(
-        datos.nueva_contraseña.encode('utf-8'),
-        bcrypt.gensalt()
-    ).decode('utf-8')
+    nueva_contraseña_hasheada = await hashear_contraseña(datos.nueva_contraseña)
     
     # Actualizar la contraseña en la base de datos
-    resultado = coleccion.update_one(
+    resultado = await coleccion.update_one(
         {"correo": datos.correo},
         {"$set": {"contraseña": nueva_contraseña_hasheada}}
     )
@@ -339,7 +578,7 @@ def cambiar_contraseña_usuario_apodaca(datos: UsuarioCambiarContraseña) -> Dic
         "correo": datos.correo
     }
 
-def obtener_todos_usuarios_apodaca() -> List[Dict]:
+async def obtener_todos_usuarios_apodaca() -> List[Dict]:
     """
     Obtiene todos los usuarios de la base de datos usuarios_edec, colección usuarios_apodaca.
     Retorna todos los datos excepto la contraseña.
@@ -347,16 +586,34 @@ def obtener_todos_usuarios_apodaca() -> List[Dict]:
     db = get_db_usuarios()
     coleccion = db.usuarios_apodaca
     
-    usuarios = list(coleccion.find().sort("fecha_creacion", -1))
-    
-    # Convertir ObjectId a string y eliminar contraseñas
-    for usuario in usuarios:
-        usuario["_id"] = str(usuario["_id"])
-        usuario.pop("contraseña", None)
-    
-    return usuarios
+    # La contraseña se excluye desde la consulta
+    return await coleccion.find({}, {"contraseña": 0}).sort("fecha_creacion", -1).to_list()
 
-def obtener_usuario_por_correo_apodaca(correo: str) -> Optional[Dict]:
+async def obtener_usuarios_apodaca_paginados(limite: int, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Obtiene una página de usuarios de usuarios_apodaca, más recientes primero.
+    La contraseña se excluye desde la consulta.
+    """
+    db = get_db_usuarios()
+    usuarios, siguiente = await obtener_pagina(
+        db.usuarios_apodaca, "fecha_creacion", -1, limite, cursor,
+        proyeccion={"contraseña": 0}
+    )
+    return usuarios, siguiente
+
+async def iterar_usuarios_apodaca() -> AsyncIterator[Dict]:
+    """
+    Recorre usuarios_apodaca por lotes, más recientes primero, sin la contraseña.
+    """
+    db = get_db_usuarios()
+    cursor = db.usuarios_apodaca.find({}, {"contraseña": 0}).sort("fecha_creacion", -1).batch_size(Config.STREAM_BATCH_SIZE)
+    try:
+        async for usuario in cursor:
+            yield usuario
+    finally:
+        await cursor.close()
+
+async def obtener_usuario_por_correo_apodaca(correo: str) -> Optional[Dict]:
     """
     Obtiene un usuario por su correo de la base de datos usuarios_edec.
     Retorna todos los datos excepto la contraseña.
@@ -364,7 +621,7 @@ def obtener_usuario_por_correo_apodaca(correo: str) -> Optional[Dict]:
     db = get_db_usuarios()
     coleccion = db.usuarios_apodaca
     
-    usuario = coleccion.find_one({"correo": correo})
+    usuario = await coleccion.find_one({"correo": correo})
     
     if not usuario:
         return None
@@ -375,7 +632,7 @@ def obtener_usuario_por_correo_apodaca(correo: str) -> Optional[Dict]:
     
     return usuario
 
-def eliminar_usuario_por_correo_apodaca(correo: str) -> Dict:
+async def eliminar_usuario_por_correo_apodaca(correo: str) -> Dict:
     """
     Elimina un usuario de la base de datos usuarios_edec por su correo.
     Retorna información sobre el usuario eliminado.
@@ -384,12 +641,12 @@ def eliminar_usuario_por_correo_apodaca(correo: str) -> Dict:
     coleccion = db.usuarios_apodaca
     
     # Verificar si el usuario existe
-    usuario = coleccion.find_one({"correo": correo})
+    usuario = await coleccion.find_one({"correo": correo})
     if not usuario:
         raise ValueError("Usuario no encontrado")
     
     # Eliminar el usuario
-    resultado = coleccion.delete_one({"correo": correo})
+    resultado = await coleccion.delete_one({"correo": correo})
     
     if resultado.deleted_count == 0:
         raise ValueError("No se pudo eliminar el usuario")
@@ -407,7 +664,7 @@ def eliminar_usuario_por_correo_apodaca(correo: str) -> Dict:
 # FUNCIONES PARA GESTIÓN DE ALUMNOS (Bachillerato y Universidad)
 # ============================================================================
 
-def crear_alumno_bachillerato(alumno: usuario_datos) -> Dict:
+async def crear_alumno_bachillerato(alumno: usuario_datos) -> Dict:
     """
     Crea un nuevo alumno en la colección 'alumnos_bachillerato_apodaca'.
     Los campos se guardan con mayúscula inicial para mantener consistencia con MongoDB.
@@ -416,13 +673,13 @@ def crear_alumno_bachillerato(alumno: usuario_datos) -> Dict:
     coleccion = db.alumnos_bachillerato_apodaca
     
     # Verificar si la matrícula ya existe
-    matricula_existente = coleccion.find_one({"Matricula": alumno.matricula})
+    matricula_existente = await coleccion.find_one(filtro_matricula(alumno.matricula))
     if matricula_existente:
         raise ValueError(f"La matrícula '{alumno.matricula}' ya existe en bachillerato")
     
     # Crear el documento del alumno con campos en mayúscula (formato MongoDB)
     nuevo_alumno = {
-        "Matricula": alumno.matricula,
+        "Matricula": normalizar_matricula(alumno.matricula),
         "Nombre": alumno.nombre,
         "Coordinador": alumno.coordinador,
         "Graduado": alumno.graduado,
@@ -434,14 +691,23 @@ def crear_alumno_bachillerato(alumno: usuario_datos) -> Dict:
     }
     
     # Insertar en la base de datos
-    resultado = coleccion.insert_one(nuevo_alumno)
+    resultado = await coleccion.insert_one(nuevo_alumno)
+    cache_bachillerato.invalidar(nuevo_alumno["Matricula"])
+    await incrementar_version("alumnos_bachillerato_apodaca")
+    if Config.ROSTER_SNAPSHOT:
+        await asyncio.to_thread(
+            snapshot_bachillerato.publicar_cambio,
+            nuevo_alumno["Matricula"],
+            _mapear_alumno(nuevo_alumno).model_dump()
+        )
+        snapshot_bachillerato.recargar()
     
     # Retornar el alumno creado
     nuevo_alumno["_id"] = str(resultado.inserted_id)
     
     return nuevo_alumno
 
-def crear_alumno_universidad(alumno: usuario_datos) -> Dict:
+async def crear_alumno_universidad(alumno: usuario_datos) -> Dict:
     """
     Crea un nuevo alumno en la colección 'alumnos_universidad_apodaca'.
     Los campos se guardan con mayúscula inicial para mantener consistencia con MongoDB.
@@ -450,13 +716,13 @@ def crear_alumno_universidad(alumno: usuario_datos) -> Dict:
     coleccion = db.alumnos_universidad_apodaca
     
     # Verificar si la matrícula ya existe
-    matricula_existente = coleccion.find_one({"Matricula": alumno.matricula})
+    matricula_existente = await coleccion.find_one(filtro_matricula(alumno.matricula))
     if matricula_existente:
         raise ValueError(f"La matrícula '{alumno.matricula}' ya existe en universidad")
     
     # Crear el documento del alumno con campos en mayúscula (formato MongoDB)
     nuevo_alumno = {
-        "Matricula": alumno.matricula,
+        "Matricula": normalizar_matricula(alumno.matricula),
         "Nombre": alumno.nombre,
         "Coordinador": alumno.coordinador,
         "Graduado": alumno.graduado,
@@ -468,14 +734,23 @@ def crear_alumno_universidad(alumno: usuario_datos) -> Dict:
     }
     
     # Insertar en la base de datos
-    resultado = coleccion.insert_one(nuevo_alumno)
+    resultado = await coleccion.insert_one(nuevo_alumno)
+    cache_universidad.invalidar(nuevo_alumno["Matricula"])
+    await incrementar_version("alumnos_universidad_apodaca")
+    if Config.ROSTER_SNAPSHOT:
+        await asyncio.to_thread(
+            snapshot_universidad.publicar_cambio,
+            nuevo_alumno["Matricula"],
+            _mapear_alumno(nuevo_alumno).model_dump()
+        )
+        snapshot_universidad.recargar()
     
     # Retornar el alumno creado
     nuevo_alumno["_id"] = str(resultado.inserted_id)
     
     return nuevo_alumno
 
-def eliminar_alumno_bachillerato(matricula: str) -> Dict:
+async def eliminar_alumno_bachillerato(matricula: str) -> Dict:
     """
     Elimina un alumno de la colección 'alumnos_bachillerato_apodaca' por su matrícula.
     Retorna información sobre el alumno eliminado.
@@ -483,23 +758,18 @@ def eliminar_alumno_bachillerato(matricula: str) -> Dict:
     db = get_db()
     coleccion = db.alumnos_bachillerato_apodaca
     
-    # Buscar el alumno por matrícula (intentar como string e int)
-    alumno = coleccion.find_one({"Matricula": matricula})
-    if not alumno:
-        try:
-            matricula_int = int(matricula)
-            alumno = coleccion.find_one({"Matricula": matricula_int})
-        except (ValueError, TypeError):
-            pass
+    # Buscar y eliminar el alumno en una sola operación
+    alumno = await coleccion.find_one_and_delete(filtro_matricula(matricula))
     
     if not alumno:
         raise ValueError("Alumno no encontrado en bachillerato")
-    
-    # Eliminar el alumno
-    resultado = coleccion.delete_one({"Matricula": alumno.get("Matricula")})
-    
-    if resultado.deleted_count == 0:
-        raise ValueError("No se pudo eliminar el alumno")
+
+    clave = normalizar_matricula(alumno.get("Matricula", matricula))
+    cache_bachillerato.invalidar(clave)
+    await incrementar_version("alumnos_bachillerato_apodaca")
+    if Config.ROSTER_SNAPSHOT:
+        await asyncio.to_thread(snapshot_bachillerato.publicar_cambio, clave, None)
+        snapshot_bachillerato.recargar()
     
     # Retornar información del alumno eliminado
     alumno["_id"] = str(alumno["_id"])
@@ -509,7 +779,7 @@ def eliminar_alumno_bachillerato(matricula: str) -> Dict:
         "alumno_eliminado": alumno
     }
 
-def eliminar_alumno_universidad(matricula: str) -> Dict:
+async def eliminar_alumno_universidad(matricula: str) -> Dict:
     """
     Elimina un alumno de la colección 'alumnos_universidad_apodaca' por su matrícula.
     Retorna información sobre el alumno eliminado.
@@ -517,23 +787,18 @@ def eliminar_alumno_universidad(matricula: str) -> Dict:
     db = get_db()
     coleccion = db.alumnos_universidad_apodaca
     
-    # Buscar el alumno por matrícula (intentar como string e int)
-    alumno = coleccion.find_one({"Matricula": matricula})
-    if not alumno:
-        try:
-            matricula_int = int(matricula)
-            alumno = coleccion.find_one({"Matricula": matricula_int})
-        except (ValueError, TypeError):
-            pass
+    # Buscar y eliminar el alumno en una sola operación
+    alumno = await coleccion.find_one_and_delete(filtro_matricula(matricula))
     
     if not alumno:
         raise ValueError("Alumno no encontrado en universidad")
-    
-    # Eliminar el alumno
-    resultado = coleccion.delete_one({"Matricula": alumno.get("Matricula")})
-    
-    if resultado.deleted_count == 0:
-        raise ValueError("No se pudo eliminar el alumno")
+
+    clave = normalizar_matricula(alumno.get("Matricula", matricula))
+    cache_universidad.invalidar(clave)
+    await incrementar_version("alumnos_universidad_apodaca")
+    if Config.ROSTER_SNAPSHOT:
+        await asyncio.to_thread(snapshot_universidad.publicar_cambio, clave, None)
+        snapshot_universidad.recargar()
     
     # Retornar información del alumno eliminado
     alumno["_id"] = str(alumno["_id"])
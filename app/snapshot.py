@@ -0,0 +1,282 @@
+"""
+Snapshot del padrón de alumnos compartido entre procesos (workers de uvicorn).
+
+El roster de cada nivel se escribe una sola vez en un archivo binario compacto
+que todos los workers abren con mmap: el sistema operativo mantiene una sola
+copia en el page cache, así que la memoria no crece al agregar workers.
+
+Formato del archivo (little endian):
+- Encabezado: magic "RSN1", versión (u64), total de registros (u32)
+- Índice: `total` entradas de 16 bytes ordenadas por matrícula (bytes UTF-8):
+  offset de la clave (u32), longitud de la clave (u16), relleno (2 bytes),
+  offset del registro (u32), longitud del registro (u32)
+- Claves y registros (JSON compacto con los campos de usuario_datos)
+
+La búsqueda es binaria sobre el índice, leyendo directamente del mmap.
+Cada cambio (crear/eliminar alumno) publica una versión nueva: se escribe un
+archivo temporal y se reemplaza con os.replace, que es atómico; los lectores
+detectan el cambio de inodo y vuelven a mapear el archivo. La escritura se
+serializa entre procesos con un candado de archivo (fcntl, solo Unix).
+
+La escritura (escribir, publicar_cambio) puede correr en un hilo con
+asyncio.to_thread: solo lee y escribe el archivo y nunca toca el mapa del
+lector. El mapa se reemplaza únicamente en el hilo del event loop (buscar,
+recargar), así que una búsqueda nunca ve un mapa cerrado a medias.
+"""
+import json
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from app.config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin candado entre procesos (un solo worker)
+    fcntl = None
+
+MAGIC = b"RSN1"
+ENCABEZADO = struct.Struct("<4sQI")
+ENTRADA = struct.Struct("<IHxxII")
+
+# Segundos entre revisiones del archivo para detectar una versión nueva
+INTERVALO_REVISION = 1.0
+
+def codificar_registro(registro: Dict) -> bytes:
+    """Serializa un registro del snapshot como JSON compacto"""
+    return json.dumps(registro, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def escribir_snapshot(ruta: str, registros: Dict[str, bytes], version: int):
+    """
+    Escribe un snapshot completo y lo publica de forma atómica.
+    registros: matrícula -> registro ya codificado.
+    """
+    claves = sorted((clave.encode("utf-8"), registro) for clave, registro in registros.items())
+
+    inicio_claves = ENCABEZADO.size + ENTRADA.size * len(claves)
+    inicio_registros = inicio_claves + sum(len(clave) for clave, _ in claves)
+
+    indice = bytearray()
+    offset_clave = inicio_claves
+    offset_registro = inicio_registros
+    for clave, registro in claves:
+        indice += ENTRADA.pack(offset_clave, len(clave), offset_registro, len(registro))
+        offset_clave += len(clave)
+        offset_registro += len(registro)
+
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "wb") as archivo:
+        archivo.write(ENCABEZADO.pack(MAGIC, version, len(claves)))
+        archivo.write(indice)
+        for clave, _ in claves:
+            archivo.write(clave)
+        for _, registro in claves:
+            archivo.write(registro)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+
+    os.replace(temporal, ruta)
+
+def leer_snapshot(ruta: str) -> Optional[Tuple[int, Dict[str, bytes]]]:
+    """
+    Lee la versión publicada de un snapshot con su propio mapa.
+    Retorna (versión, matrícula -> registro codificado), o None si no existe.
+    """
+    try:
+        with open(ruta, "rb") as archivo, mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            magic, version, total = ENCABEZADO.unpack_from(mapa, 0)
+            if magic != MAGIC:
+                raise ValueError(f"El archivo {ruta} no es un snapshot de roster")
+            registros = {}
+            for posicion in range(total):
+                offset_clave, largo_clave, offset_registro, largo_registro = ENTRADA.unpack_from(
+                    mapa, ENCABEZADO.size + posicion * ENTRADA.size
+                )
+                clave = mapa[offset_clave:offset_clave + largo_clave].decode("utf-8")
+                registros[clave] = mapa[offset_registro:offset_registro + largo_registro]
+            return version, registros
+    except FileNotFoundError:
+        return None
+
+def version_publicada(ruta: str) -> int:
+    """Versión del snapshot publicado (0 si no existe)"""
+    try:
+        with open(ruta, "rb") as archivo:
+            encabezado = archivo.read(ENCABEZADO.size)
+    except FileNotFoundError:
+        return 0
+    if len(encabezado) < ENCABEZADO.size:
+        return 0
+    magic, version, _ = ENCABEZADO.unpack(encabezado)
+    return version if magic == MAGIC else 0
+
+def adquirir_candado(ruta: str):
+    """
+    Toma el candado exclusivo entre procesos de un snapshot (bloquea hasta obtenerlo).
+    Retorna el archivo del candado, que se entrega a liberar_candado.
+    """
+    archivo_candado = open(f"{ruta}.lock", "a")
+    if fcntl is not None:
+        fcntl.flock(archivo_candado, fcntl.LOCK_EX)
+    return archivo_candado
+
+def liberar_candado(archivo_candado):
+    """Libera el candado tomado con adquirir_candado"""
+    if fcntl is not None:
+        fcntl.flock(archivo_candado, fcntl.LOCK_UN)
+    archivo_candado.close()
+
+@contextmanager
+def candado_escritura(ruta: str):
+    """Candado exclusivo entre procesos para publicar una versión del snapshot"""
+    archivo_candado = adquirir_candado(ruta)
+    try:
+        yield
+    finally:
+        liberar_candado(archivo_candado)
+
+class SnapshotRoster:
+    """Lector de un snapshot de roster mapeado en memoria"""
+
+    def __init__(self, nombre: str, ruta: str):
+        self.nombre = nombre
+        self.ruta = ruta
+        self._mapa: Optional[mmap.mmap] = None
+        self._inodo: Optional[int] = None
+        self._ultima_revision = 0.0
+        self.version = 0
+        self.total = 0
+
+    @property
+    def disponible(self) -> bool:
+        self._refrescar()
+        return self._mapa is not None
+
+    def _abrir(self):
+        """Mapea la versión actual del archivo (si existe)"""
+        try:
+            with open(self.ruta, "rb") as archivo:
+                inodo = os.fstat(archivo.fileno()).st_ino
+                mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return
+
+        magic, version, total = ENCABEZADO.unpack_from(mapa, 0)
+        if magic != MAGIC:
+            mapa.close()
+            raise ValueError(f"El archivo {self.ruta} no es un snapshot de roster")
+
+        anterior = self._mapa
+        self._mapa, self._inodo = mapa, inodo
+        self.version, self.total = version, total
+        if anterior is not None:
+            anterior.close()
+
+    def _refrescar(self, forzar: bool = False):
+        """Vuelve a mapear el archivo si se publicó una versión nueva"""
+        ahora = time.monotonic()
+        if not forzar and ahora - self._ultima_revision < INTERVALO_REVISION:
+            return
+        self._ultima_revision = ahora
+        try:
+            inodo = os.stat(self.ruta).st_ino
+        except FileNotFoundError:
+            return
+        if inodo != self._inodo:
+            self._abrir()
+
+    def recargar(self):
+        """Mapea la última versión publicada; se llama en el event loop después de escribir"""
+        self._refrescar(forzar=True)
+
+    @staticmethod
+    def _entrada(mapa: mmap.mmap, posicion: int) -> Tuple[int, int, int, int]:
+        return ENTRADA.unpack_from(mapa, ENCABEZADO.size + posicion * ENTRADA.size)
+
+    def buscar(self, clave: str) -> Optional[Dict]:
+        """
+        Busca una matrícula con búsqueda binaria sobre el índice.
+        Retorna el registro como dict, o None si no está en el snapshot.
+        """
+        self._refrescar()
+        # Mapa y total de la misma versión durante toda la búsqueda
+        mapa, total = self._mapa, self.total
+        if mapa is None:
+            return None
+
+        objetivo = clave.encode("utf-8")
+        bajo, alto = 0, total
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            offset_clave, largo_clave, offset_registro, largo_registro = self._entrada(mapa, medio)
+            actual = mapa[offset_clave:offset_clave + largo_clave]
+            if actual < objetivo:
+                bajo = medio + 1
+            elif actual > objetivo:
+                alto = medio
+            else:
+                return json.loads(mapa[offset_registro:offset_registro + largo_registro])
+        return None
+
+    def reciente(self, segundos: float) -> bool:
+        """Indica si el archivo se publicó hace menos de `segundos`"""
+        try:
+            return time.time() - os.stat(self.ruta).st_mtime < segundos
+        except FileNotFoundError:
+            return False
+
+    def escribir(self, registros: Dict[str, bytes]):
+        """
+        Publica un snapshot completo como una versión nueva.
+        Quien llama debe tener el candado (candado_escritura o adquirir_candado)
+        y, de vuelta en el event loop, llamar a recargar().
+        """
+        escribir_snapshot(self.ruta, registros, version_publicada(self.ruta) + 1)
+
+    def publicar_cambio(self, clave: str, registro: Optional[Dict]):
+        """
+        Publica una versión nueva con un alumno agregado/actualizado (registro)
+        o eliminado (registro=None), partiendo de la última versión publicada.
+        No toca el mapa del lector: después hay que llamar a recargar().
+        """
+        with candado_escritura(self.ruta):
+            publicado = leer_snapshot(self.ruta)
+            if publicado is None:
+                return
+            version, registros = publicado
+            if registro is None:
+                registros.pop(clave, None)
+            else:
+                registros[clave] = codificar_registro(registro)
+            escribir_snapshot(self.ruta, registros, version + 1)
+
+    def estadisticas(self) -> Dict:
+        """Datos del snapshot mapeado para monitoreo"""
+        self._refrescar()
+        return {
+            "snapshot": self.nombre,
+            "ruta": self.ruta,
+            "disponible": self._mapa is not None,
+            "version": self.version,
+            "registros": self.total,
+            "bytes": len(self._mapa) if self._mapa is not None else 0
+        }
+
+snapshot_bachillerato = SnapshotRoster(
+    "alumnos_bachillerato_apodaca",
+    os.path.join(Config.ROSTER_SNAPSHOT_DIR, "alumnos_bachillerato.snap")
+)
+snapshot_universidad = SnapshotRoster(
+    "alumnos_universidad_apodaca",
+    os.path.join(Config.ROSTER_SNAPSHOT_DIR, "alumnos_universidad.snap")
+)
+
+def obtener_estadisticas_snapshot() -> Dict:
+    """Estadísticas de los snapshots de roster mapeados por este proceso"""
+    return {
+        "habilitado": Config.ROSTER_SNAPSHOT,
+        "bachillerato": snapshot_bachillerato.estadisticas(),
+        "universidad": snapshot_universidad.estadisticas()
+    }
@@ -0,0 +1,37 @@
+"""
+Respuestas en streaming (NDJSON) para lecturas de colecciones grandes.
+
+En lugar de construir la lista completa en memoria y serializarla al final,
+se recorre el cursor de MongoDB por lotes (batch_size) y cada documento se
+escribe como una línea JSON en cuanto llega. La memoria se mantiene constante
+sin importar el tamaño de la colección y el primer byte sale antes de leer
+el último documento.
+"""
+from typing import AsyncIterator, Dict
+from fastapi.responses import StreamingResponse
+from app.serializacion import a_json
+
+MEDIA_TYPE_NDJSON = "application/x-ndjson"
+
+# Bytes acumulados antes de enviar un fragmento al cliente
+TAMAÑO_FRAGMENTO = 64 * 1024
+
+async def generar_ndjson(documentos: AsyncIterator[Dict]) -> AsyncIterator[bytes]:
+    """
+    Convierte un iterador asíncrono de documentos en fragmentos NDJSON.
+    Las líneas se agrupan en fragmentos de ~64 KB para no enviar un paquete por documento.
+    """
+    fragmento = bytearray()
+    async for documento in documentos:
+        fragmento += a_json(documento)
+        fragmento += b"\n"
+        if len(fragmento) >= TAMAÑO_FRAGMENTO:
+            yield bytes(fragmento)
+            fragmento.clear()
+
+    if fragmento:
+        yield bytes(fragmento)
+
+def respuesta_ndjson(documentos: AsyncIterator[Dict]) -> StreamingResponse:
+    """Crea la StreamingResponse NDJSON para un iterador de documentos"""
+    return StreamingResponse(generar_ndjson(documentos), media_type=MEDIA_TYPE_NDJSON)
@@ -0,0 +1,57 @@
+"""
+Contadores de versión por colección.
+
+Cada colección cuyo contenido se sirve con ETag (padrones de alumnos y
+maestros) tiene un documento en 'versiones_colecciones' con un contador que
+los servicios de crear/eliminar/importar incrementan con $inc. Las respuestas
+derivan su ETag de esa versión, así que un cliente que ya tiene la versión
+actual recibe 304 sin que se vuelva a consultar la colección.
+
+Cada proceso guarda la última versión leída y solo la vuelve a consultar
+(una lectura por _id) si pasaron más de INTERVALO_REVISION_VERSION segundos;
+un cambio hecho por otro worker se refleja a más tardar en ese intervalo.
+Los cambios hechos fuera de la API (por ejemplo, desde Compass) deben
+incrementar la versión a mano o con incrementar_version.
+"""
+import time
+from typing import Dict, Tuple
+from pymongo import ReturnDocument
+from app.database import get_db
+
+# Segundos que se reutiliza la versión leída antes de volver a consultarla
+INTERVALO_REVISION_VERSION = 1.0
+
+class VersionesColecciones:
+    """Versión de cada colección con una copia local revisada periódicamente"""
+
+    def __init__(self):
+        self._versiones: Dict[str, Tuple[int, float]] = {}
+
+    async def obtener(self, coleccion: str) -> int:
+        """Versión actual de una colección (0 si nunca ha cambiado)"""
+        ahora = time.monotonic()
+        local = self._versiones.get(coleccion)
+        if local is not None and ahora - local[1] < INTERVALO_REVISION_VERSION:
+            return local[0]
+
+        documento = await get_db().versiones_colecciones.find_one({"_id": coleccion})
+        version = documento["version"] if documento else 0
+        self._versiones[coleccion] = (version, ahora)
+        return version
+
+    async def incrementar(self, coleccion: str) -> int:
+        """Marca un cambio en la colección y retorna la versión nueva"""
+        documento = await get_db().versiones_colecciones.find_one_and_update(
+            {"_id": coleccion},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._versiones[coleccion] = (documento["version"], time.monotonic())
+        return documento["version"]
+
+versiones = VersionesColecciones()
+
+async def incrementar_version(coleccion: str) -> int:
+    """Incrementa la versión de una colección (ver VersionesColecciones)"""
+    return await versiones.incrementar(coleccion)
@@ -0,0 +1,368 @@
+"""
+Prueba de carga que simula la entrada de la mañana.
+
+Escenario (todo a través de la API HTTP):
+- Los alumnos llegan en ráfagas (--rafaga alumnos cada --intervalo-rafaga
+  segundos) y se forman en la fila de los kioscos
+- Cada kiosco (--kioscos) toma al siguiente alumno, lo busca
+  (GET /api/alumnos/{matricula}) y registra su asistencia
+  (POST /api/asistencias/registrar). Con probabilidad --reescaneo el alumno
+  pasa su credencial otra vez y el registro repetido debe responder 400
+- Coordinadores (--coordinadores) inician sesión en
+  /api/usuarios/apodaca/login cada --intervalo-login segundos
+- Tableros (--tableros) consultan cada --intervalo-tablero segundos la lista
+  de asistencias, las estadísticas del día y el padrón de bachillerato,
+  reenviando el ETag (200 o 304)
+
+La prueba termina cuando todos los alumnos pasaron por un kiosco. Antes se
+siembra el padrón con la importación de CSV y se crea el usuario coordinador.
+
+Modos:
+- asgi (por defecto): la app corre en este proceso y httpx la llama sin red
+- uvicorn: la app corre en este proceso detrás de uvicorn en --puerto; mide
+  también HTTP y la serialización en el socket
+- --url: apunta a un servidor ya levantado (sin sembrar con --sin-sembrar si
+  ya tiene datos)
+
+Base de datos: mongomock en memoria por defecto (ver mongo_local.py), o un
+mongod con --mongo-uri. Con mongod se usan las bases --base y --base-usuarios
+(asistencia_benchmark y usuarios_benchmark), que se borran al empezar.
+
+El reporte (JSON) trae por operación: peticiones, errores, tasa de error,
+peticiones por segundo, latencias p50/p95/p99/máxima en ms y conteo por
+código de estado. Se guarda en benchmarks/resultados/ y se imprime un resumen.
+
+Ejecutar: python benchmarks/carga_matutina.py --alumnos 2000 --kioscos 8
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+BASES_PRODUCCION = {"asistencia_edec", "usuarios_edec"}
+CORREO_COORDINADOR = "coordinador.benchmark@edec.mx"
+CONTRASEÑA_COORDINADOR = "benchmark-2024"
+CAMPUS = ["Apodaca", "Monterrey", "Guadalupe"]
+PROGRAMAS = ["Bachillerato General", "Bachillerato Tecnológico", "Ingeniería", "Administración", "Derecho"]
+TURNOS = ["Matutino", "Vespertino"]
+NOMBRES = ["José", "María", "Juan", "Ana", "Luis", "Sofía", "Carlos", "Valeria", "Diego", "Fernanda"]
+APELLIDOS = ["García", "Martínez", "López", "Hernández", "González", "Pérez", "Rodríguez", "Treviño", "Garza", "Núñez"]
+
+# Códigos de estado esperados por operación; cualquier otro cuenta como error
+ESTADOS_ESPERADOS = {
+    "buscar_alumno": {200},
+    "registrar_asistencia": {200},
+    "reescaneo": {400},
+    "login": {200},
+    "tablero_asistencias": {200, 304},
+    "tablero_estadisticas": {200},
+    "tablero_padron": {200, 304}
+}
+
+class Mediciones:
+    """Latencias y códigos de estado por operación"""
+
+    def __init__(self):
+        self.latencias: Dict[str, List[float]] = {operacion: [] for operacion in ESTADOS_ESPERADOS}
+        self.estados: Dict[str, Dict[str, int]] = {operacion: {} for operacion in ESTADOS_ESPERADOS}
+        self.errores: Dict[str, int] = {operacion: 0 for operacion in ESTADOS_ESPERADOS}
+
+    async def medir(self, operacion: str, peticion) -> Optional[httpx.Response]:
+        """Ejecuta la petición (corrutina) y registra su latencia y su código de estado"""
+        inicio = time.perf_counter()
+        respuesta = None
+        try:
+            respuesta = await peticion
+            estado = str(respuesta.status_code)
+            esperado = respuesta.status_code in ESTADOS_ESPERADOS[operacion]
+        except httpx.HTTPError as e:
+            estado = type(e).__name__
+            esperado = False
+        self.latencias[operacion].append(time.perf_counter() - inicio)
+        self.estados[operacion][estado] = self.estados[operacion].get(estado, 0) + 1
+        if not esperado:
+            self.errores[operacion] += 1
+        return respuesta
+
+def percentil(ordenadas: List[float], p: float) -> float:
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not ordenadas:
+        return 0.0
+    indice = max(0, min(len(ordenadas) - 1, math.ceil(p / 100 * len(ordenadas)) - 1))
+    return ordenadas[indice]
+
+def resumir(latencias: List[float], errores: int, estados: Dict[str, int], duracion: float) -> Dict:
+    ordenadas = sorted(latencias)
+    total = len(ordenadas)
+    return {
+        "peticiones": total,
+        "errores": errores,
+        "tasa_error": round(errores / total, 4) if total else 0.0,
+        "peticiones_por_segundo": round(total / duracion, 2) if duracion else 0.0,
+        "p50_ms": round(percentil(ordenadas, 50) * 1000, 3),
+        "p95_ms": round(percentil(ordenadas, 95) * 1000, 3),
+        "p99_ms": round(percentil(ordenadas, 99) * 1000, 3),
+        "max_ms": round(ordenadas[-1] * 1000, 3) if ordenadas else 0.0,
+        "estados": dict(sorted(estados.items()))
+    }
+
+def generar_padron(total: int, semilla: int) -> Dict[str, List[Dict]]:
+    """Alumnos sintéticos: 70% bachillerato y 30% universidad"""
+    aleatorio = random.Random(semilla)
+    padron = {"bachillerato": [], "universidad": []}
+    for numero in range(total):
+        nivel = "bachillerato" if numero % 10 < 7 else "universidad"
+        padron[nivel].append({
+            "Matricula": f"{2400000 + numero}",
+            "Nombre": f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}",
+            "Campus": aleatorio.choice(CAMPUS),
+            "Programa": aleatorio.choice(PROGRAMAS[:2] if nivel == "bachillerato" else PROGRAMAS[2:]),
+            "Turno": aleatorio.choice(TURNOS)
+        })
+    return padron
+
+def a_csv(alumnos: List[Dict]) -> bytes:
+    columnas = ["Matricula", "Nombre", "Campus", "Programa", "Turno"]
+    lineas = [",".join(columnas)] + [",".join(alumno[columna] for columna in columnas) for alumno in alumnos]
+    return ("\n".join(lineas) + "\n").encode("utf-8")
+
+async def sembrar(cliente: httpx.AsyncClient, padron: Dict[str, List[Dict]]):
+    """Importa el padrón por CSV y crea el usuario coordinador (400 si ya existe)"""
+    for nivel, alumnos in padron.items():
+        respuesta = await cliente.post(
+            f"/api/alumnos/{nivel}/importar",
+            files={"archivo": (f"{nivel}.csv", io.BytesIO(a_csv(alumnos)), "text/csv")},
+            timeout=600
+        )
+        respuesta.raise_for_status()
+        print(f"   {nivel}: {respuesta.json()}")
+    respuesta = await cliente.post("/api/usuarios/apodaca/crear", json={
+        "nombre_completo": "Coordinador Benchmark",
+        "correo": CORREO_COORDINADOR,
+        "contraseña": CONTRASEÑA_COORDINADOR,
+        "rol": "coordinador",
+        "campus": "Apodaca"
+    })
+    if respuesta.status_code not in (200, 400):
+        respuesta.raise_for_status()
+
+async def llegadas(fila: asyncio.Queue, alumnos: List[Dict], rafaga: int, intervalo: float, kioscos: int):
+    """Forma a los alumnos en ráfagas y al final un aviso de cierre por kiosco"""
+    for inicio in range(0, len(alumnos), rafaga):
+        for alumno in alumnos[inicio:inicio + rafaga]:
+            fila.put_nowait(alumno)
+        if inicio + rafaga < len(alumnos):
+            await asyncio.sleep(intervalo)
+    for _ in range(kioscos):
+        fila.put_nowait(None)
+
+async def kiosco(cliente: httpx.AsyncClient, fila: asyncio.Queue, mediciones: Mediciones,
+                 reescaneo: float, aleatorio: random.Random):
+    while True:
+        alumno = await fila.get()
+        if alumno is None:
+            return
+        matricula = alumno["Matricula"]
+        respuesta = await mediciones.medir("buscar_alumno", cliente.get(f"/api/alumnos/{matricula}"))
+        nombre = alumno["Nombre"]
+        if respuesta is not None and respuesta.status_code == 200:
+            nombre = respuesta.json()["alumno"]["nombre"]
+        cuerpo = {"matricula": matricula, "nombre": nombre}
+        await mediciones.medir("registrar_asistencia", cliente.post("/api/asistencias/registrar", json=cuerpo))
+        if aleatorio.random() < reescaneo:
+            await mediciones.medir("reescaneo", cliente.post("/api/asistencias/registrar", json=cuerpo))
+
+async def coordinador(cliente: httpx.AsyncClient, mediciones: Mediciones, intervalo: float, fin: asyncio.Event):
+    while not fin.is_set():
+        await mediciones.medir("login", cliente.post("/api/usuarios/apodaca/login", json={
+            "correo": CORREO_COORDINADOR, "contraseña": CONTRASEÑA_COORDINADOR
+        }))
+        await esperar(fin, intervalo)
+
+async def tablero(cliente: httpx.AsyncClient, mediciones: Mediciones, intervalo: float, fin: asyncio.Event):
+    etags: Dict[str, str] = {}
+    consultas = [
+        ("tablero_asistencias", "/api/asistencias/apodaca/todas?limite=100"),
+        ("tablero_estadisticas", "/api/estadisticas/diarias"),
+        ("tablero_padron", "/api/alumnos/bachillerato?completo=true")
+    ]
+    while not fin.is_set():
+        for operacion, ruta in consultas:
+            encabezados = {"If-None-Match": etags[ruta]} if ruta in etags else {}
+            respuesta = await mediciones.medir(operacion, cliente.get(ruta, headers=encabezados))
+            if respuesta is not None and respuesta.headers.get("etag"):
+                etags[ruta] = respuesta.headers["etag"]
+        await esperar(fin, intervalo)
+
+async def esperar(fin: asyncio.Event, segundos: float):
+    try:
+        await asyncio.wait_for(fin.wait(), timeout=segundos)
+    except asyncio.TimeoutError:
+        pass
+
+async def correr_escenario(cliente: httpx.AsyncClient, args, padron: Dict[str, List[Dict]]) -> Dict:
+    aleatorio = random.Random(args.semilla)
+    alumnos = padron["bachillerato"] + padron["universidad"]
+    aleatorio.shuffle(alumnos)
+
+    mediciones = Mediciones()
+    fila: asyncio.Queue = asyncio.Queue()
+    fin = asyncio.Event()
+    fondo = [asyncio.create_task(coordinador(cliente, mediciones, args.intervalo_login, fin)) for _ in range(args.coordinadores)]
+    fondo += [asyncio.create_task(tablero(cliente, mediciones, args.intervalo_tablero, fin)) for _ in range(args.tableros)]
+
+    inicio = time.perf_counter()
+    await asyncio.gather(
+        llegadas(fila, alumnos, args.rafaga, args.intervalo_rafaga, args.kioscos),
+        *[kiosco(cliente, fila, mediciones, args.reescaneo, random.Random(args.semilla + numero)) for numero in range(args.kioscos)]
+    )
+    fin.set()
+    await asyncio.gather(*fondo)
+    duracion = time.perf_counter() - inicio
+
+    operaciones = {
+        operacion: resumir(mediciones.latencias[operacion], mediciones.errores[operacion], mediciones.estados[operacion], duracion)
+        for operacion in ESTADOS_ESPERADOS
+    }
+    todas = [latencia for latencias in mediciones.latencias.values() for latencia in latencias]
+    estados: Dict[str, int] = {}
+    for conteos in mediciones.estados.values():
+        for estado, conteo in conteos.items():
+            estados[estado] = estados.get(estado, 0) + conteo
+    return {
+        "duracion_s": round(duracion, 3),
+        "total": resumir(todas, sum(mediciones.errores.values()), estados, duracion),
+        "operaciones": operaciones
+    }
+
+def preparar_entorno(args):
+    """Variables de entorno que Config lee al importarse (antes de importar app)"""
+    if args.mongo_uri:
+        if {args.base, args.base_usuarios} & BASES_PRODUCCION:
+            raise SystemExit("❌ Usa bases de datos dedicadas al benchmark: se borran al empezar")
+        os.environ["MONGODB_URI"] = args.mongo_uri
+    os.environ["DATABASE_NAME"] = args.base
+    os.environ["USUARIOS_DATABASE_NAME"] = args.base_usuarios
+    os.environ.setdefault("CONSULTAS_LENTAS_LOG", "")
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+
+async def limpiar_bases(args):
+    from app.database import connect_db, database
+    connect_db()
+    for base in (args.base, args.base_usuarios):
+        await database.client.drop_database(base)
+
+async def ejecutar(args) -> Dict:
+    padron = generar_padron(args.alumnos, args.semilla)
+    limites = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url.rstrip("/"), limits=limites, timeout=args.timeout) as cliente:
+            if not args.sin_sembrar:
+                print("🌱 Sembrando padrón...")
+                await sembrar(cliente, padron)
+            return await correr_escenario(cliente, args, padron)
+
+    preparar_entorno(args)
+    if not args.mongo_uri:
+        from benchmarks.mongo_local import instalar
+        instalar()
+    elif not args.sin_sembrar:
+        await limpiar_bases(args)
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        if args.modo == "asgi":
+            transporte = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark", timeout=args.timeout) as cliente:
+                if not args.sin_sembrar:
+                    print("🌱 Sembrando padrón...")
+                    await sembrar(cliente, padron)
+                return await correr_escenario(cliente, args, padron)
+
+        import uvicorn
+        servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.puerto, lifespan="off", log_level="warning"))
+        tarea = asyncio.create_task(servidor.serve())
+        while not servidor.started:
+            await asyncio.sleep(0.05)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.puerto}", limits=limites, timeout=args.timeout) as cliente:
+                if not args.sin_sembrar:
+                    print("🌱 Sembrando padrón...")
+                    await sembrar(cliente, padron)
+                return await correr_escenario(cliente, args, padron)
+        finally:
+            servidor.should_exit = True
+            await tarea
+
+def imprimir_resumen(reporte: Dict):
+    print(f"\n{'operación':<22} | {'peticiones':>10} | {'rps':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'errores':>7}")
+    filas = list(reporte["operaciones"].items()) + [("TOTAL", reporte["total"])]
+    for operacion, r in filas:
+        print(
+            f"{operacion:<22} | {r['peticiones']:>10} | {r['peticiones_por_segundo']:>8.1f} | {r['p50_ms']:>8.2f} | "
+            f"{r['p95_ms']:>8.2f} | {r['p99_ms']:>8.2f} | {r['errores']:>7}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la entrada de la mañana")
+    parser.add_argument("--modo", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--url", help="Servidor externo (ignora --modo y --mongo-uri)")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--mongo-uri", help="mongod local; sin este parámetro se usa mongomock")
+    parser.add_argument("--base", default="asistencia_benchmark")
+    parser.add_argument("--base-usuarios", default="usuarios_benchmark")
+    parser.add_argument("--sin-sembrar", action="store_true", help="No importar el padrón ni crear el coordinador")
+    parser.add_argument("--alumnos", type=int, default=2000)
+    parser.add_argument("--kioscos", type=int, default=8)
+    parser.add_argument("--rafaga", type=int, default=200, help="Alumnos que llegan juntos")
+    parser.add_argument("--intervalo-rafaga", type=float, default=1.0, help="Segundos entre ráfagas")
+    parser.add_argument("--reescaneo", type=float, default=0.1, help="Probabilidad de pasar la credencial dos veces")
+    parser.add_argument("--coordinadores", type=int, default=2)
+    parser.add_argument("--intervalo-login", type=float, default=2.0)
+    parser.add_argument("--tableros", type=int, default=2)
+    parser.add_argument("--intervalo-tablero", type=float, default=5.0)
+    parser.add_argument("--bcrypt-rounds", type=int, help="Costo de bcrypt de la app (solo en este proceso)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--semilla", type=int, default=2024)
+    parser.add_argument("--salida", help="Archivo JSON del reporte (por defecto benchmarks/resultados/)")
+    args = parser.parse_args()
+
+    inicio = datetime.now()
+    resultado = asyncio.run(ejecutar(args))
+    reporte = {
+        "escenario": "carga_matutina",
+        "fecha": inicio.isoformat(timespec="seconds"),
+        "entorno": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "backend": "url" if args.url else ("mongod" if args.mongo_uri else "mongomock")
+        },
+        "parametros": {llave: valor for llave, valor in vars(args).items() if llave not in ("salida", "mongo_uri")},
+        **resultado
+    }
+
+    salida = args.salida or os.path.join(DIRECTORIO_RESULTADOS, f"carga_matutina_{inicio:%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as archivo:
+        json.dump(reporte, archivo, ensure_ascii=False, indent=2)
+
+    imprimir_resumen(reporte)
+    print(f"\n📄 Reporte: {salida}")
+
+if __name__ == "__main__":
+    main()
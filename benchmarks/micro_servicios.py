@@ -0,0 +1,363 @@
+"""
+Microbenchmarks de las funciones de servicio más usadas.
+
+Para cada tamaño (--tamaños, por defecto 1k, 10k y 100k documentos por
+colección) se siembra una base en memoria (mongomock, ver mongo_local.py)
+con alumnos de ambos niveles, fichados, asistencias y usuarios de Apodaca, y
+se mide cada función:
+- registrar_asistencia: una matrícula distinta en cada llamada
+- obtener_datos_alumno_bachillerato: con la caché de roster vacía (consulta a
+  la base) y [cache] con la matrícula ya en caché
+- obtener_fichados_apodaca_agrupados: pipeline $group sobre todos los fichados
+- obtener_todos_alumnos_universidad: colección completa ordenada
+- autenticar_usuario_apodaca: búsqueda por correo y verificación bcrypt con
+  --bcrypt-rounds (bajo por defecto, para que domine el código del servicio)
+
+Por llamada se reporta el tiempo (mediana, p95 y mínimo en ms) y la memoria
+asignada con tracemalloc (pico y retenida, en KiB). La memoria se mide en
+una pasada aparte porque tracemalloc vuelve más lento el código.
+
+mongomock no usa índices ni simula la red: los tiempos sirven para comparar
+versiones del código de los servicios en la misma máquina, no para estimar
+la latencia en MongoDB Atlas.
+
+Ejecutar:
+  python benchmarks/micro_servicios.py medir --guardar-linea-base
+  python benchmarks/micro_servicios.py comparar --tolerancia 0.2
+
+comparar vuelve a medir con los parámetros de la línea base (o lee
+--resultados) y termina con código 1 si alguna función empeora más que la
+tolerancia en tiempo o en memoria.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.carga_matutina import APELLIDOS, CAMPUS, DIRECTORIO_RESULTADOS, NOMBRES, PROGRAMAS, TURNOS, percentil
+
+LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "linea_base_servicios.json")
+CORREO_USUARIO = "coordinador.benchmark@edec.mx"
+CONTRASEÑA_USUARIO = "benchmark-2024"
+
+def preparar_entorno(bcrypt_rounds: int):
+    """Variables que Config lee al importarse y base en memoria (antes de importar app)"""
+    os.environ["BCRYPT_ROUNDS"] = str(bcrypt_rounds)
+    os.environ["CONSULTAS_LENTAS_LOG"] = ""
+    os.environ["ROSTER_SNAPSHOT"] = "false"
+    os.environ["FICHADOS_BUFFER"] = "false"
+    from benchmarks.mongo_local import instalar
+    instalar()
+
+def _alumno(aleatorio: random.Random, matricula: str, programas: List[str]) -> Dict:
+    return {
+        "Matricula": matricula,
+        "Nombre": f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}",
+        "Coordinador": "Coordinación Apodaca",
+        "Graduado": "No",
+        "Correo": f"{matricula}@alumnos.edec.mx",
+        "Campus": aleatorio.choice(CAMPUS),
+        "Programa": aleatorio.choice(programas),
+        "Ciclo": "2024-2025",
+        "Turno": aleatorio.choice(TURNOS)
+    }
+
+class Contexto:
+    """Base sembrada de un tamaño y matrículas disponibles para las llamadas"""
+
+    def __init__(self, tamaño: int, semilla: int):
+        self.tamaño = tamaño
+        self.aleatorio = random.Random(semilla)
+        self.bachillerato = [f"{1000000 + numero}" for numero in range(tamaño)]
+        self.universidad = [f"{5000000 + numero}" for numero in range(tamaño)]
+        # Matrículas sin asistencia hoy, una por llamada a registrar_asistencia
+        self._sin_asistencia = iter(self.universidad)
+
+    def siguiente_sin_asistencia(self) -> str:
+        return next(self._sin_asistencia)
+
+    async def sembrar(self):
+        from app.database import close_db, connect_db, get_db, get_db_usuarios
+        from app.indices import crear_indices
+        from app.matricula import MIGRACION_MATRICULA_ID, cargar_estado_matricula
+        from app.services.hash_service import hashear_contraseña
+
+        # Cliente nuevo = base en memoria vacía
+        await close_db()
+        connect_db()
+        db = get_db()
+        await db.migraciones.insert_one({"_id": MIGRACION_MATRICULA_ID, "completada": True})
+        await cargar_estado_matricula()
+
+        aleatorio = self.aleatorio
+        await db.alumnos_bachillerato_apodaca.insert_many(
+            [_alumno(aleatorio, matricula, PROGRAMAS[:2]) for matricula in self.bachillerato]
+        )
+        await db.alumnos_universidad_apodaca.insert_many(
+            [_alumno(aleatorio, matricula, PROGRAMAS[2:]) for matricula in self.universidad]
+        )
+
+        # Fichados: en promedio tres por alumno, en los últimos 30 días
+        ahora = datetime.now()
+        fichados = []
+        for _ in range(self.tamaño):
+            alumno = _alumno(aleatorio, aleatorio.choice(self.bachillerato[:max(1, self.tamaño // 3)]), PROGRAMAS[:2])
+            fichados.append({
+                **{campo.lower(): valor for campo, valor in alumno.items()},
+                "nombre": f"Alumno {alumno['Matricula']}",
+                "fecha_registro_ficha": ahora - timedelta(minutes=aleatorio.randrange(30 * 24 * 60))
+            })
+        await db.fichados_apodaca.insert_many(fichados)
+
+        # Asistencias de días anteriores (no chocan con las de hoy)
+        asistencias = []
+        for numero in range(self.tamaño):
+            momento = ahora - timedelta(days=1 + numero % 60, minutes=aleatorio.randrange(600))
+            asistencias.append({
+                "Matricula": self.bachillerato[numero], "Nombre": "Alumno",
+                "Fecha": momento.strftime("%d/%m/%Y"), "Hora": momento.strftime("%H:%M"),
+                "fecha_dia": datetime(momento.year, momento.month, momento.day), "timestamp": momento
+            })
+        await db.asistencia_general_apodaca.insert_many(asistencias)
+
+        usuarios = [
+            {"nombre_completo": f"Usuario {numero}", "correo": f"usuario{numero}@edec.mx", "contraseña": "",
+             "rol": "coordinador", "campus": aleatorio.choice(CAMPUS), "fecha_creacion": ahora}
+            for numero in range(self.tamaño - 1)
+        ]
+        usuarios.insert(len(usuarios) // 2, {
+            "nombre_completo": "Coordinador Benchmark", "correo": CORREO_USUARIO,
+            "contraseña": await hashear_contraseña(CONTRASEÑA_USUARIO),
+            "rol": "coordinador", "campus": "Apodaca", "fecha_creacion": ahora
+        })
+        await get_db_usuarios().usuarios_apodaca.insert_many(usuarios)
+
+        # Índices al final: mongomock revisa los índices únicos recorriendo la
+        # colección en cada inserción, lo que haría cuadrática la siembra
+        await crear_indices()
+
+def casos(contexto: Contexto) -> Dict[str, Dict[str, Callable]]:
+    """Por función: "antes" (fuera de la medición, opcional) y "llamar" (corrutina medida)"""
+    from app.cache import cache_bachillerato
+    from app.services.asistencia_service import obtener_fichados_apodaca_agrupados, registrar_asistencia
+    from app.services.usuario_service import (
+        autenticar_usuario_apodaca, obtener_datos_alumno_bachillerato, obtener_todos_alumnos_universidad
+    )
+    aleatorio = contexto.aleatorio
+    en_cache = contexto.bachillerato[0]
+
+    async def registrar():
+        await registrar_asistencia(contexto.siguiente_sin_asistencia(), "Alumno Benchmark")
+
+    async def alumno_bachillerato():
+        assert await obtener_datos_alumno_bachillerato(aleatorio.choice(contexto.bachillerato)) is not None
+
+    async def alumno_bachillerato_cache():
+        assert await obtener_datos_alumno_bachillerato(en_cache) is not None
+
+    async def autenticar():
+        assert await autenticar_usuario_apodaca(CORREO_USUARIO, CONTRASEÑA_USUARIO) is not None
+
+    return {
+        "registrar_asistencia": {"llamar": registrar},
+        "obtener_datos_alumno_bachillerato": {"antes": cache_bachillerato.limpiar, "llamar": alumno_bachillerato},
+        "obtener_datos_alumno_bachillerato[cache]": {"llamar": alumno_bachillerato_cache},
+        "obtener_fichados_apodaca_agrupados": {"llamar": obtener_fichados_apodaca_agrupados},
+        "obtener_todos_alumnos_universidad": {"llamar": obtener_todos_alumnos_universidad},
+        "autenticar_usuario_apodaca": {"llamar": autenticar}
+    }
+
+async def medir_caso(caso: Dict[str, Callable], repeticiones: int, tiempo_max: float) -> Dict:
+    """Tiempo por llamada (hasta `repeticiones` o `tiempo_max` segundos, mínimo 3) y memoria en otra pasada"""
+    antes = caso.get("antes") or (lambda: None)
+    llamar = caso["llamar"]
+
+    antes()
+    await llamar()  # calentamiento
+
+    # Como timeit: sin el recolector de basura durante la medición de tiempo
+    tiempos = []
+    gc.collect()
+    gc.disable()
+    try:
+        limite = time.perf_counter() + tiempo_max
+        while len(tiempos) < repeticiones and (len(tiempos) < 3 or time.perf_counter() < limite):
+            antes()
+            inicio = time.perf_counter()
+            await llamar()
+            tiempos.append(time.perf_counter() - inicio)
+    finally:
+        gc.enable()
+
+    # Las funciones de más de un segundo se miden una sola vez con tracemalloc
+    pasadas = 1 if sorted(tiempos)[len(tiempos) // 2] > 1 else 3
+    picos, retenidas = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(pasadas):
+            antes()
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await llamar()
+            actual, pico = tracemalloc.get_traced_memory()
+            picos.append(pico - base)
+            retenidas.append(actual - base)
+    finally:
+        tracemalloc.stop()
+
+    tiempos.sort()
+    return {
+        "llamadas": len(tiempos),
+        "mediana_ms": round(percentil(tiempos, 50) * 1000, 4),
+        "p95_ms": round(percentil(tiempos, 95) * 1000, 4),
+        "min_ms": round(tiempos[0] * 1000, 4),
+        "memoria_pico_kib": round(sorted(picos)[len(picos) // 2] / 1024, 1),
+        "memoria_retenida_kib": round(sorted(retenidas)[len(retenidas) // 2] / 1024, 1)
+    }
+
+async def medir(tamaños: List[int], repeticiones: int, tiempo_max: float, semilla: int, funciones: Optional[List[str]]) -> Dict:
+    from app.database import close_db
+    resultados = {}
+    for tamaño in tamaños:
+        contexto = Contexto(tamaño, semilla)
+        inicio = time.perf_counter()
+        await contexto.sembrar()
+        print(f"🌱 {tamaño} documentos por colección sembrados en {time.perf_counter() - inicio:.1f} s")
+        resultados[str(tamaño)] = {}
+        for nombre, caso in casos(contexto).items():
+            if funciones and nombre not in funciones:
+                continue
+            r = resultados[str(tamaño)][nombre] = await medir_caso(caso, repeticiones, tiempo_max)
+            print(f"   {nombre:<42} {r['mediana_ms']:>10.3f} ms  {r['memoria_pico_kib']:>10.1f} KiB  ({r['llamadas']} llamadas)")
+    await close_db()
+    return resultados
+
+def comparar_resultados(linea_base: Dict, actuales: Dict, tolerancia: float, tolerancia_memoria: float,
+                        minimo_ms: float, minimo_kib: float) -> List[str]:
+    """
+    Regresiones de actuales contra la línea base. Una diferencia cuenta solo si
+    supera la tolerancia relativa y el mínimo absoluto (ruido de funciones muy rápidas).
+    """
+    regresiones = []
+    print(f"\n{'tamaño':>7} | {'función':<42} | {'base ms':>9} | {'actual ms':>9} | {'Δ tiempo':>8} | {'Δ memoria':>9}")
+    for tamaño, funciones in linea_base["resultados"].items():
+        for nombre, base in funciones.items():
+            actual = actuales["resultados"].get(tamaño, {}).get(nombre)
+            if actual is None:
+                continue
+            cambio_tiempo = actual["mediana_ms"] / base["mediana_ms"] - 1 if base["mediana_ms"] else 0.0
+            cambio_memoria = actual["memoria_pico_kib"] / base["memoria_pico_kib"] - 1 if base["memoria_pico_kib"] else 0.0
+            marca = ""
+            if cambio_tiempo > tolerancia and actual["mediana_ms"] - base["mediana_ms"] > minimo_ms:
+                regresiones.append(f"{nombre} ({tamaño}): tiempo {base['mediana_ms']} -> {actual['mediana_ms']} ms (+{cambio_tiempo:.0%})")
+                marca = " ❌"
+            if cambio_memoria > tolerancia_memoria and actual["memoria_pico_kib"] - base["memoria_pico_kib"] > minimo_kib:
+                regresiones.append(f"{nombre} ({tamaño}): memoria {base['memoria_pico_kib']} -> {actual['memoria_pico_kib']} KiB (+{cambio_memoria:.0%})")
+                marca = " ❌"
+            print(
+                f"{tamaño:>7} | {nombre:<42} | {base['mediana_ms']:>9.3f} | {actual['mediana_ms']:>9.3f} | "
+                f"{cambio_tiempo:>+8.0%} | {cambio_memoria:>+9.0%}{marca}"
+            )
+    return regresiones
+
+def reporte(resultados: Dict, args) -> Dict:
+    return {
+        "escenario": "micro_servicios",
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "entorno": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "parametros": {
+            "tamaños": args.tamaños,
+            "repeticiones": args.repeticiones,
+            "tiempo_max": args.tiempo_max,
+            "bcrypt_rounds": args.bcrypt_rounds,
+            "semilla": args.semilla
+        },
+        "resultados": resultados
+    }
+
+def guardar(datos: Dict, ruta: str):
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(datos, archivo, ensure_ascii=False, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de funciones de servicio")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    medir_parser = subcomandos.add_parser("medir", help="Mide y guarda los resultados")
+    medir_parser.add_argument("--guardar-linea-base", action="store_true", help="Guardar también como línea base")
+    medir_parser.add_argument("--salida", help="Archivo JSON (por defecto benchmarks/resultados/)")
+
+    comparar_parser = subcomandos.add_parser("comparar", help="Compara contra la línea base; código 1 si hay regresiones")
+    comparar_parser.add_argument("--resultados", help="Resultados ya medidos (si no, se mide ahora)")
+    comparar_parser.add_argument("--tolerancia", type=float, default=0.20, help="Aumento relativo de tiempo permitido")
+    comparar_parser.add_argument("--tolerancia-memoria", type=float, default=0.20)
+    comparar_parser.add_argument("--minimo-ms", type=float, default=0.05, help="Diferencia de tiempo que se ignora")
+    comparar_parser.add_argument("--minimo-kib", type=float, default=4.0, help="Diferencia de memoria que se ignora")
+
+    for subparser in (medir_parser, comparar_parser):
+        subparser.add_argument("--linea-base", default=LINEA_BASE)
+        subparser.add_argument("--tamaños", type=int, nargs="+", default=None, help="Por defecto 1000 10000 100000")
+        subparser.add_argument("--repeticiones", type=int, default=None, help="Llamadas por función (por defecto 30)")
+        subparser.add_argument("--tiempo-max", type=float, default=None, help="Segundos máximos por función (por defecto 10)")
+        subparser.add_argument("--bcrypt-rounds", type=int, default=None, help="Por defecto 4")
+        subparser.add_argument("--semilla", type=int, default=None)
+        subparser.add_argument("--funciones", nargs="+", help="Medir solo estas funciones")
+    args = parser.parse_args()
+
+    linea_base = None
+    if args.comando == "comparar":
+        if not os.path.exists(args.linea_base):
+            raise SystemExit(f"❌ No existe la línea base {args.linea_base}: ejecuta 'medir --guardar-linea-base'")
+        with open(args.linea_base, encoding="utf-8") as archivo:
+            linea_base = json.load(archivo)
+
+    # Sin parámetros explícitos se repiten los de la línea base (para que la comparación sea justa)
+    predeterminados = {"tamaños": [1000, 10000, 100000], "repeticiones": 30, "tiempo_max": 10.0, "bcrypt_rounds": 4, "semilla": 2024}
+    for nombre, valor in predeterminados.items():
+        if getattr(args, nombre) is None:
+            setattr(args, nombre, (linea_base or {}).get("parametros", {}).get(nombre, valor))
+
+    if args.comando == "comparar" and args.resultados:
+        with open(args.resultados, encoding="utf-8") as archivo:
+            actuales = json.load(archivo)
+    else:
+        preparar_entorno(args.bcrypt_rounds)
+        actuales = reporte(asyncio.run(medir(args.tamaños, args.repeticiones, args.tiempo_max, args.semilla, args.funciones)), args)
+        salida = getattr(args, "salida", None) or os.path.join(
+            DIRECTORIO_RESULTADOS, f"micro_servicios_{datetime.now():%Y%m%d_%H%M%S}.json"
+        )
+        guardar(actuales, salida)
+        print(f"\n📄 Resultados: {salida}")
+
+    if args.comando == "medir":
+        if args.guardar_linea_base:
+            guardar(actuales, args.linea_base)
+            print(f"📌 Línea base: {args.linea_base}")
+        return
+
+    regresiones = comparar_resultados(
+        linea_base, actuales, args.tolerancia, args.tolerancia_memoria, args.minimo_ms, args.minimo_kib
+    )
+    if regresiones:
+        print(f"\n❌ {len(regresiones)} regresiones:")
+        for regresion in regresiones:
+            print(f"   - {regresion}")
+        sys.exit(1)
+    print("\n✅ Sin regresiones respecto a la línea base")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Sustituto en memoria de AsyncMongoClient sobre mongomock, para correr los
+benchmarks sin un mongod.
+
+Expone la parte de la API asíncrona de PyMongo que usa la aplicación
+(cursores con sort/limit/to_list/async for, find_one*, insert_*, update_*,
+delete_*, bulk_write, aggregate, índices, rename, command). Cada operación
+cede el event loop una vez para que la concurrencia se parezca a la de un
+cliente real; la latencia de red y de disco no se simula, así que los
+resultados sirven para comparar cambios del código de la API y no para
+estimar la latencia de MongoDB Atlas.
+
+Uso: instalar() antes de importar app.main.
+"""
+import asyncio
+from typing import Dict, List
+import mongomock
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+class Resultado:
+    """Resultado de bulk_write / insert_many con los mismos atributos que PyMongo"""
+
+    def __init__(self):
+        self.inserted_count = self.matched_count = self.modified_count = 0
+        self.upserted_count = self.deleted_count = 0
+        self.upserted_ids: Dict[int, object] = {}
+        self.inserted_ids: List[object] = []
+
+class CursorLocal:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._iterador = None
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, cantidad: int):
+        self._cursor = self._cursor.limit(cantidad)
+        return self
+
+    def skip(self, cantidad: int):
+        self._cursor = self._cursor.skip(cantidad)
+        return self
+
+    def batch_size(self, _cantidad: int):
+        return self
+
+    def hint(self, *_args):
+        return self
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(0)
+        documentos = list(self._cursor)
+        return documentos if length is None else documentos[:length]
+
+    def __aiter__(self):
+        self._iterador = iter(self._cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterador)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self):
+        pass
+
+class ColeccionLocal:
+    def __init__(self, coleccion):
+        self._coleccion = coleccion
+        self.name = coleccion.name
+
+    def with_options(self, **_kwargs):
+        return self
+
+    def find(self, *args, **kwargs):
+        kwargs.pop("batch_size", None)
+        return CursorLocal(self._coleccion.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline, **_kwargs):
+        await asyncio.sleep(0)
+        return CursorLocal(iter(self._coleccion.aggregate(pipeline)))
+
+    async def rename(self, nuevo_nombre: str, dropTarget: bool = False, **_kwargs):
+        await asyncio.sleep(0)
+        if dropTarget:
+            self._coleccion.database.drop_collection(nuevo_nombre)
+        self._coleccion.rename(nuevo_nombre)
+
+    async def bulk_write(self, operaciones, ordered: bool = True, **_kwargs):
+        await asyncio.sleep(0)
+        resultado = Resultado()
+        errores = []
+        for indice, operacion in enumerate(operaciones):
+            try:
+                self._aplicar(operacion, indice, resultado)
+            except DuplicateKeyError as e:
+                errores.append({"index": indice, "code": 11000, "errmsg": str(e), "op": getattr(operacion, "_doc", None)})
+                if ordered:
+                    break
+        if errores:
+            raise BulkWriteError({
+                "writeErrors": errores,
+                "nInserted": resultado.inserted_count,
+                "nMatched": resultado.matched_count,
+                "nModified": resultado.modified_count,
+                "nUpserted": resultado.upserted_count,
+                "upserted": [{"index": i, "_id": _id} for i, _id in resultado.upserted_ids.items()]
+            })
+        return resultado
+
+    def _aplicar(self, operacion, indice: int, resultado: Resultado):
+        if isinstance(operacion, InsertOne):
+            resultado.inserted_ids.append(self._coleccion.insert_one(operacion._doc).inserted_id)
+            resultado.inserted_count += 1
+        elif isinstance(operacion, (UpdateOne, UpdateMany, ReplaceOne)):
+            if isinstance(operacion, ReplaceOne):
+                parcial = self._coleccion.replace_one(operacion._filter, operacion._doc, upsert=operacion._upsert)
+            elif isinstance(operacion, UpdateOne):
+                parcial = self._coleccion.update_one(operacion._filter, operacion._doc, upsert=operacion._upsert)
+            else:
+                parcial = self._coleccion.update_many(operacion._filter, operacion._doc, upsert=operacion._upsert)
+            resultado.matched_count += parcial.matched_count
+            resultado.modified_count += parcial.modified_count
+            if parcial.upserted_id is not None:
+                resultado.upserted_count += 1
+                resultado.upserted_ids[indice] = parcial.upserted_id
+        elif isinstance(operacion, DeleteOne):
+            resultado.deleted_count += self._coleccion.delete_one(operacion._filter).deleted_count
+
+    async def insert_many(self, documentos, ordered: bool = True, **_kwargs):
+        documentos = list(documentos)
+        resultado = await self.bulk_write([InsertOne(documento) for documento in documentos], ordered=ordered)
+        resultado.inserted_ids = [documento["_id"] for documento in documentos]
+        return resultado
+
+    def __getattr__(self, nombre: str):
+        # Resto de la API (find_one, insert_one, update_one, create_index, ...) como corrutinas
+        atributo = getattr(self._coleccion, nombre)
+        if not callable(atributo):
+            return atributo
+
+        async def operacion(*args, **kwargs):
+            kwargs.pop("session", None)
+            await asyncio.sleep(0)
+            return atributo(*args, **kwargs)
+
+        return operacion
+
+class BaseLocal:
+    def __init__(self, base):
+        self._base = base
+
+    def __getattr__(self, nombre: str):
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        return ColeccionLocal(self._base[nombre])
+
+    def __getitem__(self, nombre: str):
+        return ColeccionLocal(self._base[nombre])
+
+    def get_collection(self, nombre: str, **_kwargs):
+        return ColeccionLocal(self._base[nombre])
+
+    async def command(self, *_args, **_kwargs):
+        return {"ok": 1}
+
+class ClienteLocal:
+    """Reemplazo de AsyncMongoClient: ignora URI y opciones"""
+
+    def __init__(self, *_args, **_kwargs):
+        self._cliente = mongomock.MongoClient()
+
+    def __getitem__(self, nombre: str):
+        return BaseLocal(self._cliente[nombre])
+
+    def get_database(self, nombre: str, **_kwargs):
+        return BaseLocal(self._cliente[nombre])
+
+    async def drop_database(self, nombre: str):
+        self._cliente.drop_database(nombre)
+
+    async def aconnect(self):
+        pass
+
+    async def close(self):
+        pass
+
+def instalar():
+    """Hace que connect_db cree un ClienteLocal en lugar de un AsyncMongoClient"""
+    import app.database
+    app.database.AsyncMongoClient = ClienteLocal
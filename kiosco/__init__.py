@@ -0,0 +1,7 @@
+"""
+Agente sin conexión para los kioscos de asistencia.
+
+Corre en el equipo del kiosco (no en el servidor): valida los escaneos contra
+una copia local del padrón, los guarda en una bitácora SQLite y los envía en
+lotes a la API cuando hay conexión. Ver kiosco/agente.py y scripts/agente_kiosco.py.
+"""
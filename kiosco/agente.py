@@ -0,0 +1,247 @@
+"""
+Agente del kiosco: registra asistencias sin depender de la conexión.
+
+- escanear() valida la matrícula contra el padrón en memoria (cargado de la
+  copia SQLite), rechaza el segundo escaneo del día y guarda el escaneo en
+  la bitácora con su hora original. No hace ninguna petición: el tiempo de
+  respuesta del kiosco no depende de Render ni de Atlas
+- Un hilo en segundo plano envía los escaneos pendientes por lotes a
+  POST /api/asistencias/registrar/lote. El servidor toma la fecha del
+  timestamp del escaneo, así que un lote enviado horas después cuenta para
+  el día correcto. Un "duplicado" del servidor (por ejemplo, un lote que se
+  reenvía porque se perdió la respuesta, o un alumno que también pasó por
+  otro kiosco) se da por sincronizado
+- Si el servidor no responde o responde 5xx, el lote se reintenta con
+  espera exponencial (hasta un minuto) y los escaneos siguen en la bitácora
+- El mismo hilo actualiza el padrón cada KIOSCO_ROSTER_SEGUNDOS con
+  GET /api/alumnos/{nivel}?completo=true e If-None-Match: mientras nadie
+  modifique alumnos, el servidor responde 304 sin cuerpo
+
+Las peticiones usan urllib (sin dependencias fuera de requirements.txt) y
+los modelos de app.models, los mismos que valida la API.
+"""
+import gzip
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from app.config import Config
+from app.matricula import normalizar_matricula
+from app.models.asistencia import AsistenciaLote, AsistenciaLoteItem
+from app.models.usuario import usuario_datos
+from app.services.asistencia_service import a_hora_mexico
+from kiosco.almacen import AlmacenKiosco
+
+NIVELES = ("bachillerato", "universidad")
+ESPERA_MAXIMA = 60.0
+
+class ErrorConexion(Exception):
+    """El servidor no respondió o respondió con un error temporal (5xx); se reintenta"""
+    pass
+
+class ClienteAPI:
+    """Peticiones HTTP a la API de asistencia"""
+
+    def __init__(self, url: str, timeout: float = 15.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _peticion(self, metodo: str, ruta: str, cuerpo: Optional[bytes] = None,
+                  encabezados: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        encabezados = {"Accept-Encoding": "gzip", **(encabezados or {})}
+        if cuerpo is not None:
+            encabezados["Content-Type"] = "application/json"
+        peticion = urllib.request.Request(self.url + ruta, data=cuerpo, headers=encabezados, method=metodo)
+        try:
+            with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+                estado, cabeceras, contenido = respuesta.status, dict(respuesta.headers), respuesta.read()
+        except urllib.error.HTTPError as e:
+            estado, cabeceras, contenido = e.code, dict(e.headers or {}), e.read()
+        except (urllib.error.URLError, OSError) as e:
+            raise ErrorConexion(str(e))
+
+        if estado >= 500:
+            raise ErrorConexion(f"HTTP {estado}")
+        cabeceras = {llave.lower(): valor for llave, valor in cabeceras.items()}
+        if cabeceras.get("content-encoding") == "gzip":
+            contenido = gzip.decompress(contenido)
+        return estado, cabeceras, contenido
+
+    def obtener_padron(self, nivel: str, etag: Optional[str]) -> Tuple[Optional[List[usuario_datos]], Optional[str]]:
+        """Padrón completo de un nivel y su ETag; (None, etag) si no cambió (304)"""
+        estado, cabeceras, contenido = self._peticion(
+            "GET", f"/api/alumnos/{nivel}?completo=true", encabezados={"If-None-Match": etag} if etag else None
+        )
+        if estado == 304:
+            return None, etag
+        if estado != 200:
+            raise ValueError(f"El servidor respondió {estado} al pedir el padrón de {nivel}")
+        alumnos = [usuario_datos.model_validate(alumno) for alumno in json.loads(contenido)["alumnos"]]
+        return alumnos, cabeceras.get("etag")
+
+    def enviar_lote(self, lote: AsistenciaLote) -> List[Dict]:
+        """Resultados por escaneo (en el mismo orden) de /api/asistencias/registrar/lote"""
+        estado, _, contenido = self._peticion(
+            "POST", "/api/asistencias/registrar/lote", cuerpo=lote.model_dump_json().encode("utf-8")
+        )
+        if estado != 200:
+            raise ValueError(f"El servidor rechazó el lote ({estado}): {contenido[:200].decode('utf-8', 'replace')}")
+        return json.loads(contenido)["resultados"]
+
+class AgenteKiosco:
+    """Padrón y bitácora locales con sincronización en segundo plano"""
+
+    def __init__(self, url: str = None, ruta_db: str = None, lote: int = None,
+                 aceptar_desconocidas: bool = False):
+        self.cliente = ClienteAPI(url or Config.KIOSCO_API_URL)
+        self.ruta_db = ruta_db or Config.KIOSCO_DB
+        # El modelo AsistenciaLote acepta hasta 1000 escaneos por petición
+        self.lote = min(lote or Config.KIOSCO_LOTE, 1000)
+        self.aceptar_desconocidas = aceptar_desconocidas
+        self.almacen = AlmacenKiosco(self.ruta_db)
+        self.padron = self.almacen.leer_padron()
+        self._detener = threading.Event()
+        self._despertar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self.ultimo_error: Optional[str] = None
+
+    # ---- kiosco ----
+
+    def escanear(self, matricula, momento: Optional[datetime] = None) -> Dict:
+        """
+        Registra un escaneo en la bitácora local.
+        Estados: registrado (pendiente de enviar), duplicado (ya pasó hoy) o
+        no_encontrado (matrícula fuera del padrón local).
+        """
+        matricula = normalizar_matricula(matricula)
+        momento = momento or datetime.now(timezone.utc)
+        nivel, alumno = self.padron.get(matricula, (None, None))
+        if alumno is None and not self.aceptar_desconocidas:
+            return {"estado": "no_encontrado", "matricula": matricula}
+
+        momento_mexico = a_hora_mexico(momento)
+        nombre = alumno.nombre if alumno is not None else ""
+        id_escaneo = self.almacen.registrar_escaneo(matricula, nombre, momento, momento_mexico.strftime("%d/%m/%Y"))
+        return {
+            "estado": "registrado" if id_escaneo is not None else "duplicado",
+            "matricula": matricula,
+            "nombre": nombre,
+            "nivel": nivel,
+            "hora": momento_mexico.strftime("%H:%M")
+        }
+
+    def estadisticas(self) -> Dict:
+        return {**self.almacen.estadisticas(), "ultimo_error": self.ultimo_error}
+
+    # ---- sincronización (cada llamada con su propio almacén si corre en otro hilo) ----
+
+    def actualizar_padron(self, almacen: AlmacenKiosco = None) -> Dict[str, int]:
+        """Descarga el padrón de cada nivel si cambió; retorna alumnos descargados por nivel"""
+        almacen = almacen or self.almacen
+        descargados = {}
+        for nivel in NIVELES:
+            alumnos, etag = self.cliente.obtener_padron(nivel, almacen.leer_meta(f"etag_{nivel}"))
+            if alumnos is None:
+                continue
+            if not alumnos and any(datos[0] == nivel for datos in self.padron.values()):
+                # Un padrón vacío casi siempre es un servidor mal configurado: se conserva el local
+                print(f"⚠️  El servidor envió el padrón de {nivel} vacío; se conserva la copia local")
+                continue
+            almacen.reemplazar_padron(nivel, alumnos, etag)
+            descargados[nivel] = len(alumnos)
+        if descargados:
+            # Reemplazo atómico de la referencia: escanear() nunca ve un padrón a medias
+            self.padron = almacen.leer_padron()
+        return descargados
+
+    def sincronizar(self, almacen: AlmacenKiosco = None) -> Dict[str, int]:
+        """Envía todos los escaneos pendientes en lotes; retorna los totales por estado"""
+        almacen = almacen or self.almacen
+        totales = {"registrado": 0, "duplicado": 0, "error": 0}
+        # Se avanza por id: un escaneo con error sigue pendiente y se reintenta en la siguiente llamada
+        ultimo_id = 0
+        while True:
+            pendientes = almacen.pendientes(self.lote, despues_de=ultimo_id)
+            if not pendientes:
+                return totales
+            lote = AsistenciaLote(registros=[
+                AsistenciaLoteItem(matricula=escaneo["matricula"], nombre=escaneo["nombre"], timestamp=escaneo["timestamp"])
+                for escaneo in pendientes
+            ])
+            resultados = self.cliente.enviar_lote(lote)
+            marcas = []
+            for escaneo, resultado in zip(pendientes, resultados):
+                estado = resultado.get("estado")
+                estado = estado if estado in totales else "error"
+                totales[estado] += 1
+                marcas.append((escaneo["id"], estado, resultado.get("mensaje")))
+            almacen.marcar_sincronizados(marcas, Config.KIOSCO_MAX_INTENTOS)
+            ultimo_id = pendientes[-1]["id"]
+
+    def iniciar(self, intervalo: float = None, intervalo_padron: float = None):
+        """Arranca el hilo que sincroniza escaneos y padrón"""
+        if self._hilo is not None:
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(
+            target=self._ciclo,
+            args=(intervalo or Config.KIOSCO_SYNC_SEGUNDOS, intervalo_padron or Config.KIOSCO_ROSTER_SEGUNDOS),
+            name="kiosco-sincronizacion",
+            daemon=True
+        )
+        self._hilo.start()
+
+    def detener(self, timeout: float = 30.0):
+        """Detiene el hilo después de un último intento de enviar los pendientes"""
+        if self._hilo is None:
+            return
+        self._detener.set()
+        self._despertar.set()
+        self._hilo.join(timeout)
+        self._hilo = None
+
+    def cerrar(self):
+        self.detener()
+        self.almacen.cerrar()
+
+    def _ciclo(self, intervalo: float, intervalo_padron: float):
+        almacen = AlmacenKiosco(self.ruta_db)
+        siguiente_padron = 0.0
+        fallos = 0
+        try:
+            while True:
+                if time.monotonic() >= siguiente_padron:
+                    # Un padrón desactualizado no impide enviar escaneos: se reintenta en el siguiente ciclo
+                    try:
+                        descargados = self.actualizar_padron(almacen)
+                        if descargados:
+                            print(f"📋 Padrón actualizado: {descargados}")
+                        siguiente_padron = time.monotonic() + intervalo_padron
+                    except (ErrorConexion, ValueError) as e:
+                        print(f"⚠️  No se pudo actualizar el padrón: {e}")
+
+                try:
+                    totales = self.sincronizar(almacen)
+                    if any(totales.values()):
+                        print(f"🔄 Sincronizados: {totales}")
+                    fallos = 0
+                    espera = intervalo
+                    self.ultimo_error = None
+                except (ErrorConexion, ValueError) as e:
+                    # Espera exponencial con variación aleatoria para que los kioscos no reintenten juntos
+                    fallos += 1
+                    espera = min(ESPERA_MAXIMA, intervalo * 2 ** fallos) * random.uniform(0.5, 1.0)
+                    self.ultimo_error = str(e)
+                    print(f"⚠️  Sin sincronizar ({e}); reintento en {espera:.0f} s")
+
+                # detener() despierta el hilo: se hace una última vuelta antes de salir
+                if self._detener.is_set():
+                    return
+                self._despertar.wait(espera)
+                self._despertar.clear()
+        finally:
+            almacen.cerrar()
@@ -0,0 +1,174 @@
+"""
+Almacén local del kiosco en SQLite.
+
+Tablas:
+- alumnos: copia del padrón por (matricula, nivel), con los campos de
+  usuario_datos en JSON
+- escaneos: bitácora de asistencias con el momento original del escaneo y su
+  estado de sincronización (pendiente, registrado, duplicado o error). El
+  índice único (matricula, fecha) es el mismo que el de
+  asistencia_general_apodaca: un segundo escaneo del mismo día se rechaza en
+  el kiosco sin consultar al servidor
+- meta: ETag del padrón de cada nivel y fecha de la última actualización
+
+La base usa WAL para que el hilo de sincronización lea y marque escaneos
+mientras el kiosco sigue escribiendo, y synchronous=FULL para que un
+escaneo confirmado sobreviva a un corte de luz. Cada hilo abre su propia
+conexión (AlmacenKiosco no se comparte entre hilos).
+"""
+import json
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from app.models.usuario import usuario_datos
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS alumnos (
+    matricula TEXT NOT NULL,
+    nivel TEXT NOT NULL,
+    datos TEXT NOT NULL,
+    PRIMARY KEY (matricula, nivel)
+);
+CREATE TABLE IF NOT EXISTS escaneos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    matricula TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    mensaje TEXT,
+    sincronizado_en TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS escaneos_matricula_fecha ON escaneos (matricula, fecha);
+CREATE INDEX IF NOT EXISTS escaneos_estado ON escaneos (estado, id);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+ESTADOS_ESCANEO = ("pendiente", "registrado", "duplicado", "error")
+
+class AlmacenKiosco:
+    """Conexión a la base SQLite del kiosco"""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._conexion = sqlite3.connect(ruta, timeout=10)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=FULL")
+        self._conexion.executescript(ESQUEMA)
+
+    def cerrar(self):
+        self._conexion.close()
+
+    # ---- meta ----
+
+    def leer_meta(self, clave: str) -> Optional[str]:
+        fila = self._conexion.execute("SELECT valor FROM meta WHERE clave = ?", (clave,)).fetchone()
+        return fila[0] if fila else None
+
+    def _guardar_meta(self, clave: str, valor: Optional[str]):
+        self._conexion.execute(
+            "INSERT INTO meta (clave, valor) VALUES (?, ?) ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor",
+            (clave, valor)
+        )
+
+    # ---- padrón ----
+
+    def reemplazar_padron(self, nivel: str, alumnos: List[usuario_datos], etag: Optional[str]):
+        """Sustituye el padrón de un nivel en una sola transacción (el kiosco nunca ve uno a medias)"""
+        with self._conexion:
+            self._conexion.execute("DELETE FROM alumnos WHERE nivel = ?", (nivel,))
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO alumnos (matricula, nivel, datos) VALUES (?, ?, ?)",
+                ((alumno.matricula, nivel, alumno.model_dump_json()) for alumno in alumnos)
+            )
+            self._guardar_meta(f"etag_{nivel}", etag)
+            self._guardar_meta(f"padron_{nivel}", datetime.now(timezone.utc).isoformat())
+
+    def leer_padron(self) -> Dict[str, Tuple[str, usuario_datos]]:
+        """
+        matricula -> (nivel, alumno). Si una matrícula está en ambos niveles gana
+        bachillerato, como en GET /api/alumnos/{matricula}.
+        """
+        padron = {}
+        filas = self._conexion.execute(
+            "SELECT matricula, nivel, datos FROM alumnos ORDER BY nivel = 'bachillerato'"
+        )
+        for matricula, nivel, datos in filas:
+            padron[matricula] = (nivel, usuario_datos.model_construct(**json.loads(datos)))
+        return padron
+
+    # ---- escaneos ----
+
+    def registrar_escaneo(self, matricula: str, nombre: str, momento: datetime, fecha: str) -> Optional[int]:
+        """Guarda un escaneo pendiente; retorna su id o None si la matrícula ya tiene uno en esa fecha"""
+        try:
+            with self._conexion:
+                cursor = self._conexion.execute(
+                    "INSERT INTO escaneos (matricula, nombre, timestamp, fecha) VALUES (?, ?, ?, ?)",
+                    (matricula, nombre, momento.isoformat(), fecha)
+                )
+            return cursor.lastrowid
+        except sqlite3.IntegrityError:
+            return None
+
+    def pendientes(self, limite: int, despues_de: int = 0) -> List[Dict]:
+        """Escaneos por sincronizar con id mayor a despues_de, del más antiguo al más reciente"""
+        filas = self._conexion.execute(
+            "SELECT id, matricula, nombre, timestamp, intentos FROM escaneos "
+            "WHERE estado = 'pendiente' AND id > ? ORDER BY id LIMIT ?",
+            (despues_de, limite)
+        ).fetchall()
+        return [
+            {"id": id_, "matricula": matricula, "nombre": nombre, "timestamp": datetime.fromisoformat(timestamp), "intentos": intentos}
+            for id_, matricula, nombre, timestamp, intentos in filas
+        ]
+
+    def marcar_sincronizados(self, resultados: List[Tuple[int, str, Optional[str]]], max_intentos: int):
+        """
+        Aplica la respuesta del servidor: (id, estado, mensaje) por escaneo.
+        registrado y duplicado quedan sincronizados; un error suma un intento y
+        el escaneo vuelve a enviarse hasta agotar max_intentos.
+        """
+        ahora = datetime.now(timezone.utc).isoformat()
+        with self._conexion:
+            for id_, estado, mensaje in resultados:
+                if estado in ("registrado", "duplicado"):
+                    self._conexion.execute(
+                        "UPDATE escaneos SET estado = ?, mensaje = ?, sincronizado_en = ? WHERE id = ?",
+                        (estado, mensaje, ahora, id_)
+                    )
+                else:
+                    self._conexion.execute(
+                        "UPDATE escaneos SET intentos = intentos + 1, mensaje = ?, "
+                        "estado = CASE WHEN intentos + 1 >= ? THEN 'error' ELSE 'pendiente' END WHERE id = ?",
+                        (mensaje, max_intentos, id_)
+                    )
+
+    def reintentar_errores(self) -> int:
+        """Regresa a pendiente los escaneos que agotaron sus intentos"""
+        with self._conexion:
+            cursor = self._conexion.execute(
+                "UPDATE escaneos SET estado = 'pendiente', intentos = 0 WHERE estado = 'error'"
+            )
+        return cursor.rowcount
+
+    def estadisticas(self) -> Dict:
+        """Escaneos por estado, alumnos por nivel y fecha de cada padrón"""
+        escaneos = dict.fromkeys(ESTADOS_ESCANEO, 0)
+        escaneos.update(self._conexion.execute("SELECT estado, COUNT(*) FROM escaneos GROUP BY estado").fetchall())
+        alumnos = dict(self._conexion.execute("SELECT nivel, COUNT(*) FROM alumnos GROUP BY nivel").fetchall())
+        pendiente_mas_antiguo = self._conexion.execute(
+            "SELECT MIN(timestamp) FROM escaneos WHERE estado = 'pendiente'"
+        ).fetchone()[0]
+        return {
+            "escaneos": escaneos,
+            "pendiente_mas_antiguo": pendiente_mas_antiguo,
+            "alumnos": alumnos,
+            "padron_actualizado": {
+                nivel: self.leer_meta(f"padron_{nivel}") for nivel in ("bachillerato", "universidad")
+            }
+        }
@@ -0,0 +1,87 @@
+"""
+Agente de kiosco sin conexión.
+
+Comandos:
+- padron: descarga el padrón de ambos niveles (solo si cambió, por ETag)
+- escanear: lee matrículas de la entrada estándar (los lectores de código de
+  barras escriben como teclado, una matrícula por línea), las registra en la
+  bitácora local y sincroniza en segundo plano
+- sincronizar: envía los escaneos pendientes y termina
+- estado: escaneos por estado, alumnos en el padrón y último error
+- reintentar: regresa a pendiente los escaneos que agotaron sus intentos
+
+La URL de la API, la base SQLite y los intervalos vienen de KIOSCO_* (ver
+config.example.env) o de los parámetros.
+
+Ejecutar: python scripts/agente_kiosco.py escanear --url https://tu-api.onrender.com
+"""
+import argparse
+import json
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import Config
+from kiosco.agente import AgenteKiosco, ErrorConexion
+
+MENSAJES = {
+    "registrado": "✅ {nombre} ({matricula}) {hora}",
+    "duplicado": "ℹ️  {nombre} ({matricula}) ya registró su entrada hoy",
+    "no_encontrado": "❌ Matrícula {matricula} no encontrada"
+}
+
+def escanear(agente: AgenteKiosco, args):
+    if not agente.padron:
+        try:
+            print(f"📋 Padrón descargado: {agente.actualizar_padron()}")
+        except (ErrorConexion, ValueError) as e:
+            print(f"⚠️  Sin padrón local y no se pudo descargar: {e}")
+    agente.iniciar(args.intervalo, args.intervalo_padron)
+    print(f"🟢 Kiosco listo ({len(agente.padron)} alumnos). Escanea una credencial (Ctrl+D para salir)")
+    try:
+        for linea in sys.stdin:
+            matricula = linea.strip()
+            if not matricula:
+                continue
+            inicio = time.perf_counter()
+            resultado = agente.escanear(matricula)
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            print(MENSAJES[resultado["estado"]].format(**{"nombre": "", "hora": "", **resultado}) + f"  [{duracion_ms:.2f} ms]")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("⏳ Enviando escaneos pendientes...")
+        agente.detener()
+
+def main():
+    parser = argparse.ArgumentParser(description="Agente de kiosco sin conexión")
+    parser.add_argument("comando", choices=["padron", "escanear", "sincronizar", "estado", "reintentar"])
+    parser.add_argument("--url", default=Config.KIOSCO_API_URL)
+    parser.add_argument("--db", default=Config.KIOSCO_DB)
+    parser.add_argument("--lote", type=int, default=Config.KIOSCO_LOTE)
+    parser.add_argument("--intervalo", type=float, default=Config.KIOSCO_SYNC_SEGUNDOS)
+    parser.add_argument("--intervalo-padron", type=float, default=Config.KIOSCO_ROSTER_SEGUNDOS)
+    parser.add_argument("--aceptar-desconocidas", action="store_true",
+                        help="Registrar matrículas que no están en el padrón local (el padrón puede estar desactualizado)")
+    args = parser.parse_args()
+
+    agente = AgenteKiosco(args.url, args.db, args.lote, args.aceptar_desconocidas)
+    try:
+        if args.comando == "escanear":
+            escanear(agente, args)
+        elif args.comando == "padron":
+            print(f"📋 Descargados: {agente.actualizar_padron() or 'sin cambios'}")
+        elif args.comando == "sincronizar":
+            print(f"🔄 Sincronizados: {agente.sincronizar()}")
+        elif args.comando == "reintentar":
+            print(f"🔁 Escaneos regresados a pendiente: {agente.almacen.reintentar_errores()}")
+        print(json.dumps(agente.estadisticas(), ensure_ascii=False, indent=2))
+    except ErrorConexion as e:
+        print(f"❌ Sin conexión con {args.url}: {e}")
+        sys.exit(1)
+    finally:
+        agente.cerrar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark de throughput de login para distintos costos de bcrypt.
+
+Para cada costo genera un hash y lanza N verificaciones concurrentes a través
+del pool de hash_service (el mismo camino que usa el login), reportando
+logins por segundo y la latencia promedio de cada verificación.
+No requiere conexión a MongoDB.
+
+Ejecutar: python scripts/benchmark_login.py --costos 8 10 12 --logins 64
+"""
+import argparse
+import asyncio
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import Config
+from app.services.hash_service import hashear_contraseña, verificar_contraseña, cerrar_pool_hash
+
+async def medir_costo(costo: int, logins: int) -> dict:
+    """Mide el throughput de verificación para un costo de bcrypt"""
+    contraseña = "contraseña-de-prueba"
+    contraseña_hasheada = await hashear_contraseña(contraseña, rounds=costo)
+
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*[
+        verificar_contraseña(contraseña, contraseña_hasheada)
+        for _ in range(logins)
+    ])
+    duracion = time.perf_counter() - inicio
+
+    assert all(resultados), "Alguna verificación falló"
+    return {
+        "costo": costo,
+        "logins": logins,
+        "segundos": duracion,
+        "logins_por_segundo": logins / duracion,
+        "ms_por_login": duracion * 1000 * Config.BCRYPT_WORKERS / logins
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de login con bcrypt")
+    parser.add_argument("--costos", type=int, nargs="+", default=[8, 10, 12, 13])
+    parser.add_argument("--logins", type=int, default=32)
+    args = parser.parse_args()
+
+    # Permitir que todas las verificaciones queden en cola durante la medición
+    Config.BCRYPT_MAX_COLA = max(Config.BCRYPT_MAX_COLA, args.logins)
+
+    print(f"Hilos de bcrypt: {Config.BCRYPT_WORKERS}")
+    print(f"{'costo':>5} | {'logins/s':>10} | {'ms por login':>12}")
+    for costo in args.costos:
+        r = await medir_costo(costo, args.logins)
+        print(f"{r['costo']:>5} | {r['logins_por_segundo']:>10.1f} | {r['ms_por_login']:>12.1f}")
+
+    cerrar_pool_hash()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+Benchmark del costo de serialización por registro en los endpoints de listas.
+
+Compara, con documentos sintéticos con la forma de MongoDB:
+- anterior: un modelo usuario_datos por alumno (o str(_id)/isoformat() por
+  asistencia) y después jsonable_encoder + json.dumps, como hace FastAPI
+  al devolver un dict
+- nuevo: dict simple / documento crudo codificado directamente a bytes con
+  app/serializacion.py (orjson si está instalado)
+
+No requiere conexión a MongoDB.
+
+Ejecutar: python scripts/benchmark_serializacion.py --registros 10000 50000
+"""
+import argparse
+import json
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from app.models.usuario import usuario_datos
+from app.serializacion import a_json, orjson
+from app.services.usuario_service import _alumno_a_dict
+from app.services.asistencia_service import _preparar_registro
+
+def generar_alumnos(total: int) -> list:
+    return [
+        {
+            "_id": ObjectId(), "Matricula": 100000 + i if i % 2 else str(100000 + i),
+            "Nombre": f"Alumno Pérez {i}", "Coordinador": "Coordinación", "Graduado": "No",
+            "Correo": f"alumno{i}@edec.mx", "Campus": "Apodaca", "Programa": "Bachillerato General",
+            "Ciclo": "2025-2026", "Turno": "Matutino"
+        }
+        for i in range(total)
+    ]
+
+def generar_asistencias(total: int) -> list:
+    inicio = datetime(2026, 1, 1, 13, 0)
+    return [
+        {
+            "_id": ObjectId(), "Matricula": str(100000 + i), "Nombre": f"Alumno {i}",
+            "Fecha": "01/01/2026", "Hora": "07:00", "fecha_dia": datetime(2026, 1, 1),
+            "timestamp": inicio + timedelta(seconds=i)
+        }
+        for i in range(total)
+    ]
+
+def _codificar_como_fastapi(contenido) -> bytes:
+    """jsonable_encoder + la codificación de JSONResponse"""
+    return json.dumps(
+        jsonable_encoder(contenido), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+def alumnos_anterior(alumnos_raw: list) -> bytes:
+    alumnos = [
+        usuario_datos(
+            matricula=str(a.get("Matricula", "")), nombre=a.get("Nombre", ""),
+            coordinador=a.get("Coordinador", ""), graduado=a.get("Graduado", ""),
+            correo=a.get("Correo", ""), campus=a.get("Campus", ""), programa=a.get("Programa", ""),
+            ciclo=a.get("Ciclo", ""), turno=a.get("Turno", "")
+        )
+        for a in alumnos_raw
+    ]
+    return _codificar_como_fastapi({"total": len(alumnos), "alumnos": alumnos})
+
+def alumnos_nuevo(alumnos_raw: list) -> bytes:
+    alumnos = [_alumno_a_dict(a) for a in alumnos_raw]
+    return a_json({"total": len(alumnos), "alumnos": alumnos})
+
+def asistencias_anterior(registros: list) -> bytes:
+    for r in registros:
+        r["_id"] = str(r["_id"])
+        r["timestamp"] = r["timestamp"].isoformat()
+        r["fecha_dia"] = r["fecha_dia"].date().isoformat()
+    return _codificar_como_fastapi({"total": len(registros), "asistencias": registros})
+
+def asistencias_nuevo(registros: list) -> bytes:
+    registros = [_preparar_registro(r) for r in registros]
+    return a_json({"total": len(registros), "asistencias": registros})
+
+def medir(funcion, generar, total: int, repeticiones: int) -> float:
+    """Mejor tiempo (µs por registro) de varias repeticiones, con datos nuevos en cada una"""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        datos = generar(total)
+        inicio = time.perf_counter()
+        funcion(datos)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1_000_000 / total
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de listas")
+    parser.add_argument("--registros", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Codificador nuevo: {'orjson' if orjson is not None else 'json (orjson no instalado)'}")
+    print(f"{'caso':<12} | {'registros':>9} | {'anterior µs':>11} | {'nuevo µs':>9} | {'mejora':>7}")
+    casos = [
+        ("alumnos", alumnos_anterior, alumnos_nuevo, generar_alumnos),
+        ("asistencias", asistencias_anterior, asistencias_nuevo, generar_asistencias),
+    ]
+    for nombre, anterior, nuevo, generar in casos:
+        for total in args.registros:
+            costo_anterior = medir(anterior, generar, total, args.repeticiones)
+            costo_nuevo = medir(nuevo, generar, total, args.repeticiones)
+            print(
+                f"{nombre:<12} | {total:>9} | {costo_anterior:>11.2f} | {costo_nuevo:>9.2f} | "
+                f"{costo_anterior / costo_nuevo:>6.1f}x"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Importa el padrón de alumnos desde un archivo Excel (.xlsx) o CSV.
+
+El archivo se lee en streaming y se escribe por lotes con upserts por
+matrícula (las existentes se actualizan). Al terminar se muestra el total de
+insertados/actualizados y las filas con error.
+
+Ejecutar: python scripts/importar_alumnos.py <bachillerato|universidad> <archivo> [tamaño_lote]
+"""
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import connect_db, close_db
+from app.indices import crear_indices
+from app.matricula import cargar_estado_matricula
+from app.services.importacion_service import importar_alumnos, leer_filas, TAMAÑO_LOTE_IMPORTACION
+
+async def importar(nivel: str, ruta: str, tamaño_lote: int):
+    """Importa el archivo al nivel indicado y muestra el reporte"""
+    connect_db()
+    await crear_indices()
+    await cargar_estado_matricula()
+
+    try:
+        with open(ruta, "rb") as archivo:
+            resultado = await importar_alumnos(nivel, leer_filas(archivo, ruta), tamaño_lote)
+    finally:
+        await close_db()
+
+    for error in resultado["errores"]:
+        print(f"⚠️  Fila {error['fila']} ({error['matricula'] or 'sin matrícula'}): {error['error']}")
+    print(
+        f"\n✅ Importación de {nivel}: {resultado['filas_leidas']} filas leídas, "
+        f"{resultado['insertados']} insertados, {resultado['actualizados']} actualizados, "
+        f"{resultado['total_errores']} errores en {resultado['duracion_segundos']} s"
+    )
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("bachillerato", "universidad"):
+        print("Uso: python scripts/importar_alumnos.py <bachillerato|universidad> <archivo> [tamaño_lote]")
+        sys.exit(1)
+    lote = int(sys.argv[3]) if len(sys.argv) > 3 else TAMAÑO_LOTE_IMPORTACION
+    asyncio.run(importar(sys.argv[1], sys.argv[2], lote))
@@ -2,13 +2,15 @@
 Script para inicializar la base de datos con datos de ejemplo
 Ejecutar: python scripts/init_database.py
 """
+import asyncio
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database import connect_db, get_db
+from app.database import connect_db, close_db, get_db
+from app.versiones import incrementar_version
 
-def init_database():
+async def init_database():
     """Inicializa la base de datos con datos de ejemplo"""
     connect_db()
     db = get_db()
@@ -52,22 +54,27 @@ def init_database():
     
     # Insertar alumnos
     for alumno in alumnos_ejemplo:
-        if not db.alumnos.find_one({"matricula": alumno["matricula"]}):
-            db.alumnos.insert_one(alumno)
+        if not await db.alumnos.find_one({"matricula": alumno["matricula"]}):
+            await db.alumnos.insert_one(alumno)
             print(f"✅ Alumno insertado: {alumno['matricula']} - {alumno['nombre_completo']}")
         else:
             print(f"⚠️  Alumno ya existe: {alumno['matricula']}")
     
     # Insertar maestros
     for maestro in maestros_ejemplo:
-        if not db.maestros.find_one({"matricula": maestro["matricula"]}):
-            db.maestros.insert_one(maestro)
+        if not await db.maestros.find_one({"matricula": maestro["matricula"]}):
+            await db.maestros.insert_one(maestro)
             print(f"✅ Maestro insertado: {maestro['matricula']} - {maestro['nombre_completo']}")
         else:
             print(f"⚠️  Maestro ya existe: {maestro['matricula']}")
     
+    # Invalidar los ETag de las respuestas que sirven estas colecciones
+    await incrementar_version("alumnos")
+    await incrementar_version("maestros")
+    
     print("\n✅ Base de datos inicializada correctamente")
+    await close_db()
 
 if __name__ == "__main__":
-    init_database()
+    asyncio.run(init_database())
 
@@ -0,0 +1,104 @@
+"""
+Backfill del campo fecha_dia en asistencia_general_apodaca.
+
+Los registros nuevos guardan fecha_dia (el día en horario de México como
+fecha de MongoDB a medianoche), que permite consultar por rango de días con
+el índice (fecha_dia, timestamp). Este script lo calcula para los registros
+existentes a partir de Fecha (DD/MM/YYYY) o, si no se puede leer, del
+timestamp convertido a horario de México.
+
+Solo toca documentos que aún no tienen fecha_dia, así que puede
+interrumpirse y volver a ejecutarse sin repetir trabajo.
+
+Ejecutar:
+    python scripts/migrar_fecha_dia.py               # migrar
+    python scripts/migrar_fecha_dia.py --verificar   # solo contar pendientes
+    python scripts/migrar_fecha_dia.py --lote 5000
+"""
+import argparse
+import asyncio
+import sys
+import os
+from datetime import datetime
+from typing import Optional
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytz
+from pymongo import UpdateOne
+from app.database import connect_db, close_db, get_db
+from app.indices import crear_indices
+from app.services.asistencia_service import a_hora_mexico, dia_mexico
+
+FILTRO_PENDIENTES = {"fecha_dia": {"$exists": False}}
+
+def calcular_fecha_dia(registro: dict) -> Optional[datetime]:
+    """Día del registro según Fecha o, como respaldo, según timestamp"""
+    try:
+        return datetime.strptime(registro.get("Fecha", ""), "%d/%m/%Y")
+    except (TypeError, ValueError):
+        pass
+
+    timestamp = registro.get("timestamp")
+    if isinstance(timestamp, datetime):
+        # MongoDB regresa los datetime en UTC sin zona horaria
+        if timestamp.tzinfo is None:
+            timestamp = pytz.utc.localize(timestamp)
+        return dia_mexico(a_hora_mexico(timestamp))
+    return None
+
+async def migrar(db, tamaño_lote: int) -> dict:
+    """Calcula fecha_dia por lotes ordenados por _id"""
+    coleccion = db.asistencia_general_apodaca
+    actualizados = 0
+    sin_fecha = 0
+    ultimo_id = None
+
+    while True:
+        filtro = dict(FILTRO_PENDIENTES)
+        if ultimo_id is not None:
+            filtro["_id"] = {"$gt": ultimo_id}
+
+        lote = await coleccion.find(filtro, {"Fecha": 1, "timestamp": 1}).sort("_id", 1).limit(tamaño_lote).to_list()
+        if not lote:
+            break
+
+        operaciones = []
+        for registro in lote:
+            fecha_dia = calcular_fecha_dia(registro)
+            if fecha_dia is None:
+                sin_fecha += 1
+                print(f"   ⚠️  _id={registro['_id']}: sin Fecha ni timestamp válidos")
+                continue
+            operaciones.append(UpdateOne({"_id": registro["_id"]}, {"$set": {"fecha_dia": fecha_dia}}))
+
+        if operaciones:
+            resultado = await coleccion.bulk_write(operaciones, ordered=False)
+            actualizados += resultado.modified_count
+
+        ultimo_id = lote[-1]["_id"]
+        print(f"   asistencia_general_apodaca: {actualizados} actualizados")
+
+    return {"actualizados": actualizados, "sin_fecha": sin_fecha}
+
+async def main():
+    parser = argparse.ArgumentParser(description="Calcular fecha_dia en los registros de asistencia existentes")
+    parser.add_argument("--lote", type=int, default=1000, help="Documentos por lote")
+    parser.add_argument("--verificar", action="store_true", help="Solo contar documentos pendientes")
+    args = parser.parse_args()
+
+    connect_db()
+    db = get_db()
+    await crear_indices()
+
+    if not args.verificar:
+        print("🔄 Calculando fecha_dia en asistencia_general_apodaca")
+        resultado = await migrar(db, args.lote)
+        print(f"✅ {resultado['actualizados']} actualizados, {resultado['sin_fecha']} sin fecha válida")
+
+    pendientes = await db.asistencia_general_apodaca.count_documents(FILTRO_PENDIENTES)
+    print(f"   {pendientes} registros sin fecha_dia")
+
+    await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
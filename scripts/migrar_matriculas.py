@@ -0,0 +1,137 @@
+"""
+Migración de la matrícula a su tipo canónico (string).
+
+Convierte a string los valores numéricos de la matrícula en todas las
+colecciones que la guardan. Trabaja por lotes ordenados por _id y guarda el
+último _id procesado de cada colección en la colección 'migraciones', por lo
+que si se interrumpe puede volver a ejecutarse y continúa donde se quedó.
+Al terminar el recorrido de una colección su avance se reinicia.
+
+Cuando ya no quedan matrículas numéricas en ninguna colección, marca la
+migración como completada; al reiniciar, la API deja el modo compatible
+($in string/int) y busca solo por el string canónico.
+
+Ejecutar:
+    python scripts/migrar_matriculas.py               # migrar
+    python scripts/migrar_matriculas.py --verificar   # solo contar pendientes
+    python scripts/migrar_matriculas.py --lote 5000
+"""
+import argparse
+import asyncio
+import sys
+import os
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.database import connect_db, close_db, get_db
+from app.matricula import MIGRACION_MATRICULA_ID, normalizar_matricula
+
+# Colección -> campo que guarda la matrícula
+COLECCIONES = {
+    "alumnos_bachillerato_apodaca": "Matricula",
+    "alumnos_universidad_apodaca": "Matricula",
+    "asistencia_general_apodaca": "Matricula",
+    "fichados_apodaca": "matricula",
+}
+
+# Alias de MongoDB para int, long, double y decimal
+TIPO_NUMERICO = "number"
+
+async def contar_pendientes(db) -> dict:
+    """Cuenta los documentos con matrícula numérica en cada colección"""
+    pendientes = {}
+    for coleccion, campo in COLECCIONES.items():
+        pendientes[coleccion] = await db[coleccion].count_documents(
+            {campo: {"$type": TIPO_NUMERICO}}
+        )
+    return pendientes
+
+async def migrar_coleccion(db, coleccion: str, campo: str, tamaño_lote: int) -> dict:
+    """
+    Convierte la matrícula de una colección por lotes, guardando el avance tras cada lote.
+    Los documentos que chocan con un índice único (por ejemplo, el mismo alumno
+    registrado como int y como string el mismo día) se reportan y se dejan sin cambiar.
+    """
+    progreso = await db.migraciones.find_one({"_id": MIGRACION_MATRICULA_ID}) or {}
+    ultimo_id = progreso.get("avance", {}).get(coleccion)
+
+    convertidos = 0
+    conflictos = 0
+
+    while True:
+        filtro = {campo: {"$type": TIPO_NUMERICO}}
+        if ultimo_id is not None:
+            filtro["_id"] = {"$gt": ultimo_id}
+
+        lote = await db[coleccion].find(filtro, {campo: 1}).sort("_id", 1).limit(tamaño_lote).to_list()
+        if not lote:
+            break
+
+        operaciones = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": {campo: normalizar_matricula(doc[campo])}})
+            for doc in lote
+        ]
+
+        try:
+            resultado = await db[coleccion].bulk_write(operaciones, ordered=False)
+            convertidos += resultado.modified_count
+        except BulkWriteError as e:
+            convertidos += e.details.get("nModified", 0)
+            for error in e.details.get("writeErrors", []):
+                conflictos += 1
+                print(f"   ⚠️  {coleccion} _id={lote[error['index']]['_id']}: {error.get('errmsg', '')}")
+
+        ultimo_id = lote[-1]["_id"]
+        await db.migraciones.update_one(
+            {"_id": MIGRACION_MATRICULA_ID},
+            {"$set": {f"avance.{coleccion}": ultimo_id, "actualizado": datetime.now()}},
+            upsert=True
+        )
+        print(f"   {coleccion}: {convertidos} convertidos")
+
+    # Recorrido terminado: la siguiente ejecución vuelve a revisar desde el inicio
+    # (solo coinciden los documentos que sigan siendo numéricos, como los conflictos)
+    await db.migraciones.update_one(
+        {"_id": MIGRACION_MATRICULA_ID},
+        {"$unset": {f"avance.{coleccion}": ""}}
+    )
+
+    return {"convertidos": convertidos, "conflictos": conflictos}
+
+async def main():
+    parser = argparse.ArgumentParser(description="Migrar la matrícula a string en todas las colecciones")
+    parser.add_argument("--lote", type=int, default=1000, help="Documentos por lote")
+    parser.add_argument("--verificar", action="store_true", help="Solo contar documentos pendientes")
+    args = parser.parse_args()
+
+    connect_db()
+    db = get_db()
+
+    if not args.verificar:
+        for coleccion, campo in COLECCIONES.items():
+            print(f"🔄 Migrando {coleccion}.{campo}")
+            resultado = await migrar_coleccion(db, coleccion, campo, args.lote)
+            print(f"✅ {coleccion}: {resultado['convertidos']} convertidos, {resultado['conflictos']} conflictos")
+
+    pendientes = await contar_pendientes(db)
+    for coleccion, total in pendientes.items():
+        print(f"   {coleccion}: {total} matrículas numéricas pendientes")
+
+    completada = sum(pendientes.values()) == 0
+    await db.migraciones.update_one(
+        {"_id": MIGRACION_MATRICULA_ID},
+        {"$set": {"completada": completada, "pendientes": pendientes, "actualizado": datetime.now()}},
+        upsert=True
+    )
+
+    if completada:
+        print("\n✅ Migración completada. Reinicia la API para usar búsquedas por igualdad.")
+    else:
+        print("\n⚠️  Quedan matrículas numéricas; la API seguirá en modo compatible.")
+
+    await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+"""
+Prueba de carga para verificar que las peticiones concurrentes se solapan.
+
+Primero mide la latencia de una petición sola (mediana de varias peticiones
+secuenciales) y después lanza N peticiones simultáneas contra un servidor en
+ejecución. Si el event loop no se bloquea, el tiempo total (pared) de las N
+queda cerca de la latencia de una sola (menos de 2 veces); si las peticiones
+se atienden una tras otra, crece hasta N veces esa latencia.
+El paralelismo efectivo (N x latencia sola / pared) va de 1 (serializado) a N.
+
+Ejecutar: python scripts/prueba_concurrencia.py --url http://localhost:8000 --peticiones 50
+"""
+import argparse
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+def hacer_peticion(url: str) -> float:
+    """Realiza un GET y retorna su latencia en segundos"""
+    inicio = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as respuesta:
+            respuesta.read()
+    except urllib.error.HTTPError:
+        # Un 404 también cuenta como respuesta atendida por el servidor
+        pass
+    return time.perf_counter() - inicio
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de concurrencia de la API")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--ruta", default="/api/alumnos/bachillerato/0")
+    parser.add_argument("--peticiones", type=int, default=50)
+    parser.add_argument("--muestras-base", type=int, default=5,
+                        help="Peticiones secuenciales para medir la latencia de una sola")
+    args = parser.parse_args()
+
+    url = args.url.rstrip("/") + args.ruta
+
+    # Calentamiento (conexiones y cachés) y latencia de referencia sin concurrencia
+    hacer_peticion(url)
+    latencia_sola = statistics.median(hacer_peticion(url) for _ in range(max(1, args.muestras_base)))
+
+    with ThreadPoolExecutor(max_workers=args.peticiones) as executor:
+        inicio = time.perf_counter()
+        latencias = list(executor.map(hacer_peticion, [url] * args.peticiones))
+        tiempo_pared = time.perf_counter() - inicio
+
+    paralelismo = args.peticiones * latencia_sola / tiempo_pared if tiempo_pared else 0.0
+
+    print(f"Peticiones:             {args.peticiones}")
+    print(f"Latencia sola (mediana): {latencia_sola * 1000:.1f} ms")
+    print(f"Tiempo total (pared):   {tiempo_pared * 1000:.1f} ms ({tiempo_pared / latencia_sola:.1f}x la latencia sola)")
+    print(f"Latencia máxima:        {max(latencias) * 1000:.1f} ms")
+    print(f"Paralelismo efectivo:   {paralelismo:.1f} de {args.peticiones}")
+    if tiempo_pared < 2 * latencia_sola:
+        print("✅ Las peticiones se atienden de forma concurrente")
+    elif tiempo_pared >= args.peticiones * latencia_sola / 2:
+        print("⚠️  Las peticiones parecen atenderse una tras otra")
+    else:
+        print("⚠️  Las peticiones se solapan solo en parte (pool de conexiones, CPU o workers saturados)")
+
+if __name__ == "__main__":
+    main()
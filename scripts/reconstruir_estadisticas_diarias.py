@@ -0,0 +1,34 @@
+"""
+Reconstruye la colección estadisticas_diarias desde asistencia_general_apodaca.
+
+Cuenta las asistencias por día y por campus/programa/turno del alumno (según
+el padrón actual) y reemplaza los documentos de cada día en cuanto termina de
+contarlo, sin detener el registro de asistencias. Debe
+ejecutarse una vez para incluir el historial anterior a estadisticas_diarias
+(después de scripts/migrar_fecha_dia.py) y puede repetirse para corregir el conteo.
+
+Ejecutar: python scripts/reconstruir_estadisticas_diarias.py
+"""
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import connect_db, close_db
+from app.matricula import cargar_estado_matricula
+from app.services.estadisticas_service import reconstruir_estadisticas_diarias
+
+async def main():
+    """Recalcula estadisticas_diarias a partir de todo el historial de asistencias"""
+    connect_db()
+    await cargar_estado_matricula()
+
+    resultado = await reconstruir_estadisticas_diarias()
+
+    print(f"✅ estadisticas_diarias reconstruida: {resultado['documentos']} documentos, {resultado['asistencias']} asistencias")
+    if resultado["sin_fecha_dia"]:
+        print(f"⚠️  {resultado['sin_fecha_dia']} registros sin fecha_dia; ejecutar scripts/migrar_fecha_dia.py y repetir")
+    await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
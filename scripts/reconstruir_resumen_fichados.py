@@ -0,0 +1,36 @@
+"""
+Reconstruye la colección materializada fichados_resumen desde fichados_apodaca.
+
+Ejecuta el mismo pipeline $group que usa la API y escribe el resultado con
+$out, que reemplaza la colección de forma atómica (conserva sus índices).
+Debe ejecutarse antes de activar FICHADOS_RESUMEN=true, y puede repetirse
+para corregir el resumen; los fichados registrados mientras corre pueden
+quedar fuera, por lo que conviene hacerlo en horario sin actividad.
+
+Ejecutar: python scripts/reconstruir_resumen_fichados.py
+"""
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import connect_db, close_db, get_db
+from app.indices import crear_indices
+from app.services.asistencia_service import pipeline_fichados_agrupados
+
+async def reconstruir_resumen_fichados():
+    """Recalcula fichados_resumen a partir de todo el historial de fichados"""
+    connect_db()
+    db = get_db()
+    await crear_indices()
+
+    pipeline = pipeline_fichados_agrupados() + [{"$out": "fichados_resumen"}]
+    cursor = await db.fichados_apodaca.aggregate(pipeline)
+    await cursor.to_list()
+
+    total = await db.fichados_resumen.count_documents({})
+    print(f"✅ fichados_resumen reconstruido: {total} alumnos")
+    await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(reconstruir_resumen_fichados())